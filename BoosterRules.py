@@ -0,0 +1,162 @@
+###############################################################################
+# In-booster and rating overrides applied by addCard in ManageCardData.py, described in data/BoosterRules.json.
+#
+# The rules file has three lists of rules: "before" (all cards), "sets" (per set code, only applied to cards of this set)
+# and "after" (all cards), applied in this order. Each rule has optional conditions and one or more actions:
+#   Conditions ("when": all must match, "unless": rule skipped if all match):
+#     "ids": [card ids], "basic": bool (type line starts with 'Basic'), "cn_suffix": str (collector number ends with),
+#     "cn_range": [min, max] (inclusive, null for unbounded; collector number must be numeric, optionally followed by one of
+#     "cn_suffixes", default [""]), "promo_type": str, "oracle_text_contains": str
+#   Actions:
+#     "in_booster": true | false | "scryfall" (Scryfall's 'booster' value), "rating": number,
+#     "add_related": card id (added to related_cards unless already part of the card's all_parts)
+#   "max_collector_number": N is a shorthand for: in booster if and only if the collector number is in [1, N].
+# Any "comment" property is ignored.
+#
+# python BoosterRules.py [path] validates the rules file and prints a summary.
+
+import re
+import sys
+import json
+import time
+
+CollectorNumberRegex = re.compile(r"^(\d+)(\D*)$")
+ConditionKeys = {"ids", "basic", "cn_suffix", "cn_range", "cn_suffixes", "promo_type", "oracle_text_contains"}
+ActionKeys = {"in_booster", "rating", "add_related"}
+
+
+def parseCollectorNumber(collector_number: str) -> tuple[int | None, str]:
+    m = CollectorNumberRegex.match(collector_number)
+    if m is None:
+        return None, collector_number
+    return int(m.group(1)), m.group(2)
+
+
+class CardContext:
+    """Card being processed, with its collector number parsed only once."""
+
+    __slots__ = ("card", "number", "suffix")
+
+    def __init__(self, card: dict):
+        self.card = card
+        self.number, self.suffix = parseCollectorNumber(card["collector_number"])
+
+
+def compileConditions(conditions: dict):
+    unknown = set(conditions) - ConditionKeys
+    if unknown:
+        raise ValueError(f"Unknown rule condition(s): {unknown}")
+    checks = []
+    if "ids" in conditions:
+        ids = frozenset(conditions["ids"])
+        checks.append(lambda ctx: ctx.card["id"] in ids)
+    if "basic" in conditions:
+        basic = conditions["basic"]
+        checks.append(lambda ctx: ctx.card["type_line"].startswith("Basic") == basic)
+    if "cn_suffix" in conditions:
+        cn_suffix = conditions["cn_suffix"]
+        checks.append(lambda ctx: ctx.card["collector_number"].endswith(cn_suffix))
+    if "cn_range" in conditions:
+        low, high = conditions["cn_range"]
+        low = float("-inf") if low is None else low
+        high = float("inf") if high is None else high
+        suffixes = frozenset(conditions.get("cn_suffixes", [""]))
+        checks.append(lambda ctx: ctx.number is not None and ctx.suffix in suffixes and low <= ctx.number <= high)
+    elif "cn_suffixes" in conditions:
+        raise ValueError("'cn_suffixes' requires 'cn_range'")
+    if "promo_type" in conditions:
+        promo_type = conditions["promo_type"]
+        checks.append(lambda ctx: promo_type in ctx.card.get("promo_types", []))
+    if "oracle_text_contains" in conditions:
+        text = conditions["oracle_text_contains"]
+        checks.append(lambda ctx: text in ctx.card.get("oracle_text", ""))
+    if len(checks) == 1:
+        return checks[0]
+    return lambda ctx: all(check(ctx) for check in checks)
+
+
+def compileActions(rule: dict):
+    actions = []
+    if "in_booster" in rule:
+        value = rule["in_booster"]
+        if value == "scryfall":
+            actions.append(lambda ctx, selection: selection.__setitem__("in_booster", ctx.card["booster"]))
+        elif isinstance(value, bool):
+            actions.append(lambda ctx, selection: selection.__setitem__("in_booster", value))
+        else:
+            raise ValueError(f"Invalid 'in_booster' value: {value}")
+    if "rating" in rule:
+        rating = rule["rating"]
+        actions.append(lambda ctx, selection: selection.__setitem__("rating", rating))
+    if "add_related" in rule:
+        related_id = rule["add_related"]
+
+        def addRelated(ctx, selection):
+            if any(part["id"] == related_id for part in ctx.card.get("all_parts", [])):
+                return
+            selection.setdefault("related_cards", []).append(related_id)
+
+        actions.append(addRelated)
+    if len(actions) == 0:
+        raise ValueError(f"Rule without action: {rule}")
+    return actions
+
+
+def compileRule(rule: dict) -> list:
+    rule = {k: v for k, v in rule.items() if k != "comment"}
+    if "max_collector_number" in rule:
+        max_cn = rule.pop("max_collector_number")
+        return compileRule({"in_booster": False}) + compileRule({"in_booster": True, "when": {"cn_range": [1, max_cn]}})
+    unknown = set(rule) - ActionKeys - {"when", "unless"}
+    if unknown:
+        raise ValueError(f"Unknown rule property(ies): {unknown}")
+    when = compileConditions(rule["when"]) if "when" in rule else None
+    unless = compileConditions(rule["unless"]) if "unless" in rule else None
+    return [(when, unless, compileActions(rule))]
+
+
+def compileRuleList(rules: list) -> tuple:
+    return tuple(compiled for rule in rules for compiled in compileRule(rule))
+
+
+class RuleTable:
+    def __init__(self, rules: dict):
+        self.before = compileRuleList(rules.get("before", []))
+        self.after = compileRuleList(rules.get("after", []))
+        self.sets = {}
+        for set_codes, set_rules in rules.get("sets", {}).items():
+            # Keys can list several sets separated by '|', e.g. "akr|klr"
+            for set_code in set_codes.split("|"):
+                self.sets[set_code] = self.sets.get(set_code, ()) + compileRuleList(set_rules)
+
+    @staticmethod
+    def run(rules: tuple, ctx: CardContext, selection: dict):
+        for when, unless, actions in rules:
+            if when is not None and not when(ctx):
+                continue
+            if unless is not None and unless(ctx):
+                continue
+            for action in actions:
+                action(ctx, selection)
+
+    def apply(self, card: dict, selection: dict):
+        ctx = CardContext(card)
+        self.run(self.before, ctx, selection)
+        set_rules = self.sets.get(card["set"])
+        if set_rules is not None:
+            self.run(set_rules, ctx, selection)
+        self.run(self.after, ctx, selection)
+
+
+def loadRules(path: str) -> RuleTable:
+    with open(path, "r", encoding="utf8") as file:
+        return RuleTable(json.load(file))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "data/BoosterRules.json"
+    start = time.perf_counter()
+    table = loadRules(path)
+    print(f"Compiled '{path}' in {1000 * (time.perf_counter() - start):.2f}ms.")
+    print(f"  {len(table.before)} rules before, {len(table.after)} rules after.")
+    print(f"  {sum(len(r) for r in table.sets.values())} rules for {len(table.sets)} sets.")
@@ -0,0 +1,80 @@
+###############################################################################
+# Staging of the build outputs: ManageCardData.py writes them to data/staging (under the same relative paths), validates
+# them there (see CardDBChecks.py) and only then moves them into place, so a failed build never leaves a partial or invalid
+# card DB behind. Each file is replaced atomically, a staged folder replaces the previous one as a whole (e.g. stale
+# chunks are removed). During the build, outputs are read through read(), which prefers the staged version.
+# With --no-publish, validated outputs stay staged along with a manifest, and are published by another process (e.g.
+# WatchCardData.py, which then signals the consumers).
+
+import os
+import glob
+import json
+import shutil
+import fnmatch
+
+StagingFolder = "data/staging"
+ManifestName = "Staged.json"
+
+
+class Staging:
+    def __init__(self, folder: str = StagingFolder, clear: bool = True):
+        """clear: Discard the outputs left by a previous (failed or unpublished) build."""
+        self.folder = folder
+        self.paths = {}  # Final path -> staged path
+        if clear:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def path(self, final: str) -> str:
+        """Where to write the output final (a file, or a folder created by the caller)."""
+        final = os.path.normpath(final)
+        staged = os.path.join(self.folder, final)
+        os.makedirs(os.path.dirname(staged), exist_ok=True)
+        self.paths[final] = staged
+        return staged
+
+    def read(self, final: str) -> str:
+        """Where to read the output final from: Its staged version if there's one, final otherwise."""
+        return self.paths.get(os.path.normpath(final), final)
+
+    def matching(self, pattern: str) -> list[str]:
+        """Outputs matching pattern (staged or not), each one where to read it from."""
+        finals = {os.path.normpath(p) for p in glob.glob(pattern)}
+        finals |= {f for f in self.paths if fnmatch.fnmatch(f, os.path.normpath(pattern))}
+        return [self.read(f) for f in sorted(finals)]
+
+    def save(self):
+        """Records the staged outputs, so they can be published by another process (see load)."""
+        os.makedirs(self.folder, exist_ok=True)
+        with open(os.path.join(self.folder, ManifestName), "w", encoding="utf8") as outfile:
+            json.dump(self.paths, outfile, indent=4)
+
+    @staticmethod
+    def load(folder: str = StagingFolder) -> "Staging | None":
+        """Outputs staged and saved by another process, None if there's none."""
+        manifest = os.path.join(folder, ManifestName)
+        if not os.path.isfile(manifest):
+            return None
+        staging = Staging(folder, clear=False)
+        with open(manifest, "r", encoding="utf8") as file:
+            staging.paths = json.load(file)
+        return staging
+
+    def publish(self):
+        """Moves the staged outputs into place."""
+        for final, staged in sorted(self.paths.items()):
+            os.makedirs(os.path.dirname(final) or ".", exist_ok=True)
+            if os.path.isdir(staged):
+                previous = final + ".old"
+                shutil.rmtree(previous, ignore_errors=True)
+                if os.path.isdir(final):
+                    os.replace(final, previous)
+                os.replace(staged, final)
+                shutil.rmtree(previous, ignore_errors=True)
+            else:
+                os.replace(staged, final)
+        self.discard()
+
+    def discard(self):
+        self.paths = {}
+        shutil.rmtree(self.folder, ignore_errors=True)
+
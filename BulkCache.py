@@ -0,0 +1,243 @@
+###############################################################################
+# Seekable local copy of the Scryfall bulk data (data/scryfall-*.jsonl.gz), used by the cache, arena and set stages of
+# ManageCardData.py.
+#
+# The downloaded file is a single gzip stream: It can only be decompressed sequentially, by one thread. It is recompressed
+# once into a multi-member gzip file (still a valid .gz file), each member ("frame") holding whole lines, with an index:
+#   {"source": [size, mtime] of the bulk data file,
+#    "frames": [[offset, compressed size, uncompressed size, lines, [sets]], ...],
+#    "sets": {set code: [[frame, start, end], ...]}}  (ranges of consecutive records of the set, offsets within the frame)
+# Frames are decompressed in parallel by a thread pool (zlib releases the GIL) and handed over in order, and scans limited to
+# some sets only decompress the frames containing them.
+#
+# Records can also be accessed by card id through BulkRecords: {base}.ids.bin holds one IdEntry per record (uuid bytes,
+# frame, offset in frame, length), sorted by id, and is binary searched through mmap.
+#
+# python BulkCache.py bench [bulk data path] [set code] compares full and partial scans against the plain gzip file.
+# python BulkCache.py get <card id> [bulk data path] prints a raw record.
+
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import zlib
+import mmap
+import bisect
+import struct
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+FrameSize = 1024 * 1024  # Uncompressed bytes per frame: Larger frames compress a bit better, smaller ones are faster to seek
+SetRegex = re.compile(rb'"set"\s*:\s*"([^"]+)"')
+IdRegex = re.compile(rb'"id"\s*:\s*"([^"]+)"')
+IdEntry = struct.Struct("<16sIII")  # uuid, frame, offset, length
+
+
+def cachePaths(bulk_path: str) -> tuple[str, str, str]:
+    base = bulk_path.removesuffix(".jsonl.gz")
+    return f"{base}.frames.gz", f"{base}.frames.json", f"{base}.ids.bin"
+
+
+def sourceStamp(bulk_path: str) -> list:
+    stat = os.stat(bulk_path)
+    return [stat.st_size, stat.st_mtime]
+
+
+def loadIndex(bulk_path: str) -> dict | None:
+    """Index of the seekable copy of bulk_path, None if missing or out of date."""
+    index_path = cachePaths(bulk_path)[1]
+    if not all(os.path.isfile(path) for path in cachePaths(bulk_path)):
+        return None
+    with open(index_path, "r", encoding="utf8") as file:
+        index = json.load(file)
+    return index if index["source"] == sourceStamp(bulk_path) else None
+
+
+def splitFrames(file, frame_size: int = FrameSize):
+    lines = []
+    size = 0
+    for line in file:
+        lines.append(line)
+        size += len(line)
+        if size >= frame_size:
+            yield b"".join(lines), len(lines)
+            lines, size = [], 0
+    if lines:
+        yield b"".join(lines), len(lines)
+
+
+def compressFrame(frame: tuple[bytes, int]) -> tuple[bytes, int, int, list]:
+    """Returns (compressed frame, size, line count, [(id, set, offset, length) of each record])."""
+    data, lines = frame
+    records = []
+    offset = 0
+    for line in data.splitlines(keepends=True):
+        id_match, set_match = IdRegex.search(line), SetRegex.search(line)
+        if id_match is not None and set_match is not None:
+            records.append((id_match.group(1).decode(), set_match.group(1).decode(), offset, len(line)))
+        offset += len(line)
+    return gzip.compress(data, compresslevel=6), len(data), lines, records
+
+
+def uuidBytes(cid: str) -> bytes:
+    return bytes.fromhex(cid.replace("-", ""))
+
+
+def recompress(bulk_path: str, workers: int | None = None, frame_size: int = FrameSize) -> dict:
+    """Writes the seekable copy of bulk_path and its indexes, returns the frame index.
+    Frames are compressed in a thread pool, at most 2 * workers at a time: Only these are held in memory."""
+    frames_path, index_path, ids_path = cachePaths(bulk_path)
+    index = {"source": sourceStamp(bulk_path), "frames": [], "sets": {}}
+    ids = []
+    offset = 0
+    workers = workers or min(8, os.cpu_count() or 1)
+
+    def write(compressed: bytes, size: int, lines: int, records: list):
+        nonlocal offset
+        n = len(index["frames"])
+        outfile.write(compressed)
+        index["frames"].append([offset, len(compressed), size, lines, sorted({r[1] for r in records})])
+        offset += len(compressed)
+        for cid, set_code, start, length in records:
+            ids.append(IdEntry.pack(uuidBytes(cid), n, start, length))
+            ranges = index["sets"].setdefault(set_code, [])
+            if ranges and ranges[-1][0] == n and ranges[-1][2] == start:
+                ranges[-1][2] = start + length
+            else:
+                ranges.append([n, start, start + length])
+
+    with gzip.open(bulk_path, "rb") as infile, open(frames_path + ".tmp", "wb") as outfile:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = []
+            for frame in splitFrames(infile, frame_size):
+                pending.append(executor.submit(compressFrame, frame))
+                if len(pending) >= 2 * workers:
+                    write(*pending.pop(0).result())
+            for future in pending:
+                write(*future.result())
+    os.replace(frames_path + ".tmp", frames_path)
+    ids.sort()
+    with open(ids_path, "wb") as outfile:
+        outfile.write(b"".join(ids))
+    with open(index_path, "w", encoding="utf8") as outfile:
+        json.dump(index, outfile)
+    return index
+
+
+def readFrame(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as file:
+        file.seek(offset)
+        compressed = file.read(length)
+    return zlib.decompress(compressed, wbits=16 + zlib.MAX_WBITS)
+
+
+def iterLines(bulk_path: str, index: dict, sets: set[str] | None = None, workers: int | None = None):
+    """Lines of the bulk data, from the frames containing any of sets (all of them if None).
+    Frames are decompressed ahead in a thread pool, at most 2 * workers at a time."""
+    frames_path = cachePaths(bulk_path)[0]
+    frames = [f for f in index["frames"] if sets is None or not sets.isdisjoint(f[4])]
+    workers = workers or min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for offset, length, *_ in frames:
+            pending.append(executor.submit(readFrame, frames_path, offset, length))
+            if len(pending) >= 2 * workers:
+                yield from pending.pop(0).result().splitlines(keepends=True)
+        for future in pending:
+            yield from future.result().splitlines(keepends=True)
+
+
+class BulkRecords:
+    """Random access to the records of the seekable copy, by card id or set."""
+
+    def __init__(self, bulk_path: str, index: dict):
+        self.frames_path, _, ids_path = cachePaths(bulk_path)
+        self.index = index
+        with open(ids_path, "rb") as file:
+            self.ids = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(ids_path) > 0 else b""
+        self.count = len(self.ids) // IdEntry.size
+        # Consecutive lookups often hit the same frames
+        self.frame = functools.lru_cache(maxsize=16)(self.readFrame)
+
+    def readFrame(self, n: int) -> bytes:
+        offset, length, *_ = self.index["frames"][n]
+        return readFrame(self.frames_path, offset, length)
+
+    def locate(self, cid: str) -> tuple[int, int, int] | None:
+        """(frame, offset in frame, length) of the record of card id cid."""
+        key = uuidBytes(cid)
+        ids = self.ids
+        i = bisect.bisect_left(range(self.count), key, key=lambda i: ids[i * IdEntry.size : i * IdEntry.size + 16])
+        if i == self.count or ids[i * IdEntry.size : i * IdEntry.size + 16] != key:
+            return None
+        return IdEntry.unpack_from(ids, i * IdEntry.size)[1:]
+
+    def raw(self, cid: str) -> bytes | None:
+        location = self.locate(cid)
+        if location is None:
+            return None
+        n, offset, length = location
+        return self.frame(n)[offset : offset + length]
+
+    def get(self, cid: str) -> dict | None:
+        raw = self.raw(cid)
+        # Lines of the older JSON array format end with a comma
+        return None if raw is None else json.loads(raw.rstrip(b",\r\n"))
+
+    def setLines(self, set_code: str):
+        """Raw lines of all the records of a set, only decompressing the frames holding them."""
+        for n, start, end in self.index["sets"].get(set_code, []):
+            yield from self.frame(n)[start:end].splitlines(keepends=True)
+
+
+def bench(bulk_path: str, set_code: str | None):
+    def timed(label: str, lines):
+        start = time.perf_counter()
+        count = sum(1 for _ in lines)
+        print(f"  {label:<40} {time.perf_counter() - start:7.2f}s ({count} lines)")
+
+    index = loadIndex(bulk_path)
+    if index is None:
+        start = time.perf_counter()
+        index = recompress(bulk_path)
+        print(f"  {'Recompression':<40} {time.perf_counter() - start:7.2f}s ({len(index['frames'])} frames)")
+    with gzip.open(bulk_path, "rb") as file:
+        timed("gzip, full scan", file)
+    for workers in sorted({1, min(8, os.cpu_count() or 1)}):
+        timed(f"frames, full scan, {workers} thread(s)", iterLines(bulk_path, index, workers=workers))
+    if set_code:
+        inSet = lambda line: (m := SetRegex.search(line)) is not None and m.group(1).decode() == set_code
+        with gzip.open(bulk_path, "rb") as file:
+            timed(f"gzip, set '{set_code}'", (l for l in file if inSet(l)))
+        timed(f"frames, set '{set_code}'", (l for l in iterLines(bulk_path, index, sets={set_code}) if inSet(l)))
+        records = BulkRecords(bulk_path, index)
+        timed(f"records, set '{set_code}' (set ranges)", records.setLines(set_code))
+        cids = [json.loads(line)["id"] for line in records.setLines(set_code)]
+        records.frame.cache_clear()
+        start = time.perf_counter()
+        for cid in cids:
+            records.locate(cid)
+        print(f"  {'id lookups (index only)':<40} {1e6 * (time.perf_counter() - start) / max(1, len(cids)):7.1f}µs per id")
+        start = time.perf_counter()
+        for cid in cids:
+            records.raw(cid)
+        print(f"  {'id lookups (record, warm frame cache)':<40} {1e6 * (time.perf_counter() - start) / max(1, len(cids)):7.1f}µs per id")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench(sys.argv[2] if len(sys.argv) > 2 else "data/scryfall-all-cards.jsonl.gz", sys.argv[3] if len(sys.argv) > 3 else None)
+    elif len(sys.argv) > 2 and sys.argv[1] == "get":
+        bulk_path = sys.argv[3] if len(sys.argv) > 3 else "data/scryfall-all-cards.jsonl.gz"
+        index = loadIndex(bulk_path)
+        if index is None:
+            print(f"No up to date seekable copy of {bulk_path}, run 'python ManageCardData.py dl' or the bench command.")
+            sys.exit(1)
+        raw = BulkRecords(bulk_path, index).raw(sys.argv[2])
+        print(raw.decode("utf8") if raw is not None else f"Card '{sys.argv[2]}' not found.")
+    else:
+        print("Usage: python BulkCache.py bench [bulk data path] [set code]")
+        print("       python BulkCache.py get <card id> [bulk data path]")
+        sys.exit(1)
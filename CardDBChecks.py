@@ -0,0 +1,204 @@
+###############################################################################
+# Invariants of the generated card data, checked at the end of ManageCardData.py (a failure exits with an error, so
+# WatchCardData.py doesn't publish the build).
+#
+# Each DB file (data/MTGCards.*.json) is read once, by a pool of workers running all the per-card checks at once; the
+# checks needing the whole DB (duplicates, references, comparison with the previous build) run on the merged scans.
+#   fields:         required card properties are present (e.g. mana_cost)
+#   faces:          back faces have a name and an image (in any language)
+#   duplicates:     a card id is in a single DB file, and a collector number is in boosters at most once per set (distinct
+#                   printings of a name, e.g. showcase or retro frame versions, are legitimate)
+#   references:     every card id in the Jumpstart boosters, The List, basic lands and compiled cubes exists
+#   rarity_counts:  no set lost cards of some rarity since the last successful build
+#   name_chars:     no control or replacement characters in names; new characters since the last build are reported
+# The statistics of the last successful build are kept in data/CardDBStats.json (staged and published with its outputs).
+# ManageCardData.py checks its staged outputs (see BuildStaging.py), before moving them into place.
+#
+# python CardDBChecks.py [--checks fields,references,...] [--no-fail-fast] checks the current outputs.
+
+import os
+import sys
+import json
+import glob
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, wait
+from LimitedRatings import poolExecutor
+from BuildStaging import Staging
+
+AllChecks = ["fields", "faces", "duplicates", "references", "rarity_counts", "name_chars"]
+RequiredFields = ["id", "name", "set", "rarity", "collector_number", "mana_cost", "type", "in_booster", "image_uris"]
+StatsPath = "data/CardDBStats.json"
+# Card id lists produced by the build: path pattern -> function returning the ids of a parsed file
+ReferenceSources = {
+    "src/data/JumpstartBoosters.json": lambda boosters: [cid for b in boosters for cid in b["cards"]],
+    "src/data/TheList/*.json": lambda lists: [cid for ids in lists.values() for cid in ids],
+    "src/data/BasicLandIDs.json": lambda lands: [cid for ids in lands.values() for cid in ids],
+    "data/cubes/compiled/*.json": lambda cube: [
+        cid for sheet in cube["sheets"].values() for cid in (sheet.get("cards") or {})
+    ],
+}
+
+
+def isForbiddenChar(char: str) -> bool:
+    return char == "�" or unicodedata.category(char) in ("Cc", "Cf", "Co", "Cs")
+
+
+def scanShard(path: str, checks: list[str]) -> dict:
+    """Per-card checks of one DB file, and what the whole-DB checks need from it."""
+    with open(path, "r", encoding="utf8") as file:
+        cards = json.load(file)
+    errors = []
+    in_booster = Counter()
+    rarity_counts = {}
+    name_chars = set()
+    for cid, c in cards.items():
+        if "fields" in checks:
+            missing = [field for field in RequiredFields if field not in c]
+            if missing:
+                errors.append(f"{path}: {cid} ({c.get('name')}) is missing {', '.join(missing)}.")
+            elif cid != c["id"]:
+                errors.append(f"{path}: {cid} ({c['name']}) is stored under another id ({c['id']}).")
+        if "faces" in checks and "back" in c:
+            back = c["back"]
+            if not back.get("name"):
+                errors.append(f"{path}: {cid} ({c.get('name')}) has an unnamed back face.")
+            if not back.get("image_uris"):
+                errors.append(f"{path}: {cid} ({c.get('name')}) has no back face image.")
+        if "name" not in c or "set" not in c:
+            continue
+        if c.get("in_booster") and "collector_number" in c:
+            in_booster[(c["set"], c["collector_number"])] += 1
+        if "rarity" in c:
+            counts = rarity_counts.setdefault(c["set"], {})
+            counts[c["rarity"]] = counts.get(c["rarity"], 0) + 1
+        name_chars.update(c["name"])
+        if "name_chars" in checks:
+            forbidden = [char for char in c["name"] if isForbiddenChar(char)]
+            if forbidden or c["name"] != c["name"].strip():
+                errors.append(f"{path}: {cid}: Invalid name {json.dumps(c['name'])}.")
+    return {
+        "ids": list(cards),
+        "errors": errors,
+        "in_booster": in_booster,
+        "rarity_counts": rarity_counts,
+        "name_chars": name_chars,
+    }
+
+
+def referencedIDs(staging: Staging | None = None) -> dict[str, list]:
+    references = {}
+    for pattern, extract in ReferenceSources.items():
+        for path in staging.matching(pattern) if staging else sorted(glob.glob(pattern)):
+            with open(path, "r", encoding="utf8") as file:
+                references[path] = extract(json.load(file))
+    return references
+
+
+def loadStats(path: str = StatsPath) -> dict | None:
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf8") as file:
+        return json.load(file)
+
+
+def checkCardDB(
+    db_files: list[str] | None = None,
+    checks: list[str] = AllChecks,
+    fail_fast: bool = True,
+    workers: int | None = None,
+    stats_path: str = StatsPath,
+    staging: Staging | None = None,
+) -> tuple[list[str], list[str]]:
+    """Runs the selected checks, returns (errors, warnings). The build statistics are saved (staged, with staging) if there's
+    no error.
+    With fail_fast, stops at the first DB file with errors. staging: Outputs of a build not published yet, checked instead
+    of the current ones (db_files should be the staged DB files)."""
+    unknown = set(checks) - set(AllChecks)
+    if unknown:
+        raise ValueError(f"Unknown card DB check(s): {', '.join(sorted(unknown))}")
+    db_files = db_files if db_files is not None else sorted(glob.glob("data/MTGCards.*.json"))
+    errors, warnings = [], []
+    scans = []
+    with poolExecutor(workers or min(len(db_files), os.cpu_count() or 1) or 1) as executor:
+        pending = {executor.submit(scanShard, path, checks) for path in db_files}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                scans.append(future.result())
+                errors += scans[-1]["errors"]
+            if errors and fail_fast:
+                for future in pending:
+                    future.cancel()
+                return errors, warnings
+
+    ids = set()
+    id_counts = Counter()
+    in_booster = Counter()
+    rarity_counts = {}
+    name_chars = set()
+    for scan in scans:
+        ids.update(scan["ids"])
+        id_counts.update(scan["ids"])
+        in_booster.update(scan["in_booster"])
+        for mtgset, counts in scan["rarity_counts"].items():
+            for rarity, count in counts.items():
+                rarity_counts.setdefault(mtgset, {})[rarity] = rarity_counts.get(mtgset, {}).get(rarity, 0) + count
+        name_chars |= scan["name_chars"]
+
+    if "duplicates" in checks:
+        for cid, count in sorted(id_counts.items()):
+            if count > 1:
+                errors.append(f"{cid} is in {count} DB files.")
+        for (mtgset, number), count in sorted(in_booster.items()):
+            if count > 1:
+                errors.append(f"{mtgset} #{number} is in boosters {count} times.")
+    if "references" in checks:
+        for path, referenced in referencedIDs(staging).items():
+            unresolved = sorted({str(cid) for cid in referenced if cid not in ids})
+            if unresolved:
+                errors.append(
+                    f"{path}: {len(unresolved)} unknown card id(s): {', '.join(unresolved[:5])}"
+                    + ("..." if len(unresolved) > 5 else "")
+                )
+
+    previous = loadStats(stats_path)
+    if previous is not None:
+        if "rarity_counts" in checks:
+            for mtgset, counts in sorted(previous["rarity_counts"].items()):
+                for rarity, count in sorted(counts.items()):
+                    current = rarity_counts.get(mtgset, {}).get(rarity, 0)
+                    if current < count:
+                        errors.append(f"{mtgset}: {current} {rarity} cards, {count} in the last build.")
+        if "name_chars" in checks:
+            new_chars = name_chars - set(previous["name_chars"])
+            if new_chars:
+                warnings.append(f"New characters in card names: {' '.join(sorted(new_chars))}")
+
+    if not errors:
+        # Staged along with the build outputs: Only becomes the reference once they are published
+        stats_output = staging.path(stats_path) if staging else stats_path
+        with open(stats_output + ".tmp", "w", encoding="utf8") as outfile:
+            json.dump(
+                {"rarity_counts": rarity_counts, "name_chars": "".join(sorted(name_chars))},
+                outfile,
+                ensure_ascii=False,
+                indent=4,
+            )
+        os.replace(stats_output + ".tmp", stats_output)
+    return errors, warnings
+
+
+if __name__ == "__main__":
+    checks = AllChecks
+    if "--checks" in sys.argv:
+        checks = sys.argv[sys.argv.index("--checks") + 1].split(",")
+    start = time.perf_counter()
+    errors, warnings = checkCardDB(checks=checks, fail_fast="--no-fail-fast" not in sys.argv)
+    for w in warnings:
+        print(w)
+    for e in errors:
+        print(e)
+    print(f"{len(errors)} error(s), {len(warnings)} warning(s) in {time.perf_counter() - start:.2f}s.")
+    sys.exit(1 if errors else 0)
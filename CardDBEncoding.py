@@ -0,0 +1,108 @@
+###############################################################################
+# Dictionary encoding of the card DB (MTGCards.*.json).
+#
+# Encoded file format:
+#   {"dictionaries": {field: [value, ...]}, "templates": ["image_uris"], "cards": {card id: card}}
+# where, for each field listed in "dictionaries", the card holds the index of its value in the dictionary instead of the
+# value itself, and image URIs are templated if "templates" lists them (see ImageURIs.py). Other fields are stored
+# unchanged. decodeCards is the reference decoder.
+# This is an optional offline output (--encoded) and its decoder is Python only: The server still loads MTGCards.*.json, the
+# reported size and parse time savings are what a loader of this format would get.
+
+import json
+import time
+from ImageURIs import templateImageURIs, expandImageURIs, imageURIReport
+
+EncodedFields = ["set", "rarity", "type", "subtypes", "mana_cost", "colors", "layout"]
+
+
+def valueKey(value) -> str:
+    # Lists (colors, subtypes) are not hashable
+    return json.dumps(value, ensure_ascii=False)
+
+
+def encodeCards(
+    cards: dict, fields: list[str] = EncodedFields, template_image_uris: bool = True, templated: bool = False
+) -> dict:
+    """templated: The image URIs of cards are already templated (e.g. those of CardDataSession.py), and kept as is."""
+    dictionaries = {field: [] for field in fields}
+    indices = {field: {} for field in fields}
+    encoded = {}
+    for cid, card in cards.items():
+        record = templateImageURIs(card, cid) if template_image_uris and not templated else dict(card)
+        for field in fields:
+            if field not in record:
+                continue
+            key = valueKey(record[field])
+            index = indices[field].get(key)
+            if index is None:
+                index = indices[field][key] = len(dictionaries[field])
+                dictionaries[field].append(record[field])
+            record[field] = index
+        encoded[cid] = record
+    templates = ["image_uris"] if template_image_uris or templated else []
+    return {"dictionaries": dictionaries, "templates": templates, "cards": encoded}
+
+
+def decodeCards(encoded: dict) -> dict:
+    dictionaries = encoded["dictionaries"]
+    cards = {}
+    expand = "image_uris" in encoded.get("templates", [])
+    for cid, record in encoded["cards"].items():
+        card = expandImageURIs(record, cid) if expand else dict(record)
+        for field, values in dictionaries.items():
+            if field in card:
+                card[field] = values[card[field]]
+        cards[cid] = card
+    return cards
+
+
+def jsonSize(value) -> int:
+    return len(json.dumps(value, ensure_ascii=False).encode("utf8"))
+
+
+def encodingReport(cards: dict, encoded: dict, templated: bool = False) -> dict:
+    """Size of each encoded field before and after encoding (including its dictionary), and overall parse times.
+    templated: cards were encoded with templated=True, there are no image URI savings to report."""
+    report = {"fields": {}}
+    for field, values in encoded["dictionaries"].items():
+        before = sum(jsonSize(c[field]) for c in cards.values() if field in c)
+        after = sum(jsonSize(r[field]) for r in encoded["cards"].values() if field in r) + jsonSize(values)
+        report["fields"][field] = {"distinct": len(values), "before": before, "after": after}
+    if "image_uris" in encoded.get("templates", []) and not templated:
+        report["image_uris"] = imageURIReport(cards, encoded["cards"])
+
+    plain_text = json.dumps(cards, ensure_ascii=False)
+    encoded_text = json.dumps(encoded, ensure_ascii=False)
+    start = time.perf_counter()
+    json.loads(plain_text)
+    plain_parse = time.perf_counter() - start
+    start = time.perf_counter()
+    decodeCards(json.loads(encoded_text))
+    encoded_parse = time.perf_counter() - start
+    report["total"] = {
+        "before": len(plain_text.encode("utf8")),
+        "after": len(encoded_text.encode("utf8")),
+        "parse_before": plain_parse,
+        "parse_after": encoded_parse,
+    }
+    return report
+
+
+def printEncodingReport(report: dict):
+    print(f"  {'Field':<12} {'Distinct':>8} {'Before':>12} {'After':>12} {'Saved':>7}")
+    for field, r in report["fields"].items():
+        saved = 100 * (1 - r["after"] / r["before"]) if r["before"] > 0 else 0
+        print(f"  {field:<12} {r['distinct']:>8} {r['before']:>12} {r['after']:>12} {saved:>6.1f}%")
+    if "image_uris" in report:
+        r = report["image_uris"]
+        saved = 100 * (1 - r["after"] / r["before"]) if r["before"] > 0 else 0
+        print(
+            f"  Image URIs: {r['templated']} templated, {r['kept']} kept as is, "
+            f"{r['before']} -> {r['after']} bytes ({saved:.1f}% saved)"
+        )
+    t = report["total"]
+    print(
+        f"  Total: {t['before']} -> {t['after']} bytes ({100 * (1 - t['after'] / t['before']):.1f}% saved), "
+        f"parse: {1000 * t['parse_before']:.0f}ms -> {1000 * t['parse_after']:.0f}ms (including decoding)"
+    )
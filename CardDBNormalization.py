@@ -0,0 +1,112 @@
+###############################################################################
+# Oracle-level / printing-level normalization of the card DB (MTGCards.*.json).
+#
+# Normalized format:
+#   Oracles.json:      {oracle_id: {field: value}} for the fields shared by all printings of a card (OracleFields)
+#   Printings.N.json:  {card id: {"oracle_id": ..., printing specific fields}}
+# For each oracle field, the oracle table holds the most common value among its printings. Printings that differ (e.g. per-set
+# ratings, color indicators) store their own value, which takes precedence, and printings lacking a field the oracle table
+# has list it in "_absent".
+# Image URIs are stored as given, templated when written from a CardDataSession (see ImageURIs.py).
+# NormalizedCardDB is the reference loader and rebuilds full card objects on demand, with expanded image URIs.
+# This is an optional offline output (--normalized) and its loader is Python only: The server still loads MTGCards.*.json, the
+# reported size savings are what a loader of this format would get.
+
+import os
+import json
+import glob
+from ImageURIs import expandImageURIs
+
+OracleFields = ["name", "mana_cost", "cmc", "colors", "type", "subtypes", "rating", "draft_effects"]
+
+
+def fieldKey(value) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def normalizeCards(cards: dict) -> tuple[dict, dict]:
+    """Returns (oracles, printings)."""
+    # Count values of each oracle field among printings
+    counts = {}
+    for card in cards.values():
+        fields = counts.setdefault(card["oracle_id"], {})
+        for field in OracleFields:
+            if field in card:
+                values = fields.setdefault(field, {})
+                key = fieldKey(card[field])
+                values[key] = values.get(key, 0) + 1
+    oracles = {}
+    for oracle_id, fields in counts.items():
+        oracles[oracle_id] = {field: json.loads(max(values, key=values.get)) for field, values in fields.items()}
+
+    printings = {}
+    for cid, card in cards.items():
+        oracle = oracles[card["oracle_id"]]
+        printing = {}
+        for field, value in card.items():
+            if field in oracle and fieldKey(value) == fieldKey(oracle[field]):
+                continue
+            printing[field] = value
+        absent = [field for field in oracle if field not in card]
+        if len(absent) > 0:
+            printing["_absent"] = absent
+        printings[cid] = printing
+    return oracles, printings
+
+
+def denormalizeCard(oracles: dict, printing: dict) -> dict:
+    card = {field: value for field, value in oracles[printing["oracle_id"]].items() if field not in printing.get("_absent", [])}
+    card.update(printing)
+    card.pop("_absent", None)
+    return card
+
+
+def writeNormalizedDB(cards: dict, folder: str, parts: int = 4) -> tuple[int, int]:
+    """Writes the normalized DB to folder, returns (oracles count, total bytes written)."""
+    os.makedirs(folder, exist_ok=True)
+    for f in glob.glob(f"{folder}/Printings.*.json"):
+        os.remove(f)
+    oracles, printings = normalizeCards(cards)
+    written = 0
+    with open(f"{folder}/Oracles.json", "w", encoding="utf8") as outfile:
+        json.dump(oracles, outfile, ensure_ascii=False)
+        written += outfile.tell()
+    items = list(printings.items())
+    for i in range(parts):
+        with open(f"{folder}/Printings.{i}.json", "w", encoding="utf8") as outfile:
+            json.dump(dict(items[i * len(items) // parts : (i + 1) * len(items) // parts]), outfile, ensure_ascii=False)
+            written += outfile.tell()
+    return len(oracles), written
+
+
+class NormalizedCardDB:
+    """Reference loader: Keeps the normalized tables in memory and rebuilds full card objects when accessed."""
+
+    def __init__(self, folder: str):
+        with open(f"{folder}/Oracles.json", "r", encoding="utf8") as file:
+            self.oracles = json.loads(file.read())
+        self.printings = {}
+        for f in sorted(glob.glob(f"{folder}/Printings.*.json")):
+            with open(f, "r", encoding="utf8") as file:
+                self.printings.update(json.loads(file.read()))
+        self.printings_by_oracle = {}
+        for cid, printing in self.printings.items():
+            self.printings_by_oracle.setdefault(printing["oracle_id"], []).append(cid)
+
+    def __len__(self):
+        return len(self.printings)
+
+    def __contains__(self, cid: str) -> bool:
+        return cid in self.printings
+
+    def __getitem__(self, cid: str) -> dict:
+        return expandImageURIs(denormalizeCard(self.oracles, self.printings[cid]), cid)
+
+    def get(self, cid: str, default=None):
+        return self[cid] if cid in self.printings else default
+
+    def ids(self):
+        return self.printings.keys()
+
+    def printingsOf(self, oracle_id: str) -> list[str]:
+        return list(self.printings_by_oracle.get(oracle_id, []))
@@ -0,0 +1,223 @@
+###############################################################################
+# Importable access to the built card data, for scripts, notebooks and tests.
+#
+# ManageCardData.py builds the card DB from MTGA and Scryfall data when run. A CardDataSession loads its outputs lazily (only
+# what is accessed, once) and keeps them in memory, so a single process can do several lookups and run several of the
+# downstream stages (ratings patch, features, alternative DB formats, name index) without reloading the DB every time.
+# ManageCardData.py runs these stages through a session built on the cards it just generated (see CardDataBuild), and
+# writes the DB files through it: The session knows which cards are in which file, stages never read them back. During a
+# build, the session reads and writes all its outputs (DB files and their other copies, printing indexes, name index, card
+# features) through the build's staging folder (see BuildStaging.py). Outside of a build, output folders are replaced as a
+# whole once complete.
+# Image URIs are templated in the DB files (see ImageURIs.py) and kept that way in memory (cards, and the outputs written
+# from them): card() expands them, they're only expanded when a card is used.
+#
+#   from CardDataSession import CardDataSession
+#   session = CardDataSession()
+#   session.findCard("Lightnig Bolt")            # -> card id (exact name, then normalized, then fuzzy match)
+#   session.printings(name="Lightning Bolt")     # -> card ids, most preferred first
+#   session.exportFeatures()
+
+import os
+import json
+import glob
+import functools
+import contextlib
+from LimitedRatings import cardRating, referenceRating
+from CardDBEncoding import encodeCards, encodingReport
+from CardDBNormalization import writeNormalizedDB
+from TranslationPacks import writeTranslationPacks
+from CardNameIndex import normalizeName, buildNameIndex, CardNameIndex
+from BuildStaging import Staging
+from ImageURIs import expandImageURIs
+
+
+def loadJSON(path: str):
+    with open(path, "r", encoding="utf8") as file:
+        return json.loads(file.read())
+
+
+class CardDataSession:
+    # Loaded on first access, cleared by reload()
+    CachedProperties = ["cards", "shards", "cards_by_name", "printings_by_name", "printings_by_oracle", "name_index"]
+    ShardCount = 4
+
+    def __init__(self, folder: str = "data", cards: dict | None = None, staging: Staging | None = None):
+        """cards: Already loaded card DB (e.g. while building it, with templated image URIs), read from the DB files in folder
+        otherwise.
+        staging: Outputs of the running build, written there and read from there once written."""
+        self.folder = folder
+        self.staging = staging
+        if cards is not None:
+            self.cards = cards
+
+    def inputPath(self, path: str) -> str:
+        return self.staging.read(path) if self.staging else path
+
+    def outputPath(self, path: str) -> str:
+        return self.staging.path(path) if self.staging else path
+
+    @contextlib.contextmanager
+    def outputFolder(self, folder: str):
+        """Where to write the output folder as a whole: In the build's staging folder, or outside of a build, in a temporary
+        folder replacing folder once complete."""
+        if self.staging:
+            yield self.staging.path(folder)
+            return
+        staging = Staging(f"{folder}.staging")
+        yield staging.path(folder)
+        staging.publish()
+
+    @property
+    def db_files(self) -> list[str]:
+        return sorted(glob.glob(f"{self.folder}/MTGCards.*.json"))
+
+    @functools.cached_property
+    def shards(self) -> dict[str, list[str]]:
+        """Card ids in each DB file. Reading them also loads the cards, if they aren't already."""
+        shards = {}
+        cards = {}
+        for f in self.db_files:
+            part = loadJSON(self.inputPath(f))
+            shards[f] = list(part)
+            cards.update(part)
+        self.__dict__.setdefault("cards", cards)
+        return shards
+
+    @functools.cached_property
+    def cards(self) -> dict:
+        """Cards by id, as stored (templated image URIs)."""
+        self.shards
+        return self.__dict__["cards"]
+
+    def shard(self, f: str) -> dict:
+        return {cid: self.cards[cid] for cid in self.shards[f]}
+
+    @functools.cached_property
+    def cards_by_name(self) -> dict:
+        return loadJSON(self.inputPath(f"{self.folder}/CardsByName.json"))
+
+    @functools.cached_property
+    def printings_by_name(self) -> dict:
+        return loadJSON(self.inputPath(f"{self.folder}/PrintingsByName.json"))
+
+    @functools.cached_property
+    def printings_by_oracle(self) -> dict:
+        return loadJSON(self.inputPath(f"{self.folder}/PrintingsByOracle.json"))
+
+    @functools.cached_property
+    def name_index(self) -> CardNameIndex:
+        return CardNameIndex(self.inputPath(f"{self.folder}/CardNameIndex.json"))
+
+    def reload(self):
+        """Drops loaded data, it will be read again from disk on next access (e.g. after a build in another process)."""
+        for name in self.CachedProperties:
+            self.__dict__.pop(name, None)
+
+    ###########################################################################
+    # Lookups
+
+    def card(self, cid: str) -> dict | None:
+        """Copy of the card, with its image URIs expanded."""
+        card = self.cards.get(cid)
+        return expandImageURIs(card, cid) if card is not None else None
+
+    def findCard(self, name: str, fuzzy: bool = True, min_score: float = 0.5) -> str | None:
+        """Preferred card id for name: Exact (case insensitive) match first, then the normalized and fuzzy name index."""
+        cid = self.cards_by_name.get(name.lower())
+        if cid is not None or not fuzzy:
+            return cid
+        match = self.name_index.lookup(name, min_score)
+        return match[0] if match else None
+
+    def printings(self, name: str | None = None, oracle_id: str | None = None) -> list[str]:
+        """Every printing of a card, by name or oracle id, most preferred first."""
+        if oracle_id is not None:
+            return self.printings_by_oracle.get(oracle_id, [])
+        if name is None:
+            raise ValueError("printings: Either name or oracle_id is required")
+        return self.printings_by_name.get(name.lower()) or self.printings_by_name.get(normalizeName(name), [])
+
+    ###########################################################################
+    # Stages (operating on the loaded cards)
+
+    def writeShard(self, f: str):
+        # Replaced atomically: A server (re)starting during the build never sees a partially written file.
+        path = self.outputPath(f)
+        with open(path + ".tmp", "w", encoding="utf8") as outfile:
+            json.dump(self.shard(f), outfile, ensure_ascii=False, indent=4)
+        os.replace(path + ".tmp", path)
+
+    def writeShards(self, count: int = ShardCount) -> dict[str, list[str]]:
+        """Splits the cards into count DB files (in card order) and writes them. Returns the card ids of each file."""
+        ids = list(self.cards)
+        self.shards = {
+            f"{self.folder}/MTGCards.{i}.json": ids[i * len(ids) // count : (i + 1) * len(ids) // count] for i in range(count)
+        }
+        for f in self.shards:
+            self.writeShard(f)
+        return self.shards
+
+    def patchRatings(self, ratings: dict, reference_ratings: dict) -> dict[str, int]:
+        """Updates ratings of non-basic cards from ratings ({set: {name: rating}}), and the DB files holding them. Cards it
+        doesn't rate (anymore) get their reference (CubeCobra) rating back. Returns the number of updated cards per file."""
+        report = {}
+        for f, ids in self.shards.items():
+            updated = 0
+            for cid in ids:
+                c = self.cards[cid]
+                if c["type"].startswith("Basic"):
+                    continue
+                rating = cardRating(ratings, c)
+                if rating is None:
+                    rating = referenceRating(reference_ratings, c["oracle_id"], c["rarity"])
+                if c["rating"] == rating:
+                    continue
+                c["rating"] = rating
+                updated += 1
+            if updated > 0:
+                self.writeShard(f)
+            report[f] = updated
+        return report
+
+    def exportFeatures(self, folder: str | None = None) -> int:
+        from CardFeatures import exportCardFeatures  # Requires numpy
+
+        folder = folder or f"{self.folder}/CardFeatures"
+        with self.outputFolder(folder) as output:
+            return exportCardFeatures(self.cards, output, previous=folder)
+
+    def writeEncoded(self, folder: str | None = None) -> dict:
+        """Dictionary encoded copy of each DB file (see CardDBEncoding.py). Returns the encoding report of each file."""
+        folder = folder or f"{self.folder}/encoded"  # Not next to the regular DB files: The server loads all of them
+        reports = {}
+        with self.outputFolder(folder) as output:
+            os.makedirs(output, exist_ok=True)
+            for f in self.shards:
+                part = self.shard(f)
+                encoded = encodeCards(part, templated=True)
+                reports[f] = encodingReport(part, encoded, templated=True)
+                with open(f"{output}/{os.path.basename(f)}", "w", encoding="utf8") as outfile:
+                    json.dump(encoded, outfile, ensure_ascii=False)
+        return reports
+
+    def writeNormalized(self, folder: str | None = None) -> tuple[int, int, int]:
+        """Oracle/printing normalized copy of the DB (see CardDBNormalization.py).
+        Returns (oracles count, plain size, normalized size), both sizes unindented."""
+        with self.outputFolder(folder or f"{self.folder}/normalized") as output:
+            oracle_count, normalized_size = writeNormalizedDB(self.cards, output)
+        plain_size = sum(len(json.dumps(self.shard(f), ensure_ascii=False).encode("utf8")) for f in self.shards)
+        return oracle_count, plain_size, normalized_size
+
+    def writeTranslationPacks(self, folder: str | None = None) -> dict:
+        folder = folder or f"{self.folder}/translations"
+        with self.outputFolder(folder) as output:
+            return writeTranslationPacks(self.cards, output, previous=folder)
+
+    def writeNameIndex(self, path: str | None = None) -> dict:
+        path = path or f"{self.folder}/CardNameIndex.json"
+        index = buildNameIndex(self.cards, self.cards_by_name)
+        with open(self.outputPath(path), "w", encoding="utf8") as outfile:
+            json.dump(index, outfile, ensure_ascii=False)
+        self.__dict__.pop("name_index", None)
+        return index
@@ -0,0 +1,90 @@
+###############################################################################
+# Columnar numeric features of each card (one .npy file per column, load with numpy.load(path, mmap_mode="r")).
+# Row i of every column describes card_ids[i]. Row indices are stable across builds: new cards are appended (sorted by id)
+# and cards removed from the DB keep their row as a tombstone (present is False, the other columns are zeroed). Likewise,
+# set codes (schema.json "sets", indexed by the set column) are only ever appended.
+# Written by the 'features' stage of ManageCardData.py (requires numpy), to a separate folder replacing the previous one as a
+# whole once all columns are written (see CardDataSession.exportFeatures): Readers never see columns of different builds.
+
+import os
+import json
+
+ColorBits = {"W": 1, "U": 2, "B": 4, "R": 8, "G": 16}
+TypeBits = {
+    "Creature": 1,
+    "Land": 2,
+    "Instant": 4,
+    "Sorcery": 8,
+    "Enchantment": 16,
+    "Artifact": 32,
+    "Planeswalker": 64,
+    "Battle": 128,
+    "Legendary": 256,
+    "Basic": 512,
+}
+RarityCodes = {"common": 0, "uncommon": 1, "rare": 2, "mythic": 3, "special": 4, "bonus": 5}
+
+
+def exportCardFeatures(cards: dict, folder: str, previous: str | None = None) -> int:
+    """previous: Folder of the previous export (rows and set codes are kept), folder itself by default.
+    Returns the number of rows written (including tombstones)."""
+    import numpy as np
+
+    previous = previous or folder
+    os.makedirs(folder, exist_ok=True)
+    ids = []
+    if os.path.isfile(f"{previous}/card_ids.npy"):
+        ids = np.load(f"{previous}/card_ids.npy").tolist()
+    known = set(ids)
+    ids.extend(sorted(cid for cid in cards if cid not in known))
+
+    sets = []
+    if os.path.isfile(f"{previous}/schema.json"):
+        with open(f"{previous}/schema.json", "r", encoding="utf8") as file:
+            sets = json.load(file)["sets"]
+    known_sets = set(sets)
+    sets.extend(sorted({c["set"] for c in cards.values()} - known_sets))
+    set_index = {s: i for i, s in enumerate(sets)}
+    columns = {
+        "card_ids": np.array(ids, dtype="<U36"),
+        "present": np.zeros(len(ids), dtype=np.bool_),
+        "rating": np.zeros(len(ids), dtype=np.float32),
+        "cmc": np.zeros(len(ids), dtype=np.int16),
+        "colors": np.zeros(len(ids), dtype=np.uint8),
+        "types": np.zeros(len(ids), dtype=np.uint16),
+        "rarity": np.zeros(len(ids), dtype=np.uint8),
+        "set": np.zeros(len(ids), dtype=np.int16),
+        "in_booster": np.zeros(len(ids), dtype=np.bool_),
+        "arena_id": np.full(len(ids), -1, dtype=np.int32),
+    }
+    for i, cid in enumerate(ids):
+        if cid not in cards:
+            continue
+        c = cards[cid]
+        columns["present"][i] = True
+        columns["rating"][i] = c["rating"]
+        # cmc and colors were derived from the mana cost by parseCost when building the cache
+        columns["cmc"][i] = c["cmc"]
+        columns["colors"][i] = sum(ColorBits[color] for color in c["colors"] if color in ColorBits)
+        columns["types"][i] = sum(bit for t, bit in TypeBits.items() if t in c["type"].split())
+        columns["rarity"][i] = RarityCodes.get(c["rarity"], RarityCodes["special"])
+        columns["set"][i] = set_index[c["set"]]
+        columns["in_booster"][i] = c["in_booster"]
+        if "arena_id" in c:
+            columns["arena_id"][i] = c["arena_id"]
+    for name, column in columns.items():
+        np.save(f"{folder}/{name}.npy", column)
+    with open(f"{folder}/schema.json", "w", encoding="utf8") as outfile:
+        json.dump(
+            {
+                "rows": len(ids),
+                "sets": sets,
+                "colors": ColorBits,
+                "types": TypeBits,
+                "rarity": RarityCodes,
+                "columns": {name: str(column.dtype) for name, column in columns.items()},
+            },
+            outfile,
+            indent=4,
+        )
+    return len(ids)
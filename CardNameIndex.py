@@ -0,0 +1,122 @@
+###############################################################################
+# Normalized and fuzzy card name index (data/CardNameIndex.json).
+#
+# Names are normalized (accents folded, quotes/dashes/whitespace normalized, Arena style ' /// ' separators, lower case) and
+# mapped to the preferred card id of CardsByName.json. Flavor names and printed names in every language are included.
+# Lookups also accept Arena rebalanced names ('A-' prefix) for cards without a rebalanced version.
+# A trigram index over the normalized names allows fuzzy suggestions for typos.
+#
+# Format: {"names": [normalized name, ...], "ids": [card id, ...], "trigrams": {trigram: [name index, ...]}}
+#
+# python CardNameIndex.py "some card name" prints the best match.
+
+import sys
+import json
+import time
+import unicodedata
+
+# Fuzzy lookups: Candidates are gathered from at least CandidateTrigrams trigrams of the query (rarest first), then more
+# as long as the number of candidates stays under MaxCandidates.
+CandidateTrigrams = 3
+MaxCandidates = 500
+
+CharReplacements = str.maketrans(
+    {
+        "‘": "'",
+        "’": "'",
+        "‚": "'",
+        "‛": "'",
+        "`": "'",
+        "´": "'",
+        "“": '"',
+        "”": '"',
+        "„": '"',
+        "‐": "-",
+        "‑": "-",
+        "‒": "-",
+        "–": "-",
+        "—": "-",
+        " ": " ",
+        "æ": "ae",
+        "Æ": "ae",
+    }
+)
+
+
+def normalizeName(name: str) -> str:
+    name = name.translate(CharReplacements)
+    name = "".join(ch for ch in unicodedata.normalize("NFKD", name) if not unicodedata.combining(ch))
+    name = name.lower().replace(" /// ", " // ")
+    return " ".join(name.split())
+
+
+def trigrams(normalized: str) -> set[str]:
+    padded = f"  {normalized} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def buildNameIndex(cards: dict, cards_by_name: dict) -> dict:
+    """cards_by_name: Content of CardsByName.json (lower case name -> preferred card id)."""
+    ids_by_name = {}
+    # Exact names (and aliases) first, so they take precedence over translations colliding after normalization.
+    for name, cid in cards_by_name.items():
+        ids_by_name.setdefault(normalizeName(name), cid)
+    for c in cards.values():
+        preferred = cards_by_name.get(c["name"].lower(), c["id"])
+        for printed_name in c.get("printed_names", {}).values():
+            ids_by_name.setdefault(normalizeName(printed_name), preferred)
+            if " // " in printed_name:
+                ids_by_name.setdefault(normalizeName(printed_name.split(" //")[0]), preferred)
+    names = sorted(ids_by_name)
+    postings = {}
+    for i, name in enumerate(names):
+        for trigram in trigrams(name):
+            postings.setdefault(trigram, []).append(i)
+    return {"names": names, "ids": [ids_by_name[n] for n in names], "trigrams": postings}
+
+
+class CardNameIndex:
+    def __init__(self, path: str = "data/CardNameIndex.json"):
+        with open(path, "r", encoding="utf8") as file:
+            index = json.loads(file.read())
+        self.names = index["names"]
+        self.ids = index["ids"]
+        self.exact = {name: i for i, name in enumerate(self.names)}
+        self.trigrams = index["trigrams"]
+        self.name_trigrams = [frozenset(trigrams(name)) for name in self.names]
+
+    def lookup(self, name: str, min_score: float = 0.5) -> tuple[str, float, str] | None:
+        """Returns (card id, score in [0, 1], matched normalized name) of the best match, or None."""
+        normalized = normalizeName(name)
+        if normalized in self.exact:
+            i = self.exact[normalized]
+            return self.ids[i], 1.0, normalized
+        # Arena rebalanced cards ('A-' prefix) fall back to the original card if the rebalanced version isn't known.
+        if normalized.startswith("a-") and normalized[2:] in self.exact:
+            i = self.exact[normalized[2:]]
+            return self.ids[i], 1.0, normalized[2:]
+        query = trigrams(normalized)
+        # Common trigrams like ' th' match thousands of names: Start from the rarest ones.
+        postings = sorted((self.trigrams.get(t, ()) for t in query), key=len)
+        candidates = set()
+        for n, posting in enumerate(postings):
+            if n >= CandidateTrigrams and len(candidates) + len(posting) > MaxCandidates:
+                break
+            candidates.update(posting)
+        best, best_score = None, 0.0
+        for i in candidates:
+            # Dice coefficient
+            score = 2 * len(query & self.name_trigrams[i]) / (len(query) + len(self.name_trigrams[i]))
+            if score > best_score:
+                best, best_score = i, score
+        if best is None or best_score < min_score:
+            return None
+        return self.ids[best], best_score, self.names[best]
+
+
+if __name__ == "__main__":
+    index = CardNameIndex()
+    for query in sys.argv[1:]:
+        start = time.perf_counter()
+        result = index.lookup(query)
+        print(f"{query!r}: {result} ({1e6 * (time.perf_counter() - start):.0f}µs)")
@@ -0,0 +1,926 @@
+###############################################################################
+# Columnar engine for the card data cache (python ManageCardData.py cache --engine columnar), requires polars.
+#
+# The dict engine (preprocessBulkData, generateCards and rankPrintingGroups in ManageCardData.py) decodes every record of the
+# bulk data into Python objects, and merges the translations and ranks the printings one record at a time. This engine reads
+# the bulk data in batches of lines with polars (only the properties it needs, without a Python object per record) and runs
+# these steps as columnar operations:
+#   - the language selection and fallback of readBulkData, the layout and variation filters, the type line and oracle id
+#     checks of generateCards
+#   - the reversible card name fix and the arena_id lookup chain (left joins against the MTGA (name, collector_number, set)
+#     table, coalesced in the order of lookupArenaID)
+#   - the Translations pivot: printed names and image URIs by language of each (name, set, collector_number), back faces
+#   - the ranking of the printings of each name and oracle id: A sort on the criteria of selectCard
+# Only the English records (and the first record of printings without one) are decoded, to go through prepareRecord and
+# cardSelection like in the dict engine: Their per-card rules (booster rules, ratings, mana costs) aren't vectorized.
+# The card DB and printing indexes are identical to the dict engine's, in the same order. Groups of printings the sort can't
+# order like selectCard (ties selectCard resolves by list order, collector numbers compared both as numbers and as strings)
+# are ranked by rankPrintings instead.
+#
+# python ColumnarPreprocess.py bench [bulk data path] [--languages en,fr,...] [--mtga <MTGA folder>] times both engines and
+#   checks their outputs match. Without a bulk data path, a synthetic one is generated (--cards <count>, 20000 by default,
+#   see syntheticBulkData).
+
+import io
+import os
+import sys
+import json
+import gzip
+import time
+import uuid
+import random
+import tempfile
+
+import polars as pl
+
+from BoosterRules import loadRules
+from ManageCardData import (
+    KeptProperties,
+    MTGASetConversions,
+    BoosterRulesPath,
+    ManaSymbolsFile,
+    BuildOptions,
+    CardDataBuild,
+    copyFromFaces,
+    handleTypeLine,
+    indexedName,
+    updateImageCandidates,
+)
+
+BatchLines = 20000  # Records parsed at once: Larger batches use more threads per parse, but hold more lines in memory
+KeyColumns = ["name", "set", "collector_number"]
+ExcludedLayouts = ["token", "double_faced_token", "art_series"]
+KeptEmblems = ["Essence of Ajani"]  # Playtest emblem that can played as a normal card, other emblems are excluded
+BackFaceLayouts = ["transform", "modal_dfc", "reversible_card"]
+# Ranking criteria of selectCard, best printings first: (column, descending)
+RankingCriteria = [
+    ("non_processed", False),
+    ("conjure", False),
+    ("vma", False),
+    ("arena_primary", True),
+    ("has_arena", True),
+    ("etched", False),
+    ("special_frame", False),
+    ("highres", True),
+    ("primary_set", True),
+    ("promo", False),
+    ("released_at", True),
+]
+
+
+def bulkSchema() -> dict:
+    """Properties of the Scryfall records read by polars, others are skipped while parsing."""
+    image = pl.Struct({"border_crop": pl.String})
+    face = pl.Struct(
+        {"name": pl.String, "printed_name": pl.String, "type_line": pl.String, "oracle_id": pl.String, "image_uris": image}
+    )
+    return {
+        "id": pl.String,
+        "oracle_id": pl.String,
+        "name": pl.String,
+        "printed_name": pl.String,
+        "lang": pl.String,
+        "released_at": pl.String,
+        "layout": pl.String,
+        "image_status": pl.String,
+        "image_uris": image,
+        "type_line": pl.String,
+        "set": pl.String,
+        "collector_number": pl.String,
+        "variation": pl.Boolean,
+        "arena_id": pl.Int64,
+        "promo": pl.Boolean,
+        "finishes": pl.List(pl.String),
+        "frame_effects": pl.List(pl.String),
+        "frame": pl.String,
+        "card_faces": pl.List(face),
+    }
+
+
+def blockLines(file, block_size: int = 1 << 22):
+    """Lines of a binary file, read by blocks (much cheaper than readline on a gzip file)."""
+    rest = b""
+    while block := file.read(block_size):
+        lines = (rest + block).split(b"\n")
+        rest = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if rest:
+        yield rest
+
+
+def lineBatches(lines, size: int):
+    batch = []
+    for line in lines:
+        if line.strip():
+            batch.append(line if line.endswith(b"\n") else line + b"\n")
+            if len(batch) == size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def face(n: int) -> pl.Expr:
+    return pl.col("card_faces").list.get(n, null_on_oob=True)
+
+
+def fromFaces(prop: str) -> tuple[pl.Expr, pl.Expr]:
+    """(found, value) of prop, possibly copied from the card faces: Same rules as copyFromFaces."""
+    top, first, second = pl.col(prop), face(0).struct.field(prop), face(1).struct.field(prop)
+    found = (
+        top.is_not_null()
+        | ((pl.col("card_faces").list.len() > 1) & first.is_not_null() & second.is_not_null() & (first == second))
+        | ((pl.col("layout") == "reversible_card") & first.is_not_null())
+    ).fill_null(False)
+    return found, pl.when(top.is_not_null()).then(top).when(found).then(first)
+
+
+def fixedNames() -> list[pl.Expr]:
+    """Same as fixName: The fixed name, and the name of the front face."""
+    parts = pl.col("name").str.splitn(" //", 3)
+    first, second, third = parts.struct.field("field_0"), parts.struct.field("field_1"), parts.struct.field("field_2")
+    return [
+        pl.when(third.is_not_null() & ~third.str.contains(" //", literal=True) & (first == third.str.strip_chars()))
+        .then(first + " //" + second)
+        .when(second.is_not_null() & (first == second.str.strip_chars()))
+        .then(first)
+        .otherwise(pl.col("name"))
+        .alias("name"),
+        first.alias("front_name"),
+    ]
+
+
+def mtgaFrame(arena_ids: dict) -> pl.DataFrame:
+    keys = [k for k in arena_ids if all(isinstance(v, str) for v in k)]
+    return pl.DataFrame(
+        {
+            "m_name": [k[0] for k in keys],
+            "m_number": [k[1] for k in keys],
+            "m_set": [k[2] for k in keys],
+            "m_arena_id": [arena_ids[k] for k in keys],
+        },
+        schema={"m_name": pl.String, "m_number": pl.String, "m_set": pl.String, "m_arena_id": pl.Int64},
+    )
+
+
+def arenaJoin(df: pl.DataFrame, mtga: pl.DataFrame) -> pl.DataFrame:
+    """Adds the arena_id of each record looked up like lookupArenaID: (name, number, set), (front name, number, set),
+    (name, "Digital", set), (front name, "Digital", set), then the first two with the converted MTGA set code."""
+    conversions = pl.DataFrame(
+        {"mtga_set": list(MTGASetConversions), "converted_set": list(MTGASetConversions.values())},
+        schema={"mtga_set": pl.String, "converted_set": pl.String},
+    )
+    df = df.with_columns(pl.col("set").str.to_lowercase().alias("mtga_set"), pl.lit("Digital").alias("digital"))
+    df = df.join(conversions, on="mtga_set", how="left", maintain_order="left")
+    lookups = [
+        ("name", "collector_number", "mtga_set"),
+        ("front_name", "collector_number", "mtga_set"),
+        ("name", "digital", "mtga_set"),
+        ("front_name", "digital", "mtga_set"),
+        ("name", "collector_number", "converted_set"),
+        ("front_name", "collector_number", "converted_set"),
+    ]
+    for n, keys in enumerate(lookups):
+        df = df.join(
+            mtga.rename({"m_arena_id": f"arena_id_{n}"}),
+            left_on=list(keys),
+            right_on=["m_name", "m_number", "m_set"],
+            how="left",
+            maintain_order="left",
+        )
+    return df.with_columns(pl.coalesce([f"arena_id_{n}" for n in range(len(lookups))]).alias("joined_arena_id")).drop(
+        [f"arena_id_{n}" for n in range(len(lookups))] + ["digital", "converted_set"]
+    )
+
+
+def languageValues(rows: pl.DataFrame, value: pl.Expr) -> dict:
+    """{(name, set, collector_number): {lang: value}} of rows (in record order), like the successive assignments of
+    generateCards: Languages in order of first value, the last value of each."""
+    df = rows.select(*KeyColumns, "lang", value.alias("value")).filter(pl.col("value").is_not_null())
+    df = df.group_by([*KeyColumns, "lang"], maintain_order=True).agg(pl.col("value").last())
+    df = df.group_by(KeyColumns, maintain_order=True).agg("lang", "value")
+    return {(n, s, cn): dict(zip(langs, values)) for n, s, cn, langs, values in df.iter_rows()}
+
+
+class ColumnarCards:
+    """Card DB and ranked printings of the bulk data, see columnarCards."""
+
+    def __init__(self, build: CardDataBuild, batch_lines: int = BatchLines):
+        self.build = build
+        self.batch_lines = batch_lines
+        self.mtga = mtgaFrame(build.arena_ids)
+        self.image_names = list(build.akr_cards) + list(build.klr_cards)
+        self.handled = 0
+        self.copied = 0
+        self.seen_ids = set()  # Ids of the cards created by generateCards so far
+        self.rows = []  # Columns of the valid records (see keepRows), per batch
+        self.records = []  # (position, record) of the English records, decoded
+        self.image_rows = []  # Candidates for AKR/KLR card images and AKR/KLR records, per batch
+        self.english_keys = pl.DataFrame(schema={k: pl.String for k in KeyColumns})
+        self.non_english = None  # First valid record of each printing with no English one so far
+
+    def read(self):
+        build = self.build
+        languages = build.options.languages
+        with build.openBulkData() as file:
+            file = blockLines(file) if hasattr(file, "read") else file
+            lines = build.withCachedTranslations(file) if build.options.default_cards else file
+            print("\rPreProcessing... ", end="", flush=True)
+            if languages is None:
+                pos = 0
+                for batch in lineBatches(lines, self.batch_lines):
+                    self.processBatch(self.parse(batch), batch, pos)
+                    pos += len(batch)
+                    print(f"\rPreProcessing...    {self.copied}/{self.handled} cards added...", end="", flush=True)
+            else:
+                self.readLanguages(lines, languages)
+        print(f"\rPreProcessing done! {self.copied}/{self.handled} cards added.")
+
+    def readLanguages(self, lines, languages: set[str]):
+        """Same selection and order as readBulkData: Records in the selected languages, then the first record of each
+        printing not available in any of them."""
+        kept_keys = pl.DataFrame(schema={k: pl.String for k in KeyColumns})
+        fallback = pl.DataFrame(schema={**{k: pl.String for k in KeyColumns}, "raw": pl.Binary})
+        pos = 0
+        dropped = 0
+        selected = pl.col("lang").is_null() | pl.col("lang").is_in(sorted(languages))
+        for batch in lineBatches(lines, self.batch_lines):
+            df = self.parse(batch)
+            kept = df.filter(selected)
+            batch_keys = kept.select(KeyColumns).unique()
+            kept_keys = kept_keys.vstack(batch_keys)
+            others = df.filter(~selected & pl.all_horizontal([pl.col(k).is_not_null() for k in KeyColumns]))
+            dropped += df.height - kept.height
+            others = (
+                others.unique(subset=KeyColumns, keep="first", maintain_order=True)
+                .join(kept_keys, on=KeyColumns, how="anti")
+                .join(fallback.select(KeyColumns), on=KeyColumns, how="anti")
+            )
+            fallback = pl.concat(
+                [
+                    fallback.join(batch_keys, on=KeyColumns, how="anti", maintain_order="left"),
+                    others.select(*KeyColumns, pl.Series("raw", [batch[n] for n in others["line"]], dtype=pl.Binary)),
+                ]
+            )
+            self.processBatch(kept, batch, pos)
+            pos += kept.height
+            print(f"\rPreProcessing...    {self.copied}/{self.handled} cards added...", end="", flush=True)
+        print(f"\rPreProcessing... {dropped} records in other languages skipped, {fallback.height} of them kept as fallback.")
+        lines = fallback["raw"].to_list()
+        if lines:
+            self.processBatch(self.parse(lines), lines, pos)
+
+    def parse(self, lines: list[bytes]) -> pl.DataFrame:
+        return pl.read_ndjson(io.BytesIO(b"".join(lines)), schema=bulkSchema()).with_row_index("line")
+
+    def processBatch(self, df: pl.DataFrame, lines: list[bytes], start: int):
+        """Filters and checks the records of df (with their index in lines), keeps the columns of the valid ones and decodes
+        the English ones. start: Position of the first one in the whole (selected) bulk data."""
+        df = df.with_columns((pl.int_range(pl.len(), dtype=pl.UInt32) + start).alias("pos"))
+        df = df.filter(~pl.col("layout").is_in(ExcludedLayouts).fill_null(False))
+        self.handled += df.height
+        excluded = (
+            (pl.col("layout") == "emblem").fill_null(False) & ~pl.col("name").is_in(KeptEmblems).fill_null(False)
+        ) | (pl.col("variation").fill_null(False) & (pl.col("set") != "arn").fill_null(True))
+        df = df.filter(~excluded)
+        self.copied += df.height
+        df = df.with_columns(pl.col("name").alias("raw_name")).with_columns(fixedNames())
+        self.image_rows.append(
+            df.filter(pl.col("raw_name").is_in(self.image_names) | pl.col("set").is_in(["akr", "klr"])).select(
+                "pos", "raw_name", "name", "set", "lang", "released_at", "frame", "image_uris"
+            )
+        )
+
+        df = arenaJoin(df, self.mtga)
+        type_found, _ = fromFaces("type_line")
+        oracle_found, oracle_id = fromFaces("oracle_id")
+        df = df.with_columns(type_found.alias("type_found"), oracle_found.alias("oracle_found"), oracle_id.alias("oracle"))
+        for name in df.filter(~pl.col("type_found"))["name"]:
+            print(f"Warning: Missing 'type_line' for card '{name}'.")
+        df = df.filter(pl.col("type_found"))
+
+        # The oracle id is only checked the first time an id shows up (when generateCards creates the card)
+        ids = df["id"].to_list()
+        if self.seen_ids.isdisjoint(ids) and df["id"].is_unique().all():
+            first = [True] * len(ids)
+            self.seen_ids.update(df.filter(pl.col("oracle_found"))["id"])
+        else:
+            first = []
+            for cid, found in zip(ids, df["oracle_found"]):
+                first.append(cid not in self.seen_ids)
+                if found:
+                    self.seen_ids.add(cid)
+        df = df.with_columns(pl.Series("first", first, dtype=pl.Boolean))
+        for name in df.filter(pl.col("first") & ~pl.col("oracle_found"))["name"]:
+            print(f"Warning: Missing 'oracle_id' for card '{name}'.")
+        df = df.filter(~pl.col("first") | pl.col("oracle_found"))
+
+        english = df.filter(pl.col("lang") == "en")
+        for pos, line, arena_id, first in english.select("pos", "line", "joined_arena_id", "first").iter_rows():
+            self.records.append((pos, self.decode(lines[line], arena_id, first)))
+        english_keys = english.select(KeyColumns).unique()
+        self.english_keys = self.english_keys.vstack(english_keys)
+        others = (
+            df.filter(pl.col("lang") != "en")
+            .unique(subset=KeyColumns, keep="first", maintain_order=True)
+            .join(self.english_keys, on=KeyColumns, how="anti", maintain_order="left")
+        )
+        others = others.select(
+            *KeyColumns,
+            "pos",
+            "joined_arena_id",
+            "first",
+            pl.Series("raw", [lines[n] for n in others["line"]], dtype=pl.Binary),
+        )
+        if self.non_english is None:
+            self.non_english = others
+        else:
+            self.non_english = pl.concat(
+                [
+                    self.non_english.join(english_keys, on=KeyColumns, how="anti", maintain_order="left"),
+                    others.join(self.non_english.select(KeyColumns), on=KeyColumns, how="anti", maintain_order="left"),
+                ]
+            )
+        self.rows.append(self.keepRows(df))
+
+    def keepRows(self, df: pl.DataFrame) -> pl.DataFrame:
+        """Columns of the valid records used by the translations and the ranking."""
+        front, back = face(0), face(1)
+        special_frames = ["showcase", "extendedart", "etched"]
+        cn = pl.col("collector_number")
+        return df.select(
+            "pos",
+            "id",
+            *KeyColumns,
+            "lang",
+            "layout",
+            "oracle",
+            pl.col("card_faces").is_not_null().alias("has_faces"),
+            pl.coalesce(pl.col("printed_name"), front.struct.field("printed_name")).alias("printed_name"),
+            pl.col("image_uris").is_not_null().alias("has_image_uris"),
+            pl.coalesce(
+                pl.col("image_uris").struct.field("border_crop"), front.struct.field("image_uris").struct.field("border_crop")
+            ).alias("image"),
+            back.struct.field("name").alias("back_name"),
+            back.struct.field("type_line").alias("back_type_line"),
+            pl.coalesce(back.struct.field("printed_name"), back.struct.field("name")).alias("back_printed_name"),
+            back.struct.field("image_uris").is_not_null().alias("back_has_image"),
+            back.struct.field("image_uris").struct.field("border_crop").alias("back_image"),
+            # Ranking criteria, see selectCard
+            ((pl.col("set") == "j21") & (cn.cast(pl.Int64, strict=False) >= 777)).fill_null(False).alias("conjure"),
+            (pl.col("set") == "vma").fill_null(False).alias("vma"),
+            (pl.col("joined_arena_id").is_not_null() | pl.col("arena_id").is_not_null()).alias("has_arena"),
+            pl.col("finishes").list.contains("etched").fill_null(False).alias("etched"),
+            pl.col("frame_effects")
+            .list.eval(pl.element().is_in(special_frames))
+            .list.any()
+            .fill_null(False)
+            .alias("special_frame"),
+            (pl.col("image_status") == "highres_scan").fill_null(False).alias("highres"),
+            pl.col("promo").fill_null(False),
+            "released_at",
+        )
+
+    def decode(self, line: bytes, arena_id: int | None, first: bool) -> dict:
+        """Record of the card DB, as kept by preprocessBulkData and checked by generateCards."""
+        c = json.loads(line)
+        if arena_id is not None:
+            c["arena_id"] = arena_id
+        self.build.prepareRecord(c, joined=True)
+        c = {k: c[k] for k in c if k in KeptProperties}
+        copyFromFaces(c, "type_line")
+        if first:
+            copyFromFaces(c, "oracle_id")
+        return c
+
+    def imageSubstitutes(self, rows: pl.DataFrame) -> dict:
+        """New image URI of the AKR and KLR records, by position. Patched in record order like in preprocessBulkData: A
+        candidate record may have been patched itself (the records share their image_uris with the candidates)."""
+        build = self.build
+        akr_candidates = {}
+        klr_candidates = {}
+        images = {}
+        for c in rows.iter_rows(named=True):
+            images[c["pos"]] = c["image_uris"]["border_crop"] if c["image_uris"] is not None else None
+            c = {**c, "name": c["raw_name"]}
+            if c["name"] in build.akr_cards:
+                updateImageCandidates(akr_candidates, c, ["akh", "hou"])
+            if c["name"] in build.klr_cards:
+                updateImageCandidates(klr_candidates, c, ["kld", "aer"])
+        print("Fixing AKR images...", end="", flush=True)
+        MissingAKRCards = {name: v for name, v in build.akr_cards.items() if name not in akr_candidates}
+        if len(MissingAKRCards) > 0:
+            print("MissingAKRCards: ", MissingAKRCards)
+        MissingKLRCards = {name: v for name, v in build.klr_cards.items() if name not in klr_candidates}
+        if len(MissingKLRCards) > 0:
+            print("MissingKLRCards: ", MissingKLRCards)
+
+        substitutes = {}
+        for pos, name, set_code, lang in rows.select("pos", "name", "set", "lang").iter_rows():
+            for candidates_set, candidates in [("akr", akr_candidates), ("klr", klr_candidates)]:
+                if set_code == candidates_set and name in candidates and lang in candidates[name]:
+                    images[pos] = substitutes[pos] = images[candidates[name][lang]["pos"]]
+        print(" Done!\n")
+        return substitutes
+
+    def translations(self, rows: pl.DataFrame) -> dict:
+        """Translations of generateCards: {(name, set, collector_number): {"printed_names", "image_uris", ["back"]}}."""
+        printed_names = languageValues(rows, pl.col("printed_name"))
+        image_uris = languageValues(rows, pl.col("image"))
+        backs = {}
+        double_faced = rows.filter(pl.col("layout").is_in(BackFaceLayouts))
+        for name, layout in double_faced.filter(~pl.col("has_faces")).select("name", "layout").iter_rows():
+            print(f"/!\\ {name}: Missing card faces with layout {layout}.")
+        double_faced = double_faced.filter(pl.col("has_faces"))
+        back_names = languageValues(double_faced, pl.col("back_printed_name"))
+        for name in double_faced.filter(~pl.col("back_has_image"))["name"]:
+            print(f"/!\\ {name}: Missing back side image.")
+        back_images = languageValues(double_faced.filter(pl.col("back_has_image")), pl.col("back_image"))
+        first_backs = double_faced.unique(subset=KeyColumns, keep="first", maintain_order=True)
+        for n, s, cn, back_name, type_line in first_backs.select(*KeyColumns, "back_name", "back_type_line").iter_rows():
+            key = (n, s, cn)
+            backs[key] = {"name": back_name, "printed_names": back_names.get(key, {}), "image_uris": back_images.get(key, {})}
+            if type_line is None:
+                print(f"/!\\ {n}: Missing back side type line.")
+            else:
+                backs[key]["type"], backs[key]["subtypes"] = handleTypeLine(type_line)
+
+        translations = {}
+        for key in rows.select(KeyColumns).unique(maintain_order=True).iter_rows():
+            translations[key] = {"printed_names": printed_names.get(key, {}), "image_uris": image_uris.get(key, {})}
+            if key in backs:
+                translations[key]["back"] = backs[key]
+        return translations
+
+    def rank(self, printings: list[tuple[int, dict]], rows: pl.DataFrame, cards: dict) -> tuple[dict, dict]:
+        """Same as rankPrintingGroups for printings ((position, record) of the cards added by generateCards, in order): Sorted
+        by the criteria of selectCard."""
+        build = self.build
+        names = {}
+        for _, c in printings:
+            names.setdefault(indexedName(c), len(names))
+        df = pl.DataFrame(
+            {
+                "seq": range(len(printings)),
+                "pos": [pos for pos, _ in printings],
+                "name_group": [names[indexedName(c)] for _, c in printings],
+                "oracle_id": [c.get("oracle_id") for _, c in printings],
+            },
+            schema={"seq": pl.UInt32, "pos": pl.UInt32, "name_group": pl.UInt32, "oracle_id": pl.String},
+        )
+        df = df.join(
+            rows.select("pos", *KeyColumns, *[c for c, _ in RankingCriteria if c in rows.columns]),
+            on="pos",
+            how="left",
+            maintain_order="left",
+        )
+        non_processed = pl.DataFrame(
+            list(build.non_processed_cards), schema={k: pl.String for k in KeyColumns}, orient="row"
+        ).with_columns(pl.lit(True).alias("non_processed"))
+        arena_primary = self.mtga.select(
+            pl.col("m_name").alias("name"),
+            pl.col("m_number").alias("collector_number"),
+            pl.col("m_set").alias("mtga_set"),
+            pl.lit(True).alias("arena_primary"),
+        )
+        cn = pl.col("collector_number")
+        df = (
+            df.with_columns(
+                pl.col("set").str.to_lowercase().alias("mtga_set"),
+                pl.col("set").is_in(build.primary_sets).alias("primary_set"),
+                cn.str.contains(r"^[0-9]+$").alias("digits"),
+                # Digits for str.isdigit, but not for int
+                cn.str.contains(r"[\p{N}&&[^0-9]]").alias("other_digits"),
+            )
+            .with_columns(pl.when(pl.col("digits")).then(cn.cast(pl.Int64, strict=False)).alias("number"))
+            .join(non_processed, on=KeyColumns, how="left", maintain_order="left")
+            .join(arena_primary, on=["name", "collector_number", "mtga_set"], how="left", maintain_order="left")
+            .with_columns(pl.col("non_processed", "arena_primary").fill_null(False))
+        )
+        # Oracle groups are filled in the order of the name groups
+        df = df.sort("name_group", "seq").with_row_index("name_order")
+        oracle_groups = (
+            df.group_by("oracle_id", maintain_order=True).agg(pl.col("name_order").first()).with_row_index("oracle_group")
+        )
+        df = df.join(oracle_groups.select("oracle_id", "oracle_group"), on="oracle_id", how="left", nulls_equal=True)
+
+        criteria = [c for c, _ in RankingCriteria]
+        descending = [d for _, d in RankingCriteria]
+        digits = pl.col("digits")
+        ranked = {}
+        for group, order in [("name_group", "seq"), ("oracle_group", "name_order")]:
+            # selectCard isn't a strict order for some groups, or the sort can't tell how it compares some of their printings:
+            # Ties on all criteria but the collector number (compared as numbers if both are digits, as strings otherwise),
+            # several conjure-only J21 cards. These are ranked by rankPrintings, from the printings in the same order.
+            ties = df.group_by(group, *criteria).agg(
+                (
+                    (pl.len() > 1)
+                    & (
+                        (digits.any() & ~digits.all())
+                        | pl.col("other_digits").any()
+                        | (digits.all() & ((pl.col("number").n_unique() < pl.len()) | pl.col("number").is_null().any()))
+                        | (~digits.any() & (pl.col("collector_number").n_unique() < pl.len()))
+                    )
+                ).alias("ambiguous")
+            )
+            conjured = df.group_by(group, "non_processed").agg((pl.col("conjure").sum() > 1).alias("ambiguous"))
+            ambiguous = pl.concat([ties.select(group, "ambiguous"), conjured.select(group, "ambiguous")])
+            ambiguous = set(ambiguous.filter("ambiguous")[group])
+
+            result = {}
+            sorted_groups = (
+                df.filter(~pl.col(group).is_in(ambiguous))
+                .sort([group, *criteria, "number", "collector_number"], descending=[False, *descending, False, False])
+                .group_by(group, maintain_order=True)
+                .agg("seq")
+            )
+            for g, seqs in sorted_groups.iter_rows():
+                result[g] = list(dict.fromkeys(printings[s][1]["id"] for s in seqs))
+            fallback_groups = (
+                df.filter(pl.col(group).is_in(ambiguous)).sort(group, order).group_by(group, maintain_order=True).agg("seq")
+            )
+            for g, seqs in fallback_groups.iter_rows():
+                result[g] = build.rankPrintings([printings[s][1] for s in seqs], cards)
+            ranked[group] = result
+
+        by_name = {name: ranked["name_group"][n] for name, n in names.items()}
+        by_oracle = {
+            oracle_id: ranked["oracle_group"][g] for g, oracle_id in oracle_groups.select("oracle_group", "oracle_id").iter_rows()
+        }
+        return by_name, by_oracle
+
+    def run(self) -> tuple[dict, dict, dict]:
+        build = self.build
+        self.read()
+        print("Generating card data cache...")
+        rows = pl.concat(self.rows)
+        substitutes = self.imageSubstitutes(pl.concat(self.image_rows).sort("pos"))
+        substitutes_df = pl.DataFrame(
+            {"pos": list(substitutes), "substitute": list(substitutes.values())},
+            schema={"pos": pl.UInt32, "substitute": pl.String},
+        )
+        rows = (
+            rows.join(substitutes_df, on="pos", how="left", maintain_order="left")
+            .with_columns(
+                pl.when(pl.col("substitute").is_not_null() & pl.col("has_image_uris"))
+                .then(pl.col("substitute"))
+                .otherwise(pl.col("image"))
+                .alias("image")
+            )
+            .drop("substitute")
+        )
+
+        non_english = []
+        for n, s, cn, pos, arena_id, first, raw in self.non_english.sort("pos").iter_rows():
+            c = self.decode(raw, arena_id, first)
+            build.non_processed_cards[(n, s, cn)] = c
+            non_english.append((pos, c))
+        printings = self.records + non_english
+        for pos, c in printings:
+            if pos in substitutes:
+                c["image_uris"]["border_crop"] = substitutes[pos]
+
+        translations = self.translations(rows)
+        print(f"{len(build.non_processed_cards)} cards with no English translation.")
+        for key, c in build.non_processed_cards.items():
+            print(f" -> Non-english card: {c['name']} ({c['set']}), {c['lang']} {c['booster']}")
+            translations[key]["image_uris"]["en"] = translations[key]["image_uris"][c["lang"]]
+
+        # Cards are created (with their oracle id) by their first valid record, like in generateCards
+        ids = {c["id"] for _, c in printings}
+        firsts = rows.filter(pl.col("id").is_in(ids)).unique(subset="id", keep="first", maintain_order=True)
+        cards = {cid: {"id": cid, "oracle_id": oracle_id} for cid, oracle_id in firsts.select("id", "oracle").iter_rows()}
+        for _, c in printings:
+            cards[c["id"]].update(build.cardSelection(c))
+        for c in cards.values():
+            key = (c["name"], c["set"], c["collector_number"])
+            if key in translations:
+                c.update(translations[key])
+        return (cards, *self.rank(printings, rows, cards))
+
+
+def columnarCards(build: CardDataBuild, batch_lines: int = BatchLines) -> tuple[dict, dict, dict]:
+    """Same as generateCards(preprocessBulkData()) and rankPrintingGroups: Cards by id, ranked printings by name and by oracle
+    id. Sets build.non_processed_cards."""
+    return ColumnarCards(build, batch_lines).run()
+
+
+###############################################################################
+# Comparison with the dict engine, benchmark
+
+SyntheticSets = [
+    ("lea", "1993-08-05"), ("arn", "1993-12-17"), ("con", "2009-02-06"), ("akh", "2017-04-28"), ("hou", "2017-07-14"),
+    ("kld", "2016-09-30"), ("aer", "2017-01-20"), ("dom", "2018-04-27"), ("war", "2019-05-03"), ("m21", "2020-07-03"),
+    ("akr", "2020-08-13"), ("klr", "2020-11-12"), ("jmp", "2020-07-17"), ("ajmp", "2020-07-17"), ("afr", "2021-07-23"),
+    ("j21", "2021-08-12"), ("ymid", "2021-12-09"), ("vma", "2014-06-16"), ("neo", "2022-02-18"), ("sld", "2019-12-02"),
+    ("plst", "2021-07-09"), ("sta", "2021-04-23"), ("one", "2023-02-03"), ("woe", "2023-09-08"), ("mkm", "2024-02-09"),
+    ("blb", "2024-08-02"), ("fdn", "2024-11-15"), ("tdm", "2025-04-11"), ("pio", "2024-12-10"), ("mb2", "2024-08-02"),
+]
+ArenaSets = ["dom", "war", "m21", "akr", "jmp", "afr", "j21", "ymid", "neo", "one", "woe", "mkm", "blb", "fdn", "tdm"]
+Languages = ["en", "es", "fr", "de", "it", "pt", "ja", "ko", "ru", "zhs", "zht"]
+Words = ["Ancient", "Æther", "Storm", "Goblin", "Elvish", "Dread", "Sky", "Séance", "Vault", "Ember", "Tide", "Bone", "Oath"]
+Types = ["Creature — Elf Druid", "Instant", "Sorcery", "Artifact", "Enchantment — Aura", "Land", "Legendary Creature — Human"]
+Formats = ["standard", "future", "historic", "timeless", "gladiator", "pioneer", "explorer", "modern", "legacy", "pauper",
+           "vintage", "penny", "commander", "oathbreaker", "standardbrawl", "brawl", "alchemy", "paupercommander", "duel",
+           "oldschool", "premodern", "predh"]  # fmt: skip
+Layouts = [("normal", 80), ("transform", 5), ("modal_dfc", 4), ("split", 3), ("reversible_card", 1), ("adventure", 2),
+           ("token", 2), ("emblem", 1), ("art_series", 1), ("meld", 1)]  # fmt: skip
+
+
+def syntheticBulkData(path: str, cards: int, seed: int = 0) -> dict:
+    """Writes an all_cards like bulk data file to path, with about 3 records per card: Same structure and record size as
+    Scryfall's, printings in several sets and languages (some without English version), and the special cases the engines
+    handle (double faced, reversible, split cards, tokens, variations, AKR/KLR, J21 conjure-only, ties on release dates...).
+    Returns the matching MTGA data: {"arena_ids", "akr_cards", "klr_cards"} (see loadMTGAData)."""
+    rng = random.Random(seed)
+    arena = {"arena_ids": {}, "akr_cards": {}, "klr_cards": {}}
+    dates = dict(SyntheticSets)
+    groups = []
+
+    def imageURIs(cid: str, side: str = "front") -> dict:
+        return {
+            size: f"https://cards.scryfall.io/{size}/{side}/{cid[0]}/{cid[1]}/{cid}.{'png' if size == 'png' else 'jpg'}"
+            f"?{rng.randrange(1500000000, 1700000000)}"
+            for size in ["small", "normal", "large", "png", "art_crop", "border_crop"]
+        }
+
+    def record(card: dict, set_code: str, cn: str, lang: str, flags: dict) -> dict:
+        cid = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        translated = lang != "en"
+        r = {"object": "card", "id": cid, "oracle_id": card["oracle_id"], "multiverse_ids": [rng.randrange(1, 600000)]}
+        if flags.get("scryfall_arena_id"):
+            r["arena_id"] = rng.randrange(60000, 99999)
+        r.update(
+            {
+                "tcgplayer_id": rng.randrange(1, 600000),
+                "cardmarket_id": rng.randrange(1, 800000),
+                "name": card["name"],
+                "lang": lang,
+                "released_at": dates[set_code],
+                "uri": f"https://api.scryfall.com/cards/{cid}",
+                "scryfall_uri": f"https://scryfall.com/card/{set_code}/{cn}/{lang}/{card['slug']}?utm_source=api",
+                "layout": card["layout"],
+                "highres_image": flags.get("highres", True),
+                "image_status": "highres_scan" if flags.get("highres", True) else "lowres",
+            }
+        )
+        if translated and card["faces"] is None:
+            r["printed_name"] = f"{card['name']} ({lang})"
+        if card["faces"] is None or card["layout"] in ["split", "adventure", "flip"]:
+            r["image_uris"] = imageURIs(cid)
+        if card["layout"] != "reversible_card":
+            r["mana_cost"] = card["mana_cost"]
+        r["cmc"] = float(card["cmc"])
+        if card["type_line"] is not None:
+            r["type_line"] = card["type_line"]
+        if translated and card["type_line"] is not None:
+            r["printed_type_line"] = f"{card['type_line']} ({lang})"
+        r.update({"oracle_text": card["oracle_text"], "colors": card["colors"], "color_identity": card["colors"]})
+        if translated:
+            r["printed_text"] = f"{card['oracle_text']} ({lang})"
+        if card["layout"] == "reversible_card":
+            del r["oracle_id"], r["colors"]
+        if card["faces"] is not None:
+            r["card_faces"] = []
+            for n, f in enumerate(card["faces"]):
+                cf = {"object": "card_face", "name": f["name"], "mana_cost": f["mana_cost"], "type_line": f["type_line"]}
+                if translated:
+                    cf["printed_name"] = f"{f['name']} ({lang})"
+                cf["oracle_text"] = card["oracle_text"]
+                if card["layout"] == "reversible_card":
+                    cf["oracle_id"] = card["oracle_id"]
+                if "image_uris" not in r and not (n == 1 and flags.get("missing_back_image")):
+                    cf["image_uris"] = imageURIs(cid, "front" if n == 0 else "back")
+                cf["artist"] = "Synthetic Artist"
+                r["card_faces"].append(cf)
+        r["keywords"] = card["keywords"]
+        r["legalities"] = {f: rng.choice(["legal", "not_legal"]) for f in Formats}
+        r.update(
+            {
+                "games": ["paper", "mtgo", "arena"] if set_code in ArenaSets else ["paper"],
+                "reserved": False,
+                "foil": True,
+                "nonfoil": True,
+                "finishes": ["nonfoil", "foil", "etched"] if flags.get("etched") else ["nonfoil", "foil"],
+                "oversized": False,
+                "promo": flags.get("promo", False),
+                "reprint": flags.get("reprint", False),
+                "variation": flags.get("variation", False),
+                "set_id": str(uuid.uuid5(uuid.NAMESPACE_URL, set_code)),
+                "set": set_code,
+                "set_name": f"Set {set_code.upper()}",
+                "set_type": "expansion",
+                "set_uri": f"https://api.scryfall.com/sets/{set_code}",
+                "set_search_uri": f"https://api.scryfall.com/cards/search?order=set&q=e%3A{set_code}&unique=prints",
+                "scryfall_set_uri": f"https://scryfall.com/sets/{set_code}?utm_source=api",
+                "rulings_uri": f"https://api.scryfall.com/cards/{cid}/rulings",
+                "prints_search_uri": "https://api.scryfall.com/cards/search?order=released"
+                f"&q=oracleid%3A{card['oracle_id']}&unique=prints",
+                "collector_number": cn,
+                "digital": set_code in ["ymid", "ajmp"],
+                "rarity": card["rarity"],
+                "flavor_text": "Synthetic flavor text, about as long as a real one.",
+                "card_back_id": "0aeebaf5-8c7d-4636-9e82-8c27447861f7",
+                "artist": "Synthetic Artist",
+                "artist_ids": [str(uuid.UUID(int=rng.getrandbits(128), version=4))],
+                "illustration_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "border_color": "black",
+                "frame": "1997" if dates[set_code] < "2015" else "2015",
+            }
+        )
+        if flags.get("showcase"):
+            r["frame_effects"] = ["showcase"]
+        r.update({"full_art": False, "textless": False, "booster": flags.get("booster", True), "story_spotlight": False})
+        r["edhrec_rank"] = rng.randrange(1, 30000)
+        r["prices"] = {"usd": "0.25", "usd_foil": "1.02", "usd_etched": None, "eur": "0.18", "eur_foil": "0.90", "tix": "0.03"}
+        r["related_uris"] = {
+            "gatherer": f"https://gatherer.wizards.com/Pages/Card/Details.aspx?multiverseid={r['multiverse_ids'][0]}",
+            "edhrec": f"https://edhrec.com/route/?cc={card['slug']}",
+        }
+        r["purchase_uris"] = {
+            "tcgplayer": "https://partner.tcgplayer.com/c/4931599/1830156/21018?subId1=api"
+            f"&u=https%3A%2F%2Fwww.tcgplayer.com%2Fproduct%2F{r['tcgplayer_id']}",
+            "cardmarket": f"https://www.cardmarket.com/en/Magic/Products/Search?referrer=scryfall&searchString={card['slug']}",
+        }
+        return r
+
+    for i in range(cards):
+        layout = rng.choices([l for l, _ in Layouts], [w for _, w in Layouts])[0]
+        name = f"{rng.choice(Words)} {rng.choice(Words)} {i}"
+        card = {
+            "oracle_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            "layout": layout,
+            "name": name,
+            "faces": None,
+            "mana_cost": rng.choice(["{G}", "{1}{U}", "{2}{B}{B}", "{R}{W}", "{3}", "{X}{G}{G}"]),
+            "cmc": rng.randrange(0, 7),
+            "type_line": rng.choice(Types),
+            "oracle_text": "When this enters, draw a card. " * rng.randrange(1, 4),
+            "colors": rng.choice([["G"], ["U"], ["B", "R"], []]),
+            "keywords": [],
+            "rarity": rng.choice(["common", "common", "uncommon", "rare", "mythic"]),
+        }
+        if layout in ["transform", "modal_dfc", "split", "adventure", "meld", "reversible_card"]:
+            back = f"{rng.choice(Words)} Back {i}" if layout != "reversible_card" else name
+            card["faces"] = [
+                {"name": name, "mana_cost": card["mana_cost"], "type_line": card["type_line"]},
+                {"name": back, "mana_cost": "" if layout in ["transform", "meld"] else "{1}", "type_line": rng.choice(Types)},
+            ]
+            card["name"] = f"{name} // {back}"
+            if layout == "split":
+                card["mana_cost"] = f"{card['mana_cost']} // {{1}}"
+                card["keywords"] = ["Aftermath"] if i % 3 == 0 else []
+            if layout != "reversible_card":
+                card["type_line"] = f"{card['faces'][0]['type_line']} // {card['faces'][1]['type_line']}"
+            else:
+                card["type_line"] = None
+                card["faces"][1]["type_line"] = card["faces"][0]["type_line"]
+        if i % 997 == 500:
+            card["type_line"] = None  # Checks of generateCards: Not copied from the faces, skipped
+        card["slug"] = card["name"].lower().replace(" ", "-")
+
+        # Printings: (set, collector number, flags)
+        printings = []
+        for set_code, _ in rng.sample(SyntheticSets, rng.choice([1, 1, 1, 2, 2, 3, 4])):
+            if set_code in ["akr", "klr", "j21", "vma"]:
+                continue
+            cn = str(rng.randrange(1, 400))
+            if rng.random() < 0.05:
+                cn += rng.choice(["a", "p", "s"])
+            if rng.random() < 0.02:
+                cn = "★" + cn
+            flags = {
+                "promo": rng.random() < 0.08,
+                "etched": rng.random() < 0.03,
+                "highres": rng.random() < 0.9,
+                "booster": rng.random() < 0.8,
+                "variation": rng.random() < 0.01,
+                "scryfall_arena_id": set_code in ArenaSets and rng.random() < 0.1,
+                "missing_back_image": rng.random() < 0.02,
+            }
+            printings.append((set_code, cn, flags))
+            if rng.random() < 0.1:
+                # Showcase version in the same set: Tie on the release date
+                printings.append((set_code, str(300 + i % 100), {**flags, "showcase": True}))
+            if rng.random() < 0.03 and cn.isdigit():
+                # Digit and non digit collector numbers of the same card and set
+                printings.append((set_code, f"{cn}b", dict(flags)))
+        if i % 40 == 0 and layout == "normal":
+            printings.append(("akr", str(i % 300 + 1), {}))
+            printings.append((rng.choice(["akh", "hou", "dom"]), str(i % 250 + 1), {}))
+            arena["akr_cards"][card["name"]] = (70000 + i, str(i % 300 + 1), card["rarity"])
+        if i % 45 == 0 and layout == "normal":
+            printings.append(("klr", str(i % 300 + 1), {}))
+            printings.append((rng.choice(["kld", "aer", "war"]), str(i % 250 + 1), {}))
+            arena["klr_cards"][card["name"]] = (80000 + i, str(i % 300 + 1), card["rarity"])
+        if i % 97 == 0:
+            printings.append(("j21", str(777 + i % 50), {}))
+            if i % 2 == 0:
+                printings.append(("j21", str(830 + i % 50), {}))
+        if i % 50 == 0:
+            printings.append(("vma", str(i % 300 + 1), {}))
+        if not printings:
+            printings.append(("fdn", str(i % 400 + 1), {}))
+
+        for set_code, cn, flags in printings:
+            langs = ["en"] if rng.random() < 0.97 else []
+            langs += rng.sample(Languages[1:], rng.choice([0, 0, 1, 3, 5, 8, 10]))
+            if not langs:
+                langs = [rng.choice(Languages[1:])]
+            rng.shuffle(langs)
+            groups.append([record(card, set_code, cn, lang, flags) for lang in langs])
+            if set_code in ArenaSets and layout not in ["token", "emblem", "art_series"] and rng.random() < 0.6:
+                front = card["name"].split(" //")[0]
+                mtga_name = front if layout in ["transform", "modal_dfc"] else card["name"]
+                if set_code == "ymid":
+                    arena["arena_ids"][(mtga_name, "Digital", set_code) if i % 2 else (mtga_name, cn, "y22")] = 90000 + i
+                elif set_code != "klr":
+                    arena["arena_ids"][(mtga_name, cn, set_code)] = rng.randrange(60000, 99999)
+
+    rng.shuffle(groups)
+    with gzip.open(path, "wt", encoding="utf8", compresslevel=1) as file:
+        for group in groups:
+            for r in group:
+                file.write(json.dumps(r, ensure_ascii=False) + "\n")
+    return arena
+
+
+def benchBuild(bulk_path: str, args: list[str], arena: dict | None = None) -> CardDataBuild:
+    """A build ready to rebuild the cache from bulk_path, with the inputs loaded by CardDataBuild.run (empty ratings).
+    arena: MTGA data (see syntheticBulkData), loaded from the --mtga folder of args otherwise (if any)."""
+    build = CardDataBuild(BuildOptions(["cache", *args]))
+    build.options.bulk_data_path = bulk_path
+    if arena is not None:
+        build.arena_ids = dict(arena["arena_ids"])
+        build.akr_cards = dict(arena["akr_cards"])
+        build.klr_cards = dict(arena["klr_cards"])
+    elif "--mtga" in args:
+        build.loadMTGAData()
+    with open(ManaSymbolsFile, "r", encoding="utf8") as file:
+        build.mana_symbols = json.load(file)
+    build.loadSets()
+    build.booster_rules = loadRules(BoosterRulesPath)
+    return build
+
+
+def dictCards(build: CardDataBuild) -> tuple[dict, dict, dict]:
+    cards, cardsByName = build.generateCards(build.preprocessBulkData())
+    return (cards, *build.rankPrintingGroups(cards, cardsByName))
+
+
+def compareOutputs(build: CardDataBuild, expected: tuple, other_build: CardDataBuild, other: tuple) -> list[str]:
+    """Outputs of the columnar engine (other) that differ from the dict engine's (expected)."""
+    differences = []
+    if json.dumps(expected[0]) != json.dumps(other[0]):
+        differences.append("cards (MTGCards.*.json)")
+    if list(expected[1].items()) != list(other[1].items()):
+        differences.append("printings by name (CardsByName.json, PrintingsByName.json)")
+    if list(expected[2].items()) != list(other[2].items()):
+        differences.append("printings by oracle id (PrintingsByOracle.json)")
+    if list(build.non_processed_cards) != list(other_build.non_processed_cards):
+        differences.append("cards with no English translation")
+    return differences
+
+
+def bench(bulk_path: str | None, args: list[str], cards: int = 20000) -> bool:
+    arena = None
+    with tempfile.TemporaryDirectory() as folder:
+        if bulk_path is None:
+            bulk_path = os.path.join(folder, "scryfall-all-cards.jsonl.gz")
+            start = time.perf_counter()
+            arena = syntheticBulkData(bulk_path, cards)
+            print(f"  {'Synthetic bulk data':<28} {time.perf_counter() - start:7.2f}s ({cards} cards)")
+        with gzip.open(bulk_path, "rb") as file:
+            records = sum(1 for line in file if line.strip())
+        print(f"{records} records, {pl.thread_pool_size()} polars thread(s)")
+        results = {}
+        for engine, run in [("dict", dictCards), ("columnar", columnarCards)]:
+            build = benchBuild(bulk_path, args, arena)
+            stdout = sys.stdout
+            sys.stdout = io.StringIO()  # Both engines print the same progress and warnings
+            start = time.perf_counter()
+            try:
+                result = run(build)
+            finally:
+                sys.stdout = stdout
+            duration = time.perf_counter() - start
+            results[engine] = (build, result)
+            print(f"  {engine + ' engine':<28} {duration:7.2f}s ({records / duration:8.0f} records/s, {len(result[0])} cards)")
+    differences = compareOutputs(*results["dict"], *results["columnar"])
+    print("  Outputs match." if not differences else f"  Outputs differ: {', '.join(differences)}")
+    return not differences
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        args = sys.argv[2:]
+        path = args.pop(0) if len(args) > 0 and not args[0].startswith("--") else None
+        cards = 20000
+        if "--cards" in args:
+            cards = int(args.pop(args.index("--cards") + 1))
+            args.remove("--cards")
+        sys.exit(0 if bench(path, args, cards) else 1)
+    print("Usage: python ColumnarPreprocess.py bench [bulk data path | --cards <synthetic cards>] [--languages en,fr,...]")
+    print("                                          [--mtga <MTGA folder>]")
+    sys.exit(1)
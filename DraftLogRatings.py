@@ -0,0 +1,310 @@
+###############################################################################
+# Derives pick order ratings from Draftmancer draft logs (DraftLog JSON, as exported by the server).
+#
+# Usage: python DraftLogRatings.py <logs folder or files...> [--out data/draftlog-ratings.json] [--oracle data/draftlog-oracle-ratings.json]
+#                                  [--state data/DraftLogStats.json] [--full] [--include-bots] [--min-seen 20] [--workers N]
+#
+# Logs can be single DraftLog objects (.json), arrays of DraftLogs (.json) or one DraftLog per line (.jsonl), optionally gzipped.
+# Only regular draft picks ({packNum, pickNum, pick, booster}) are considered.
+# Cards are counted per draft format: The set of drafts restricted to a single set (most of their cards being from that set),
+# "cube" for the others (cubes, custom card lists, multi-set drafts), so each card is only compared to the cards drafted
+# alongside it.
+# Counts are accumulated in a state file, so subsequent runs only process new or modified log files (use --full to start over).
+# The state keeps the counts of each file: The previous contribution of a modified file is removed before it's counted again,
+# the one of a deleted file is removed.
+#
+# Outputs:
+#   --out:    {set: {card name: rating}}, the format of data/ratings.json used by addCard in ManageCardData.py, from set drafts.
+#             Existing sets in this file are kept (point it to data/ratings.json to use the results directly, but note that
+#             'ManageCardData.py ratings' rewrites that file from scratch).
+#   --oracle: {oracle_id: rating} across all formats including cubes, the format of data/cubecobra-ratings.json.
+# Ratings are mapped onto the CubeCobra ratings distribution, like the Limited ratings stage of ManageCardData.py.
+
+import os
+import sys
+import gzip
+import json
+import glob
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import ijson
+from LimitedRatings import percentiles, toReferenceScale
+
+LogExtensions = (".json", ".jsonl", ".json.gz", ".jsonl.gz")
+ValueOptions = ["--out", "--oracle", "--state", "--min-seen", "--workers"]
+FilesPerTask = 256
+StateVersion = 2
+CubeFormat = "cube"
+
+
+def option(name, default=None):
+    if name in sys.argv and sys.argv.index(name) + 1 < len(sys.argv):
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def listLogFiles(inputs: list[str]) -> list[str]:
+    files = []
+    for path in inputs:
+        if os.path.isdir(path):
+            for ext in LogExtensions:
+                files.extend(glob.glob(os.path.join(path, "**", f"*{ext}"), recursive=True))
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+
+def readLogs(path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as file:
+        if path.endswith(".jsonl") or path.endswith(".jsonl.gz"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        first = file.read(64).lstrip()
+        file.seek(0)
+        if first.startswith(b"["):
+            yield from ijson.items(file, "item", use_float=True)
+        else:
+            yield json.load(file)
+
+
+def draftFormat(log: dict) -> str:
+    """Set of drafts restricted to a single set, CubeFormat for the others. The set restriction of a session is kept when
+    it switches to a cube (custom card list), so most of the cards must also be from that set."""
+    restriction = log.get("setRestriction") or []
+    if len(restriction) != 1 or log.get("useCustomBoosters"):
+        return CubeFormat
+    sets = [c.get("set") for c in log.get("carddata", {}).values()]
+    return restriction[0] if 2 * sets.count(restriction[0]) >= len(sets) else CubeFormat
+
+
+def countFile(path: str, include_bots: bool):
+    """Vocabulary ("format|card id" keys), card metadata and the (seen, picked, pick position sum) arrays of a log file."""
+    vocab = {}
+    meta = {}
+    card_indices = []
+    positions = []
+    picked_flags = []
+    for log in readLogs(path):
+        if log.get("type", "Draft") != "Draft" or "users" not in log:
+            continue
+        carddata = log.get("carddata", {})
+        draft_format = draftFormat(log)
+        for user in log["users"].values():
+            if user.get("isBot") and not include_bots:
+                continue
+            for p in user.get("picks", []):
+                if "booster" not in p or "pickNum" not in p or "pick" not in p:
+                    continue
+                # Boosters can hold several copies of the picked card: Only as many are marked as picked
+                picked = Counter(p["booster"][i] for i in p["pick"] if 0 <= i < len(p["booster"]))
+                for cid in p["booster"]:
+                    if cid is None:
+                        continue
+                    key = f"{draft_format}|{cid}"
+                    if key not in vocab:
+                        vocab[key] = len(vocab)
+                        if cid in carddata:
+                            c = carddata[cid]
+                            meta[cid] = (c.get("name"), c.get("set"), c.get("oracle_id"))
+                    card_indices.append(vocab[key])
+                    positions.append(p["pickNum"])
+                    picked_flags.append(picked[cid] > 0)
+                    if picked[cid] > 0:
+                        picked[cid] -= 1
+
+    idx = np.asarray(card_indices, dtype=np.int64)
+    flags = np.asarray(picked_flags, dtype=np.float64)
+    pos = np.asarray(positions, dtype=np.float64)
+    n = len(vocab)
+    seen = np.bincount(idx, minlength=n).astype(np.float64)
+    picks = np.bincount(idx, weights=flags, minlength=n)
+    position_sum = np.bincount(idx, weights=flags * pos, minlength=n)
+    return list(vocab), meta, np.stack([seen, picks, position_sum]) if n > 0 else np.zeros((3, 0))
+
+
+def processFiles(paths: list[str], include_bots: bool):
+    """Worker: Returns the counts of each file ({path: (vocab, counts)}), the card metadata and the errors.
+    Files that couldn't be read entirely are left out, so they are retried on the next run."""
+    results = {}
+    meta = {}
+    errors = []
+    for path in paths:
+        try:
+            vocab, file_meta, counts = countFile(path, include_bots)
+        except Exception as e:
+            errors.append(f"{path}: {e}")
+            continue
+        results[path] = (vocab, counts)
+        for cid, m in file_meta.items():
+            meta.setdefault(cid, m)
+    return results, meta, errors
+
+
+class Stats:
+    def __init__(self):
+        self.index = {}  # "format|card id" -> column of counts
+        self.meta = {}  # card id -> (name, set, oracle id)
+        self.counts = np.zeros((3, 0))
+        # path -> {"stamp": [size, mtime], "cards": vocab, "counts": (seen, picked, pick position sum) of this file}
+        self.files = {}
+
+    def merge(self, vocab, meta, counts):
+        missing = [cid for cid in vocab if cid not in self.index]
+        for cid in missing:
+            self.index[cid] = len(self.index)
+        if len(missing) > 0:
+            self.counts = np.concatenate([self.counts, np.zeros((3, len(missing)))], axis=1)
+        mapping = np.fromiter((self.index[cid] for cid in vocab), dtype=np.int64, count=len(vocab))
+        np.add.at(self.counts, (slice(None), mapping), counts)
+        for cid, m in meta.items():
+            self.meta.setdefault(cid, m)
+
+    def addFile(self, path, stamp, vocab, counts):
+        self.merge(vocab, {}, counts)
+        self.files[path] = {"stamp": stamp, "cards": vocab, "counts": counts.tolist()}
+
+    def removeFile(self, path):
+        """Removes the contribution of a file to the totals (it was modified and will be counted again)."""
+        entry = self.files.pop(path)
+        counts = np.asarray(entry["counts"], dtype=np.float64).reshape(3, len(entry["cards"]))
+        self.merge(entry["cards"], {}, -counts)
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf8") as file:
+            ids = list(self.index)
+            json.dump(
+                {
+                    "version": StateVersion,
+                    "files": self.files,
+                    "cards": ids,
+                    "meta": [self.meta.get(cid) for cid in ids],
+                    "counts": self.counts.tolist(),
+                },
+                file,
+            )
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        stats = Stats()
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf8") as file:
+                data = json.load(file)
+            # States written before counts were kept per file and format can't be updated: Start over
+            if data.get("version") != StateVersion:
+                print(f"'{path}' was written by a previous version, all logs will be processed again.")
+                return stats
+            stats.files = data["files"]
+            stats.index = {cid: i for i, cid in enumerate(data["cards"])}
+            stats.meta = {cid: tuple(m) for cid, m in zip(data["cards"], data["meta"]) if m is not None}
+            stats.counts = np.asarray(data["counts"], dtype=np.float64).reshape(3, len(stats.index))
+        return stats
+
+
+def scores(stats: Stats, min_seen: int) -> dict[str, dict[str, tuple[float, float]]]:
+    """{format: {card id: (percentile within the format, times seen)}}"""
+    # Smoothed pick rate, ties broken by the average pick position.
+    seen, picks, position_sum = stats.counts
+    pick_rate = (picks + 1.0) / (seen + 2.0)
+    avg_pick = np.divide(position_sum, picks, out=np.full_like(picks, 15.0), where=picks > 0)
+    score = pick_rate - 1e-3 * avg_pick
+    keys = list(stats.index)
+    by_format = {}
+    for i in np.flatnonzero(seen >= min_seen):
+        draft_format, cid = keys[i].split("|", 1)
+        by_format.setdefault(draft_format, {})[cid] = float(score[i])
+    return {
+        draft_format: {cid: (p, float(seen[stats.index[f"{draft_format}|{cid}"]])) for cid, p in percentiles(card_scores).items()}
+        for draft_format, card_scores in by_format.items()
+    }
+
+
+if __name__ == "__main__":
+    inputs = [a for i, a in enumerate(sys.argv[1:], 1) if not a.startswith("--") and sys.argv[i - 1] not in ValueOptions]
+    if len(inputs) == 0:
+        print("Usage: python DraftLogRatings.py <logs folder or files...> [options]")
+        sys.exit(1)
+    out_path = option("--out", "data/draftlog-ratings.json")
+    oracle_path = option("--oracle")
+    state_path = option("--state", "data/DraftLogStats.json")
+    min_seen = int(option("--min-seen", "20"))
+    workers = int(option("--workers", "0")) or None
+    include_bots = "--include-bots" in sys.argv
+
+    start = time.perf_counter()
+    stats = Stats() if "--full" in sys.argv else Stats.load(state_path)
+    files = listLogFiles(inputs)
+    deleted = [path for path in stats.files if not os.path.isfile(path)]
+    for path in deleted:
+        stats.removeFile(path)
+    todo = {}
+    for path in files:
+        stamp = [os.path.getsize(path), os.path.getmtime(path)]
+        if path not in stats.files or stats.files[path]["stamp"] != stamp:
+            if path in stats.files:
+                stats.removeFile(path)
+            todo[path] = stamp
+    print(f"{len(files)} log files, {len(todo)} new or modified, {len(deleted)} deleted.")
+
+    todo_paths = list(todo)
+    batches = [todo_paths[i : i + FilesPerTask] for i in range(0, len(todo_paths), FilesPerTask)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(processFiles, batch, include_bots) for batch in batches]
+        for n, future in enumerate(as_completed(futures), 1):
+            results, meta, errors = future.result()
+            for e in errors:
+                print(f"  Error: {e}")
+            for cid, m in meta.items():
+                stats.meta.setdefault(cid, m)
+            for path, (vocab, counts) in results.items():
+                stats.addFile(path, todo[path], vocab, counts)
+            print(f"\r  Processed {n}/{len(batches)} batches...", end="", flush=True)
+    print()
+    stats.save(state_path)
+    print(f"{int(stats.counts[1].sum())} picks of {len(stats.index)} cards aggregated in {time.perf_counter() - start:.1f}s.")
+
+    with open("data/cubecobra-ratings.json", "r", encoding="utf8") as file:
+        reference = sorted(json.loads(file.read()).values())
+    format_scores = scores(stats, min_seen)
+
+    # Percentiles within set drafts, by printing (bonus sheet cards keep their own set). Several printings of the same card
+    # in a set: Keep the best one. Ratings from the drafts of the set itself take precedence.
+    by_set = {}
+    for draft_format, card_scores in format_scores.items():
+        if draft_format == CubeFormat:
+            continue
+        for cid, (p, _) in card_scores.items():
+            name, cset, _ = stats.meta.get(cid, (None, None, None))
+            if name is not None and cset is not None:
+                set_ratings = by_set.setdefault(cset, {})
+                candidate = (cset == draft_format, p)
+                set_ratings[name] = max(set_ratings.get(name, candidate), candidate)
+    ratings = {}
+    if os.path.isfile(out_path):
+        with open(out_path, "r", encoding="utf8") as file:
+            ratings = json.loads(file.read())
+    for cset, set_ratings in sorted(by_set.items()):
+        ratings[cset] = {name: toReferenceScale(reference, p) for name, (_, p) in sorted(set_ratings.items())}
+    with open(out_path, "w", encoding="utf8") as file:
+        json.dump(ratings, file, ensure_ascii=False, indent=4)
+    print(f"Ratings for {len(by_set)} sets written to {out_path}.")
+
+    if oracle_path:
+        # Percentiles of all formats, weighted by how many times the card was seen in each
+        by_oracle = {}
+        for card_scores in format_scores.values():
+            for cid, (p, seen) in card_scores.items():
+                oracle_id = stats.meta.get(cid, (None, None, None))[2]
+                if oracle_id is not None:
+                    acc = by_oracle.setdefault(oracle_id, [0.0, 0.0])
+                    acc[0] += p * seen
+                    acc[1] += seen
+        with open(oracle_path, "w", encoding="utf8") as file:
+            json.dump({oid: toReferenceScale(reference, total / seen) for oid, (total, seen) in by_oracle.items()}, file, indent=4)
+        print(f"Ratings for {len(by_oracle)} cards written to {oracle_path}.")
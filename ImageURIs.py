@@ -0,0 +1,77 @@
+###############################################################################
+# Templated card image URIs.
+#
+# Scryfall image URIs follow a fixed pattern:
+#   https://cards.scryfall.io/border_crop/{front|back}/{id[0]}/{id[1]}/{id}.jpg?{version}
+# where id is the Scryfall id of the printing in this language (the card id for English). Templated, they only keep what
+# varies: "~" + face ("f" or "b") + id without dashes (omitted if it's the card id) + "?" + version, e.g. "~f?1562404626".
+# Any other URI is kept as is ("~" is doubled if it starts with one), expandImageURI is the reference expansion.
+# The DB files (data/MTGCards.*.json), their other formats (encoded, normalized, translation packs) and the client's Arena
+# card chunks store templated URIs. They're also kept templated in memory and expanded when used: CardDataSession.card(),
+# the reference loaders of the other formats, and in TypeScript, lazyImageURIs (src/ImageURIs.ts) used by src/Cards.ts and
+# client/src/MTGACards.ts.
+
+import re
+import json
+
+ImageURIRegex = re.compile(
+    r"^https://cards\.scryfall\.io/border_crop/(front|back)/([0-9a-f])/([0-9a-f])/([0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12})\.jpg\?(\d+)$"
+)
+ImageURITemplate = "https://cards.scryfall.io/border_crop/{face}/{id[0]}/{id[1]}/{id}.jpg?{version}"
+Faces = {"front": "f", "back": "b"}
+FaceNames = {v: k for k, v in Faces.items()}
+
+
+def templateImageURI(uri: str, cid: str) -> str:
+    m = ImageURIRegex.match(uri)
+    if m is None or m.group(2) != m.group(4)[0] or m.group(3) != m.group(4)[1]:
+        return "~" + uri if uri.startswith("~") else uri
+    uri_id = m.group(4)
+    return f"~{Faces[m.group(1)]}{'' if uri_id == cid else uri_id.replace('-', '')}?{m.group(5)}"
+
+
+def expandImageURI(value: str, cid: str) -> str:
+    if not value.startswith("~") or value.startswith("~~"):
+        return value.removeprefix("~")
+    face, rest = value[1], value[2:]
+    uri_id, version = rest.split("?")
+    if uri_id == "":
+        uri_id = cid
+    else:
+        uri_id = f"{uri_id[:8]}-{uri_id[8:12]}-{uri_id[12:16]}-{uri_id[16:20]}-{uri_id[20:]}"
+    return ImageURITemplate.format(face=FaceNames[face], id=uri_id, version=version)
+
+
+def mapImageURIs(card: dict, cid: str, function) -> dict:
+    """Copy of card with function applied to all of its image URIs (both faces)."""
+    card = dict(card)
+    if "image_uris" in card:
+        card["image_uris"] = {lang: function(uri, cid) for lang, uri in card["image_uris"].items()}
+    if "back" in card and "image_uris" in card["back"]:
+        card["back"] = dict(card["back"])
+        card["back"]["image_uris"] = {lang: function(uri, cid) for lang, uri in card["back"]["image_uris"].items()}
+    return card
+
+
+def templateImageURIs(card: dict, cid: str) -> dict:
+    return mapImageURIs(card, cid, templateImageURI)
+
+
+def expandImageURIs(card: dict, cid: str) -> dict:
+    return mapImageURIs(card, cid, expandImageURI)
+
+
+def imageURIs(card: dict):
+    yield from card.get("image_uris", {}).values()
+    yield from card.get("back", {}).get("image_uris", {}).values()
+
+
+def imageURIReport(cards: dict, templated: dict) -> dict:
+    """Templated and kept URI counts, and their total size before and after templating."""
+    report = {"templated": 0, "kept": 0, "before": 0, "after": 0}
+    for cid, card in cards.items():
+        for before, after in zip(imageURIs(card), imageURIs(templated[cid])):
+            report["templated" if after.startswith("~") and not after.startswith("~~") else "kept"] += 1
+            report["before"] += len(json.dumps(before))
+            report["after"] += len(json.dumps(after))
+    return report
@@ -0,0 +1,134 @@
+###############################################################################
+# Local cache of the Scryfall printings in a given language, used as the source of translations with --default-cards.
+#
+# {folder}/{lang}.jsonl.gz holds one Scryfall card object per line (same format as the bulk data files) and {folder}/{lang}.json
+# the dates of the last refresh and of the last full refresh. Refreshes only query printings released since the last one
+# (minus RefreshOverlapDays, to catch late additions and fixes to recent sets) and merge them into the cache by card id.
+# A full refresh (everything downloaded again) happens with full=True, or when the last one is more than FullRefreshDays old.
+# Divergence from Scryfall: Changes to printings released before the overlap window (new images, corrected translations,
+# removed printings) are only picked up by the next full refresh, so the cache can be up to FullRefreshDays (plus the time
+# between two refreshes) behind for older printings; recent printings are as fresh as the last refresh.
+# Rate limited requests (429) are retried at most MaxRetries times, after the delay asked by Scryfall (Retry-After). Other HTTP
+# and network errors are raised (requests.RequestException).
+
+import os
+import re
+import json
+import gzip
+import time
+import datetime
+import email.utils
+import requests
+
+SearchURL = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com") + "/cards/search"
+RefreshOverlapDays = 60
+FullRefreshDays = 30
+RequestInterval = 0.1  # Scryfall asks for 50-100ms between requests
+MaxRetries = 5
+IdRegex = re.compile(rb'"id"\s*:\s*"([^"]+)"')
+
+
+def retryDelay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a rate limited request: Its Retry-After header (seconds or HTTP date), or an exponential
+    backoff without one."""
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            pass
+    return float(2**attempt)
+
+
+def searchPrints(query: str, headers: dict) -> list[dict]:
+    """All printings matching a Scryfall search query (including extras and variations)."""
+    params = {"q": query, "unique": "prints", "include_extras": "true", "include_variations": "true", "order": "set"}
+    results = []
+    page = 1
+    retries = 0
+    while True:
+        response = requests.get(SearchURL, params={**params, "page": page}, headers=headers)
+        if response.status_code == 404:  # No match
+            break
+        if response.status_code == 429 and retries < MaxRetries:
+            time.sleep(retryDelay(response, retries))
+            retries += 1
+            continue
+        response.raise_for_status()  # Also once out of retries
+        retries = 0
+        content = response.json()
+        results.extend(content["data"])
+        if not content["has_more"]:
+            break
+        page += 1
+        time.sleep(RequestInterval)
+    return results
+
+
+def cachePath(folder: str, lang: str) -> str:
+    return f"{folder}/{lang}.jsonl.gz"
+
+
+def refreshLanguage(folder: str, lang: str, headers: dict, full: bool = False) -> tuple[int, int]:
+    """Updates the cache of lang, returns (cached printings, fetched printings)."""
+    os.makedirs(folder, exist_ok=True)
+    meta_path = f"{folder}/{lang}.json"
+    query = f"lang:{lang}"
+    today = datetime.date.today()
+    full_refresh_at = None
+    if not full and os.path.isfile(meta_path) and os.path.isfile(cachePath(folder, lang)):
+        with open(meta_path, "r", encoding="utf8") as file:
+            meta = json.load(file)
+        refreshed_at = datetime.date.fromisoformat(meta["refreshed_at"])
+        if "full_refresh_at" in meta:
+            full_refresh_at = datetime.date.fromisoformat(meta["full_refresh_at"])
+        if full_refresh_at is None or (today - full_refresh_at).days > FullRefreshDays:
+            full = True
+        else:
+            query += f" date>={refreshed_at - datetime.timedelta(days=RefreshOverlapDays)}"
+    else:
+        full = True
+    if full:
+        full_refresh_at = today
+    fetched = {c["id"]: c for c in searchPrints(query, headers) if c.get("lang") == lang}
+
+    total = 0
+    tmp_path = cachePath(folder, lang) + ".tmp"
+    with gzip.open(tmp_path, "wb") as outfile:
+        if not full:
+            with gzip.open(cachePath(folder, lang), "rb") as infile:
+                for line in infile:
+                    m = IdRegex.search(line)
+                    if m is None or m.group(1).decode() in fetched:
+                        continue
+                    outfile.write(line)
+                    total += 1
+        for c in fetched.values():
+            outfile.write(json.dumps(c, ensure_ascii=False).encode("utf8") + b"\n")
+            total += 1
+    os.replace(tmp_path, cachePath(folder, lang))
+    with open(meta_path, "w", encoding="utf8") as outfile:
+        json.dump(
+            {"refreshed_at": today.isoformat(), "full_refresh_at": full_refresh_at.isoformat(), "printings": total},
+            outfile,
+            indent=4,
+        )
+    return total, len(fetched)
+
+
+def cachedLines(folder: str, languages, skip_ids: set[str]):
+    """Raw lines of the cached printings of each language, except for the card ids in skip_ids."""
+    for lang in sorted(languages):
+        if not os.path.isfile(cachePath(folder, lang)):
+            continue
+        with gzip.open(cachePath(folder, lang), "rb") as file:
+            for line in file:
+                m = IdRegex.search(line)
+                if m is not None and m.group(1).decode() in skip_ids:
+                    continue
+                yield line
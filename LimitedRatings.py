@@ -0,0 +1,225 @@
+###############################################################################
+# Aggregation of Limited ratings exports (17lands-style card ratings, CSV or JSON) into per-set card ratings.
+# Used by the 'ratings' stage of ManageCardData.py, kept free of side effects so it can be imported by worker processes.
+#
+# Source files are expected in data/LimitedRatings/. The set of each record is read from its set column (see SetKeys), or,
+# for exports without one (e.g. 17lands card ratings), given explicitly in data/LimitedRatings/Sources.json:
+#   {"card-ratings-2024-05-01.csv": "mkm", ...}
+# Files without either are skipped. Multiple files for the same set are merged.
+
+import csv
+import json
+import os
+import glob
+import bisect
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import ijson
+
+NameKeys = ["Name", "name"]
+SetKeys = ["Expansion", "expansion", "Set", "set"]
+SourcesFile = "Sources.json"
+# Win rate metrics by order of preference, with the matching sample size (used as weight when merging files)
+WinRateKeys = [
+    ("GIH WR", "# GIH"),
+    ("ever_drawn_win_rate", "ever_drawn_game_count"),
+    ("OH WR", "# OH"),
+    ("opening_hand_win_rate", "opening_hand_game_count"),
+    ("GP WR", "# GP"),
+    ("win_rate", "game_count"),
+]
+# Average pick position, used when no win rate is available (lower is better)
+PickKeys = [("ATA", "# Picked"), ("avg_pick", "pick_count"), ("ALSA", "# Seen"), ("avg_seen", "seen_count")]
+# Default ratings of cards without any rating, by rarity
+RarityRatings = {"mythic": 1.0, "rare": 0.8, "uncommon": 0.7}
+
+
+def poolExecutor(workers=None):
+    # Worker processes re-import the main module when using 'spawn' (Windows), which would re-run ManageCardData.py entirely.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def parseNumber(value) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip().rstrip("%").replace(",", "")
+        if value == "":
+            return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def readRecords(path: str):
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf8", newline="") as file:
+            yield from csv.DictReader(file)
+    else:
+        with open(path, "rb") as file:
+            # 17lands' API returns a plain array, also accept {"data": [...]}
+            first = file.read(64).lstrip()
+            file.seek(0)
+            prefix = "data.item" if first.startswith(b"{") else "item"
+            yield from ijson.items(file, prefix)
+
+
+def pickMetric(record: dict):
+    for key, weightKey in WinRateKeys:
+        value = parseNumber(record.get(key))
+        if value is not None:
+            return "winrate", value, parseNumber(record.get(weightKey)) or 1.0
+    for key, weightKey in PickKeys:
+        value = parseNumber(record.get(key))
+        if value is not None:
+            return "pick", -value, parseNumber(record.get(weightKey)) or 1.0
+    return None
+
+
+def percentiles(scores: dict[str, float]) -> dict[str, float]:
+    # Average rank of ties, normalized to [0, 1]
+    ordered = sorted(scores.items(), key=lambda kv: kv[1])
+    result = {}
+    i = 0
+    while i < len(ordered):
+        j = i
+        while j + 1 < len(ordered) and ordered[j + 1][1] == ordered[i][1]:
+            j += 1
+        rank = (i + j) / 2 / max(1, len(ordered) - 1)
+        for k in range(i, j + 1):
+            result[ordered[k][0]] = rank
+        i = j + 1
+    return result
+
+
+def recordSet(record: dict) -> str | None:
+    value = next((record[k] for k in SetKeys if k in record and record[k]), None)
+    return value.strip().lower() if isinstance(value, str) else None
+
+
+def hasSetColumn(path: str) -> bool:
+    first = next(readRecords(path), None)
+    return first is not None and any(k in first for k in SetKeys)
+
+
+def aggregateFile(path: str, default_set: str | None = None) -> dict[str, dict[str, dict[str, tuple[float, float]]]]:
+    """Streams a single source file. Returns {set: {metric: {card name: (score, weight)}}}, metric being "winrate" or "pick"
+    (see pickMetric), default_set being the set of records without one."""
+    result = {}
+    for record in readRecords(path):
+        name = next((record[k] for k in NameKeys if k in record and record[k]), None)
+        metric = pickMetric(record)
+        set_code = recordSet(record) or default_set
+        if name is None or metric is None or set_code is None:
+            continue
+        kind, score, weight = metric
+        result.setdefault(set_code, {}).setdefault(kind, {})[name] = (score, weight)
+    return result
+
+
+def setRatings(scores: dict[str, dict[str, list[float]]], reference: list[float]) -> dict[str, float]:
+    """scores: {metric: {card name: [sum of weighted scores, sum of weights]}} of all the files of a set.
+    Each metric is normalized to percentiles on its own, the pick order is only used for cards without any win rate."""
+    normalized = {
+        kind: percentiles({name: total / weight for name, (total, weight) in by_name.items() if weight > 0})
+        for kind, by_name in scores.items()
+    }
+    combined = normalized.get("pick", {}) | normalized.get("winrate", {})
+    return {name: toReferenceScale(reference, p) for name, p in sorted(combined.items())}
+
+
+def toReferenceScale(reference: list[float], percentile: float) -> float:
+    # Maps a percentile onto the distribution of the reference (CubeCobra) ratings so both sources are comparable.
+    if len(reference) == 0:
+        return percentile * 2.0
+    return reference[min(len(reference) - 1, int(percentile * (len(reference) - 1) + 0.5))]
+
+
+def cardRating(ratings: dict, card: dict) -> float | None:
+    """Rating of card in ratings ({set: {name: rating}}, the format written by computeRatings), front face name as fallback."""
+    if card["set"] not in ratings:
+        return None
+    set_ratings = ratings[card["set"]]
+    if card["name"] in set_ratings:
+        return set_ratings[card["name"]]
+    return set_ratings.get(card["name"].split(" //")[0])
+
+
+def referenceRating(referenceRatings: dict[str, float], oracle_id: str, rarity: str) -> float:
+    """Rating of cards without a Limited rating: CubeCobra rating of the oracle id, a default by rarity if it has none."""
+    if oracle_id in referenceRatings:
+        return referenceRatings[oracle_id]
+    return RarityRatings.get(rarity, 0.5)
+
+
+def computeRatings(sourceFolder: str, dest: str, referenceRatings: dict[str, float], workers=None) -> int:
+    """Aggregates all source files in parallel and writes {set: {card name: rating}} to dest, one set at a time as soon as
+    all the files that may hold it are processed. Returns the number of sets written."""
+    paths = sorted(glob.glob(os.path.join(sourceFolder, "*.csv")) + glob.glob(os.path.join(sourceFolder, "*.json")))
+    sources = {}
+    if os.path.isfile(os.path.join(sourceFolder, SourcesFile)):
+        with open(os.path.join(sourceFolder, SourcesFile), "r", encoding="utf8") as file:
+            sources = {name: s.lower() for name, s in json.load(file).items()}
+    # Files with a set column may hold any set: Sets are only complete once all of them are processed.
+    files = {}  # path -> set of its records without one (None for files with a set column)
+    for path in paths:
+        if os.path.basename(path) == SourcesFile:
+            continue
+        if hasSetColumn(path):
+            files[path] = None
+        elif os.path.basename(path) in sources:
+            files[path] = sources[os.path.basename(path)]
+        else:
+            print(f"  Ratings: '{path}' has no set column and isn't listed in {SourcesFile}, skipping.")
+
+    reference = sorted(referenceRatings.values())
+    remaining = {}  # set -> files listed in SourcesFile not processed yet
+    for s in files.values():
+        if s is not None:
+            remaining[s] = remaining.get(s, 0) + 1
+    remaining_with_column = sum(1 for s in files.values() if s is None)
+    partial = {}  # set -> {metric: {card name: [sum of weighted scores, sum of weights]}}
+    file_counts = {}
+    written = 0
+    tmp_path = dest + ".tmp"
+    with open(tmp_path, "w", encoding="utf8") as outfile, poolExecutor(workers) as executor:
+
+        def flush(final: bool = False):
+            nonlocal written
+            for s in sorted(partial):
+                if not final and (remaining_with_column > 0 or remaining.get(s, 0) > 0):
+                    continue
+                ratings = setRatings(partial.pop(s), reference)
+                outfile.write(("," if written > 0 else "") + f"\n{json.dumps(s)}: ")
+                json.dump(ratings, outfile, ensure_ascii=False)
+                outfile.flush()
+                written += 1
+                print(f"  Ratings: {s}: {len(ratings)} cards from {file_counts[s]} file(s).")
+
+        outfile.write("{")
+        futures = {executor.submit(aggregateFile, path, s): path for path, s in files.items()}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                for s, by_kind in future.result().items():
+                    file_counts[s] = file_counts.get(s, 0) + 1
+                    for kind, by_name in by_kind.items():
+                        scores = partial.setdefault(s, {}).setdefault(kind, {})
+                        for name, (score, weight) in by_name.items():
+                            acc = scores.setdefault(name, [0.0, 0.0])
+                            acc[0] += score * weight
+                            acc[1] += weight
+            except Exception as e:
+                print(f"  Ratings: Error '{e}' while processing '{path}'.")
+            if files[path] is None:
+                remaining_with_column -= 1
+            else:
+                remaining[files[path]] -= 1
+            flush()
+        flush(final=True)
+        outfile.write("\n}\n")
+    os.replace(tmp_path, dest)
+    return written
@@ -1,3 +1,18 @@
+###############################################################################
+# Builds the card data (data/MTGCards.*.json and everything derived from it) from the MTGA card database and Scryfall.
+#
+# Usage: python ManageCardData.py [dl|cache|arena|ratings|jmp|symb|features|set <codes>] [--mtga <MTGA folder>]
+#                                 [--languages en,fr,...] [--default-cards] [--encoded] [--normalized] [--translation-packs]
+#                                 [--skip-checks <checks>] [--no-publish] [--profile] [--engine dict|columnar]
+#
+# Importing this module has no side effect: A CardDataBuild runs the stages selected by its BuildOptions, so a single
+# process can run several builds back to back, the next one reusing the card DB loaded by the previous one, e.g.
+#   build = CardDataBuild(BuildOptions(["cache"]))
+#   errors = build.run()
+#   errors = CardDataBuild(BuildOptions(["jmp"]), session=build.session).run()
+# The card DB and the files derived from it are written to a staging folder and only moved into place once they passed the
+# checks (see BuildStaging.py and CardDBChecks.py): A failed build leaves the previous outputs untouched.
+
 from html import unescape
 import shutil
 import sqlite3
@@ -8,18 +23,34 @@ import requests
 import os
 import filecmp
 import datetime
+import time
 import gzip
+import zlib
 import urllib
 import sys
 import re
 import glob
+import hashlib
 import decimal
-from itertools import groupby
 import functools
+import contextlib
+import importlib.util
 from pprint import pprint
 import math as m1
 from termcolor import colored
 from ordered_enum import OrderedEnum
+from LimitedRatings import computeRatings, cardRating, referenceRating
+from BoosterRules import loadRules
+from CardDBEncoding import printEncodingReport
+from CardDataSession import CardDataSession
+from BulkCache import loadIndex, recompress, iterLines, BulkRecords
+from LanguageCache import IdRegex, cachePath, refreshLanguage, cachedLines
+from StageScheduler import Stage, StageResult, runStages, writeResults
+from CardDBChecks import AllChecks, checkCardDB
+from BuildStaging import Staging
+from ImageURIs import templateImageURIs, imageURIReport
+from Profiler import startProfiling
+from concurrent.futures import ThreadPoolExecutor
 
 
 class Rarity(OrderedEnum):
@@ -29,8 +60,11 @@ class Rarity(OrderedEnum):
     common: int = 1
 
 
+# Base URL of the Scryfall API, can point to a local stand-in (see test/manual/StandInServer.py)
+ScryfallAPI = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com")
 ScryfallSets = "data/scryfall-sets.json"
 BulkDataPath = "data/scryfall-all-cards.jsonl.gz"
+DefaultCardsBulkDataPath = "data/scryfall-default-cards.jsonl.gz"
 BulkDataArenaPath = "data/BulkArena.json"
 FirstFinalDataPath = "data/MTGCards.0.json"
 SetsInfosPath = "src/data/SetsInfos.json"
@@ -40,33 +74,24 @@ JumpstartBoostersFolder = "data/JumpstartBoosters"
 JumpstartSwaps = "data/JumpstartSwaps.json"
 JumpstartBoostersDist = "src/data/JumpstartBoosters.json"
 RatingsDest = "data/ratings.json"
+BoosterRulesPath = "data/BoosterRules.json"
 ManaSymbolsFile = "src/data/mana_symbols.json"
+SymbologyFile = "./data/symbology.json"
+CardFeaturesFolder = "data/CardFeatures"
+EncodedDBFolder = "data/encoded"  # Not next to the regular DB files: The server loads every data/MTGCards.*.json
+NormalizedDBFolder = "data/normalized"
+TranslationPacksFolder = "data/translations"
+LanguageCacheFolder = "data/LanguageCache"
+CardNameIndexPath = "data/CardNameIndex.json"
+PrintingsByNamePath = "data/PrintingsByName.json"  # Lower case name -> card ids, most preferred first (see selectCard)
+PrintingsByOraclePath = "data/PrintingsByOracle.json"  # Oracle id -> card ids, most preferred first
+# Arena cards and alternates, loaded on demand by the client. Written by every cache and arena stage, not tracked (like
+# MTGACards.json was): The client is built after them.
+MTGAChunksFolder = "client/src/data/mtga"
+DefaultMTGAFolder = "H:/SteamLibrary/steamapps/common/MTGA/"
 
 ArenaRarity = {1: "basic", 2: "common", 3: "uncommon", 4: "rare", 5: "mythic"}  # I guess?
 
-ForceDownload = ForceExtract = ForceCache = ForceRatings = ForceJumpstart = ForceJumpstartHH = ForceSymbology = (
-    FetchSet
-) = False
-SetsToFetch = ""
-if len(sys.argv) > 1:
-    Arg = sys.argv[1].lower()
-    ForceDownload = Arg == "dl"
-    ForceCache = ForceDownload or Arg == "cache"
-    ForceRatings = Arg == "ratings"
-    ForceJumpstart = Arg == "jmp"
-    ForceSymbology = Arg == "symb"
-    FetchSet = Arg == "set" and len(sys.argv) > 2
-    if FetchSet:
-        SetsToFetch = sys.argv[2].lower()
-        ForceCache = True
-
-MTGAFolder = "H:/SteamLibrary/steamapps/common/MTGA/"
-if "--mtga" in sys.argv:
-    MTGAFolder = sys.argv[sys.argv.index("--mtga") + 1]
-
-MTGADataFolder = f"{MTGAFolder}MTGA_Data/Downloads/Raw/"
-MTGACardDBFiles = glob.glob(f"{MTGADataFolder}Raw_CardDatabase_*.mtga")
-
 MTGASetConversions = {
     "dom": "dar",
     "ajmp": "jmp",
@@ -92,24 +117,6 @@ MTGASetConversions = {
     "yfra": "y26",
 }
 
-if len(MTGACardDBFiles) == 0:
-    print(colored(f"No MTGA Card DB files found in {MTGADataFolder}", "red"))
-    sys.exit(1)
-
-db_age = min(
-    [(datetime.datetime.now() - datetime.datetime.fromtimestamp(os.path.getmtime(x))).days for x in MTGACardDBFiles]
-)
-print(
-    colored(f"\n  Don't forget to update Arena itself!", "yellow"),
-    colored(f" (Last update {db_age} days ago)\n", "blue"),
-)
-
-CardsCollectorNumberAndSet = {}
-CardNameToArenaIDForJumpstart = {}
-AKRCards = {}
-KLRCards = {}
-J21MTGACollectorNumbers = {}
-
 # Links oracle_ids to draft effects
 DraftEffects = {
     "19047c4b-0106-455d-ab71-68cabfae7404": ["FaceUp", "AgentOfAcquisitions"],
@@ -138,148 +145,177 @@ DraftEffects = {
     "d5fc017a-7517-4737-ad5b-cc45f1e139ea": ["Reveal"],
 }
 
+# Properties of the Scryfall records used to generate the card DB
+KeptProperties = {
+    "id",
+    "oracle_id",
+    "name",
+    "printed_name",
+    "flavor_name",
+    "mana_cost",
+    "colors",
+    "set",
+    "collector_number",
+    "lang",
+    "layout",
+    "type_line",
+    "rarity",
+    "arena_id",
+    "booster",
+    "card_faces",
+    "image_uris",
+    "oracle_text",
+    "keywords",
+    "finishes",
+    "frame_effects",
+    "image_status",
+    "promo",
+    "promo_types",
+    "released_at",
+    "related_cards",
+    "all_parts",
+}
+
 LangCodes = ["enUS", "frFR", "deDE", "itIT", "esES", "ptBR", "jaJP", "koKR"]
-MTGALocalization = {key: {} for key in LangCodes}
-for path in MTGACardDBFiles:
-    try:
-        MTGACardDB = sqlite3.connect(path)
-        MTGACardDB.row_factory = sqlite3.Row
-        for lang in LangCodes:
-            for row in MTGACardDB.execute(f"SELECT LocId, Loc FROM Localizations_{lang}").fetchall():
-                MTGALocalization[lang][row["LocId"]] = row["Loc"]
-        for o in MTGACardDB.execute(f"SELECT * FROM Cards").fetchall():
-            # Ignore... Wildcards?! (TitleId 0)
-            if o["TitleId"] not in MTGALocalization["enUS"]:
-                continue
-            fixed_name = MTGALocalization["enUS"][o["TitleId"]].replace(" /// ", " // ")
-            fixed_name = re.sub(r"<[^>]*>", "", fixed_name)
-            setCode = o["ExpansionCode"].lower()
-            if o["IsToken"] == 0:
-                if setCode == "conf":
-                    setCode = "con"
-                if setCode == "dar":
-                    setCode = "dom"
-                collectorNumber = o["CollectorNumber"] if "CollectorNumber" in o else o["CollectorNumber"]
-                # Process AKR cards separately (except basics)
-                if setCode == "akr":
-                    if o["Rarity"] != 1:
-                        AKRCards[fixed_name] = (o["GrpId"], collectorNumber, ArenaRarity[o["Rarity"]])
-                if setCode == "klr":
-                    if o["Rarity"] != 1:
-                        KLRCards[fixed_name] = (o["GrpId"], collectorNumber, ArenaRarity[o["Rarity"]])
-                else:
-                    # Jumpstart introduced duplicate (CollectorNumbet, Set), thanks Wizard! :D
-                    # Adding name to disambiguate.
-                    CardsCollectorNumberAndSet[(fixed_name, collectorNumber, setCode)] = o["GrpId"]
-
-                # Also add the digital only version if it exists
-                if o["DigitalReleaseSet"] != None and o["DigitalReleaseSet"] != "":
-                    digitalSet = o["DigitalReleaseSet"].lower()
-                    digitalSet = re.sub(r'y\d\d-(...)', r'y\1', digitalSet) # Convert alchemy set code (y26-sos -> ysos)
-                    CardsCollectorNumberAndSet[(fixed_name, "Digital", digitalSet)] = o["GrpId"]
-
-                # Also look of the Arena only version (ajmp) of the card on Scryfall
-                if setCode == "jmp":
-                    CardsCollectorNumberAndSet[(fixed_name, collectorNumber, "ajmp")] = o["GrpId"]
-
-                # From Jumpstart: Prioritizing cards from JMP and M21
-                if fixed_name not in CardNameToArenaIDForJumpstart or setCode in ["jmp", "m21"]:
-                    CardNameToArenaIDForJumpstart[fixed_name] = o["GrpId"]
-
-                if "IsRebalanced" in o and o["IsRebalanced"]:
-                    CardsCollectorNumberAndSet[("A-" + fixed_name, "A-" + collectorNumber, setCode)] = o["GrpId"]
-                    CardNameToArenaIDForJumpstart["A-" + fixed_name] = o["GrpId"]
-                # FIXME: J21 collector number differs between Scryfall and MTGA, record them to translate when exporting
-                #        (Also for secondary cards as there's some created cards in this set.)
-                if setCode == "j21":
-                    J21MTGACollectorNumbers[fixed_name] = collectorNumber
-                    
-    except Exception as e:
-        print(f"Error '{e}' while reading MTGA card database '{path}'")
-
-print("AKRCards length: {}".format(len(AKRCards.keys())))
-print("KLRCards length: {}".format(len(KLRCards.keys())))
-
-opener = urllib.request.build_opener()
-opener.addheaders = [("User-agent", "Mozilla/5.0"), ("Accept", "*/*")]
-urllib.request.install_opener(opener)
-
-# Get mana symbols info from Scryfall
-SymbologyFile = "./data/symbology.json"
-if not os.path.isfile(ManaSymbolsFile) or ForceSymbology:
-    urllib.request.urlretrieve("https://api.scryfall.com/symbology", SymbologyFile)
-    mana_symbols = {}
-    with open(SymbologyFile, "r", encoding="utf8") as file:
-        symbols = json.load(file)
-        for s in symbols["data"]:
-            mana_symbols[s["symbol"]] = {"cmc": s["cmc"], "colors": s["colors"]}
-    with open(ManaSymbolsFile, "w", encoding="utf8") as outfile:
-        json.dump(mana_symbols, outfile, indent=4)
-
-ManaSymbols = json.load(open(ManaSymbolsFile, "r"))
-
-
-def parseCost(mana_cost: str) -> [int, list[str]]:
-    if "//" in mana_cost:
-        mana_cost = mana_cost.split("//")[0].strip()
-    matches = re.findall(r"({[^}]+})", mana_cost)
-    cmc = 0
-    colors = set()
-    for symbol in matches:
-        if symbol in ManaSymbols:
-            cmc += ManaSymbols[symbol]["cmc"]
-            colors = colors.union(set(ManaSymbols[symbol]["colors"]))
-    lcolors = list(colors)
-    lcolors.sort(key=lambda val: {"W": 0, "U": 1, "B": 2, "R": 3, "G": 4}[val])
-    return [int(cmc), lcolors]
-
-
-with open("data/MTGADataDebug.json", "w") as outfile:
-    MTGADataDebugToJSON = {}
-    for key in CardsCollectorNumberAndSet.keys():
-        MTGADataDebugToJSON[str(key)] = CardsCollectorNumberAndSet[key]
-    json.dump(MTGADataDebugToJSON, outfile, sort_keys=True, indent=4)
-with open("data/J21MTGACollectorNumbers.json", "w") as outfile:
-    json.dump(J21MTGACollectorNumbers, outfile, sort_keys=True, indent=4)
 
 requests_headers = {"User-Agent": "Draftmancer DB Updater"}
 
-if not os.path.isfile(BulkDataPath) or ForceDownload:
-    # Get Bulk Data URL
-    response = requests.get("https://api.scryfall.com/bulk-data", headers=requests_headers)
-    bulkdata = json.loads(response.content)
-    if(response.status_code) != 200:
-        print(bulkdata)
-        exit()
-    allcardObject = next(x for x in bulkdata["data"] if x["type"] == "all_cards")
-    if allcardObject is None:
-        raise Exception("Could not find all_cards bulk data")
-    skip = False
-
-    if os.path.isfile(BulkDataPath):
-        updateTime = datetime.datetime.fromisoformat(allcardObject["updated_at"])
-        localFileTimestamp = os.path.getmtime(BulkDataPath)
-        localFileTime = datetime.datetime.fromtimestamp(localFileTimestamp, tz=datetime.timezone.utc)
-        if updateTime < localFileTime:
-            print(
-                f"Bulk data is already up-to-date (local: {localFileTime}, online: {allcardObject['updated_at']}, {updateTime})."
-            )
-            skip = True
-    if not skip:
-        allcardURL = allcardObject["jsonl_download_uri"]
-        print("Downloading {}...".format(allcardURL))
-        urllib.request.urlretrieve(allcardURL, BulkDataPath)
+LangRegex = re.compile(rb'"lang"\s*:\s*"([^"]+)"')
+# First occurrences are the top level properties (card_faces come later in Scryfall objects)
+KeyRegexes = [re.compile(rb'"%s"\s*:\s*"((?:[^"\\]|\\.)*)"' % k) for k in [b"name", b"set", b"collector_number"]]
+
+
+class BuildError(Exception):
+    pass
+
+
+class BuildOptions:
+    """Options of a build, parsed from the command line arguments (without the script name), see the usage above."""
+
+    def __init__(self, args: list[str] | None = None):
+        args = args if args is not None else []
+        self.args = args
+        self.stage = args[0].lower() if len(args) > 0 and not args[0].startswith("--") else ""
+        self.force_download = self.stage == "dl"
+        self.force_cache = self.force_download or self.stage == "cache"
+        self.force_ratings = self.stage == "ratings"
+        self.force_jumpstart = self.stage == "jmp"
+        self.force_symbology = self.stage == "symb"
+        self.force_features = self.stage == "features"
+        # arena: Only re-apply the Arena ids and booster rules to the cached card DB (see reapplyArenaData)
+        self.reapply_arena = self.stage == "arena"
+        # set <codes>: Manually fetch up-to-date data for these sets (comma separated)
+        self.sets_to_fetch = args[1].lower() if self.stage == "set" and len(args) > 1 else ""
+        if self.sets_to_fetch:
+            self.force_cache = True
+
+        self.mtga_folder = self.value("--mtga", DefaultMTGAFolder)
+        # Languages to keep in the card DB (e.g. --languages en,fr,ja), None for all of them. English is always kept.
+        self.languages = None
+        if "--languages" in args:
+            self.languages = set(self.value("--languages").lower().split(",")) | {"en"}
+        # --default-cards: Read Scryfall's much smaller default_cards bulk data (one record per printing, in English when it
+        # exists) instead of all_cards, and get the translations of the languages selected with --languages from a local
+        # cache refreshed incrementally through the search API (see LanguageCache.py).
+        self.default_cards = "--default-cards" in args
+        self.bulk_data_type = "all_cards"
+        self.bulk_data_path = BulkDataPath
+        if self.default_cards:
+            if self.languages is None:
+                raise BuildError("--default-cards requires --languages (e.g. --languages en,fr,ja).")
+            self.bulk_data_type = "default_cards"
+            self.bulk_data_path = DefaultCardsBulkDataPath
+        self.encoded = "--encoded" in args
+        self.normalized = "--normalized" in args
+        self.translation_packs = "--translation-packs" in args
+        # --skip-checks rarity_counts,... disables some of the output checks, e.g. after a set was legitimately reduced.
+        self.skipped_checks = [c for c in self.value("--skip-checks", "").split(",") if c]
+        # --no-publish: Validated outputs are left in the staging folder, to be published by the caller (see BuildStaging.py)
+        self.publish = "--no-publish" not in args
+        self.profile = "--profile" in args
+        # --engine columnar: Rebuild the cache with polars (see ColumnarPreprocess.py), same outputs as the default dict engine
+        self.engine = self.value("--engine", "dict")
+        if self.engine not in ["dict", "columnar"]:
+            raise BuildError(f"Unknown engine '{self.engine}' (dict or columnar).")
+        if self.engine == "columnar" and importlib.util.find_spec("polars") is None:
+            raise BuildError("--engine columnar requires polars (pip install polars).")
+
+    def value(self, name: str, default: str | None = None) -> str | None:
+        if name in self.args and self.args.index(name) + 1 < len(self.args):
+            return self.args[self.args.index(name) + 1]
+        return default
 
 
-if not os.path.isfile(ScryfallSets) or ForceDownload:
-    urllib.request.urlretrieve("https://api.scryfall.com/sets", ScryfallSets)
-    os.system(f"npx prettier --write {ScryfallSets}")
-SetsInfos = json.load(open(ScryfallSets, "r", encoding="utf8"))["data"]
-PrimarySets = [s["code"] for s in SetsInfos if s["set_type"] in ["core", "expansion", "masters", "draft_innovation"]]
-PrimarySets.extend(["unf", "ugl", "unh", "ust", "und"])  # Add Un-Sets as primary.
-PrimarySets.extend(["hbg", "planeshifted_snc", "ydmu"])
-PrimarySets.append("mat")  # Support mat as a draftable set (mom + mat cards)
-PrimarySets.append("om1")
+def handleTypeLine(typeLine: str) -> [str, list[str]]:
+    arr = typeLine.split(" — ")
+    types = arr[0]
+    subtypes = []  # Unused for now
+    if len(arr) > 1:
+        subtypes = arr[1].split()
+    return types, subtypes
+
+
+# Some dual faced Secret Lair cards have some key information hidden in the card_faces array. Extract it.
+def copyFromFaces(c: dict, prop: str) -> bool:
+    if prop not in c:
+        if (
+            "card_faces" in c
+            and len(c["card_faces"]) > 1
+            and prop in c["card_faces"][0]
+            and prop in c["card_faces"][1]
+            and c["card_faces"][0][prop] == c["card_faces"][1][prop]
+        ):
+            c[prop] = c["card_faces"][0][prop]
+        elif (
+            # Very special case for TDM reversible cards with adventures (e.g. Bloomvine Regent)
+            c["layout"] == "reversible_card"
+            and "card_faces" in c
+            and prop in c["card_faces"][0]
+        ):
+            c[prop] = c["card_faces"][0][prop]
+        else:
+            print(f"Warning: Missing '{prop}' for card '{c['name']}'.")
+            return False
+    return True
+
+
+def fixName(c: dict) -> str:
+    """Fixes the name of reversible cards in place, returns the name of the front face."""
+    frontName = c["name"]
+    if " //" in frontName:
+        faceNames = frontName.split(" //")
+        frontName = faceNames[0]
+        # Reversible cards (both sides are the same, just with a different art) special case: There's some inconsistency in the Scryfall data, sometimes the name is repeated, sometimes not. Never repeat it.
+        if faceNames[0] == faceNames[1].strip():
+            c["name"] = frontName
+        # And some reversible cards also have an adventure... e.g. Bloomvine Regent, becomes "Bloomvine Regent // Claim Territory // Bloomvine Regent"
+        if len(faceNames) == 3 and faceNames[0] == faceNames[2].strip():
+            c["name"] = f"{faceNames[0]} //{faceNames[1]}"
+    return frontName
+
+
+def updateImageCandidates(candidates: dict, c: dict, preferred_sets: list[str]):
+    """Tags c as the candidate image of its name and language ({name: {lang: record}}) if it's better than the current one:
+    From the preferred sets, then the most recent one (or with a modern frame)."""
+    current = candidates.setdefault(c["name"], {}).get(c["lang"])
+    if (
+        c["set"].lower() in preferred_sets
+        or current is None
+        or (
+            current["set"] not in preferred_sets
+            and (c["released_at"] > current["released_at"] or (c["frame"] == "2015" and current["frame"] == "1997"))
+        )
+    ):
+        candidates[c["name"]][c["lang"]] = c
+
+
+def indexedName(c: dict) -> str:
+    """Name under which the printing c is ranked among the printings of a card (see rankPrintingGroups)."""
+    if "printed_name" in c and c["printed_name"] != c["name"]:
+        return c["printed_name"]
+    if "flavor_name" in c and c["flavor_name"] != c["name"]:
+        return c["flavor_name"]
+    return c["name"]
 
 
 def append_set_cards(allcards, results):
@@ -294,9 +330,6 @@ def append_set_cards(allcards, results):
             print(f"Added: {c['name']}")
 
 
-import decimal
-
-
 class DecimalEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, decimal.Decimal):
@@ -305,277 +338,693 @@ class DecimalEncoder(json.JSONEncoder):
         return super().default(o)
 
 
-# Manually fetch up-to-date data for a specific set (really unoptimized)
-if FetchSet:
-    updatedcards = []
-    for setCode in SetsToFetch.split(","):
-        print("Fetching cards from {}...".format(setCode))
-        req_result = requests.get(
-            f"https://api.scryfall.com/cards/search?include_extras=true&include_variations=true&order=set&unique=prints&q=e%3A{setCode}", headers=requests_headers
-        ).json()
-
-        print(f"  Expected cards: {req_result['total_cards']}")
-        setcards = req_result["data"]
-        page = 2
-        while req_result["has_more"]:
-            # FIXME: req_result["next_page"] seems to sometimes return stale data for some reason. Maybe a cache issue somewhere and this will just move it, idk.
-            # req_result = requests.get(req_result["next_page"], headers=requests_headers).json()
-            req_result = requests.get(f"https://api.scryfall.com/cards/search?include_extras=true&include_variations=true&order=set&unique=prints&q=e%3A{setCode}&page={page}", headers=requests_headers).json()
-            setcards = setcards + req_result["data"]
-            page += 1
-        print(f"  Got {len(setcards)} cards from Scryfall for {setCode}.")
-        updatedcards = updatedcards + setcards
-    print(f"Total cards: {len(updatedcards)}")
-
-    tmpFilePath = BulkDataPath + ".tmp"
-    with gzip.open(BulkDataPath, "rt", encoding="utf8") as infile, gzip.open(tmpFilePath, "wt", encoding="utf-8") as outfile:
-
-        objects = (json.loads(line) for line in infile if line.strip())
-
-        setcards_by_ids = {card["id"]: card for card in updatedcards}
-        id_pattern = re.compile(r'"id"\s*:\s*"([^"]+)"')
-
-        print(f"Checking {len(setcards_by_ids)} cards...")
-        for line in infile:
-            if not line.strip():
-                continue
-                
-            match = id_pattern.search(line)
-            if match:
-                card_id = match.group(1)
-            else:
-                card_id = json.loads(line).get("id")
+def alternatesChunk(name: str) -> str:
+    # Same as alternatesChunk in client/src/MTGAAlternates.ts
+    first = name[:1].lower()
+    return first if "a" <= first <= "z" else "_"
+
+
+def writeMTGAChunks(mtga_cards: dict, alternates: dict, folder: str = MTGAChunksFolder):
+    """Arena cards split by set and alternates split by first letter, with a manifest (arena id range of each set, so the
+    client only loads the chunks it needs). File names are listed in the manifest ('con' is reserved on Windows).
+    Image URIs are written as they are in mtga_cards: Templated, like in the DB files (see ImageURIs.py)."""
+    os.makedirs(folder, exist_ok=True)
+    for path in glob.glob(f"{folder}/*.json"):
+        os.remove(path)
+    manifest = {"cards": {}, "alternates": {}}
+    by_set = {}
+    for aid, c in mtga_cards.items():
+        by_set.setdefault(c["set"], {})[aid] = c
+    for mtgset, set_cards in sorted(by_set.items()):
+        filename = f"MTGACards.{mtgset if mtgset != 'con' else 'conf'}.json"
+        with open(f"{folder}/{filename}", "w", encoding="utf8") as outfile:
+            json.dump(set_cards, outfile, ensure_ascii=False, separators=(",", ":"))
+        manifest["cards"][mtgset] = {"file": filename, "min": min(set_cards), "max": max(set_cards), "count": len(set_cards)}
+    by_chunk = {}
+    for name, ids in alternates.items():
+        by_chunk.setdefault(alternatesChunk(name), {})[name] = ids
+    for chunk, chunk_alternates in sorted(by_chunk.items()):
+        filename = f"MTGAAlternates.{chunk}.json"
+        with open(f"{folder}/{filename}", "w", encoding="utf8") as outfile:
+            json.dump(chunk_alternates, outfile, ensure_ascii=False, separators=(",", ":"))
+        manifest["alternates"][chunk] = filename
+    with open(f"{folder}/Manifest.json", "w", encoding="utf8") as outfile:
+        json.dump(manifest, outfile, ensure_ascii=False, indent=4)
+    print(f"Arena cards: {len(mtga_cards)} cards in {len(by_set)} chunks, alternates in {len(by_chunk)} chunks.")
 
-            if card_id in setcards_by_ids:
-                card = setcards_by_ids.pop(card_id)
-                print(f"  Updating {card['name']}")
-                json.dump(card, outfile, cls=DecimalEncoder)
-                outfile.write("\n")
-            else:
-                outfile.write(line)
 
-        print(f"Writing {len(setcards_by_ids)} new cards...")
+def overrideViewbox(svgPath, expectedViewbox, correctedViewbox):
+    with open(svgPath, "r") as inputFile:
+        inputFile.seek(0)
+        content = inputFile.read()
+        if 'viewBox="%s"' % expectedViewbox not in content:
+            print("svg did not have expected viewbox: %s" % svgPath)
+            return
+        content = content.replace('viewBox="%s"' % expectedViewbox, 'viewBox="%s"' % correctedViewbox)
+    with open(svgPath, "w") as outputFile:
+        outputFile.write(content)
 
-        for card in setcards_by_ids.values():
-            print(f"  Adding {card['name']}")
-            json.dump(card, outfile, cls=DecimalEncoder)
-            outfile.write("\n")
 
-    if os.path.isfile(BulkDataPath + ".bak"):
-        os.remove(BulkDataPath + ".bak")
-    os.rename(BulkDataPath, BulkDataPath + ".bak")
-    os.rename(tmpFilePath, BulkDataPath)
+def getIcon(mtgset, icon_path):
+    if not os.path.isfile(
+        "client/public/" + icon_path
+    ):  # or filecmp.cmp("client/public/" + icon_path, "client/public/img/sets/default.svg", shallow=False):
+        try:
+            response = requests.get(f"{ScryfallAPI}/sets/{mtgset}")
+            scryfall_set_data = json.loads(response.content)
+            if scryfall_set_data and "icon_svg_uri" in scryfall_set_data:
+                urllib.request.urlretrieve(scryfall_set_data["icon_svg_uri"], "client/public/" + icon_path)
+                if set == "rna":
+                    overrideViewbox(icon_path, "0 0 32 32", "0 6 32 20")
+                return icon_path
+        except:
+            print("Error getting set '{}' icon:".format(mtgset), sys.exc_info()[0])
+    else:
+        return icon_path
+    return None
 
-    ForceCache = True
 
+###############################################################################
+# Precompile local cubes (simple card lists only) to card IDs, so the server doesn't have to parse them on startup.
+# Unknown names fail the build instead of being silently skipped at runtime. Names shared by several cards (without a set)
+# resolve to the CardsByName choice, like the server's parser, with a warning.
+
+CubesFolder = "data/cubes"
+CompiledCubesFolder = "data/cubes/compiled"
+# Same as ArenaLineRegex in src/parseCardList.ts
+ArenaLineRegex = re.compile(
+    r"^(?:(?P<count>\d+)\s+)?(?P<name>.+?)(?:\s+\((?P<set>\w+)\)(?:\s+(?P<number>[^+\s()]+))?)?(?:\s+\+?(F))?$"
+)
+SimpleLineRegex = re.compile(r"^(?:(?P<count>\d+)\s+)?(?P<name>.+?)(?:\s+\+?(F))?$")
 
-def handleTypeLine(typeLine: str) -> [str, list[str]]:
-    arr = typeLine.split(" — ")
-    types = arr[0]
-    subtypes = []  # Unused for now
-    if len(arr) > 1:
-        subtypes = arr[1].split()
-    return types, subtypes
 
+###############################################################################
+# Downstream stages (Jumpstart boosters, The List, local cubes, basic lands and set counts, set infos and icons, constants):
+# They only read the card DB and run concurrently, see StageScheduler.py. Their outputs are written and their logs printed
+# in order once all are done.
+# Stages are methods of the build: Process stages run in forked workers, which inherit the build and its cards.
+
+
+class CardDataBuild:
+    def __init__(self, options: BuildOptions, session: CardDataSession | None = None):
+        """session: Card data loaded by a previous build in this process, reused if the cache isn't rebuilt."""
+        self.options = options
+        self.session = session
+        self.arena_ids = {}  # (name, collector number, set) -> Arena id (GrpId)
+        self.jumpstart_arena_ids = {}  # Card name -> Arena id
+        self.akr_cards = {}
+        self.klr_cards = {}
+        self.j21_collector_numbers = {}
+        self.mana_symbols = {}
+        self.sets_infos = []  # Scryfall sets
+        self.primary_sets = []
+        self.cc_ratings = {}
+        self.limited_ratings = {}
+        self.booster_rules = None
+        # Keep track of cards that were not added to the database (by (name, set, collector number))). After the first pass
+        # this will contain cards never printed in English.
+        self.non_processed_cards = {}
+        self.cache_rebuilt = False
+        self.db_updated = False
+        self.staging = None
+
+    @property
+    def cards(self) -> dict:
+        return self.session.cards
+
+    def run(self) -> list[str]:
+        """Runs the whole build, returns the errors that should fail it (invalid cubes or card DB)."""
+        options = self.options
+        self.staging = Staging()
+        self.loadMTGAData()
+
+        opener = urllib.request.build_opener()
+        opener.addheaders = [("User-agent", "Mozilla/5.0"), ("Accept", "*/*")]
+        urllib.request.install_opener(opener)
+
+        self.updateSymbology()
+        self.writeMTGADebugData()
+        self.downloadBulkData()
+        self.refreshLanguageCache()
+        self.loadSets()
+        if options.sets_to_fetch:
+            self.fetchSets(options.sets_to_fetch)
+        self.indexBulkData()
+        self.loadRatings()
+        self.booster_rules = loadRules(BoosterRulesPath)
+
+        self.cache_rebuilt = not os.path.isfile(FirstFinalDataPath) or options.force_cache
+        if not self.cache_rebuilt and self.session is None:
+            # Downstream stages operate on the cards in memory (see CardDataSession.py), loaded from the DB files.
+            self.session = CardDataSession()
+        if not self.cache_rebuilt:
+            self.session.staging = self.staging
+            if options.reapply_arena and not self.reapplyArenaData():
+                print(colored("No up to date seekable copy of the bulk data for all cards, rebuilding the cache.", "yellow"))
+                self.cache_rebuilt = True
+        if self.cache_rebuilt:
+            self.buildCache()
+        # Outputs derived from the whole card DB are refreshed when it changed
+        self.db_updated = self.cache_rebuilt or options.reapply_arena
+        self.runSessionStages()
+
+        print("Cards in database: ", len(self.cards))
+        results = self.runDownstreamStages()
+        # Invalid cubes fail the build before any stage output is written
+        if len(results["cubes"].value) > 0:
+            self.staging.discard()
+            return results["cubes"].value
+        writeResults(results, self.staging.path)
+        errors = self.checkOutputs()
+        if len(errors) > 0:
+            print(colored("Card DB check failed, outputs not published.", "red"))
+            self.staging.discard()
+        elif self.options.publish:
+            self.staging.publish()
+        else:
+            self.staging.save()
+        return errors
 
-# Ratings derived from CubeCobra card ELO
-CCRatings = {}
-with open("data/cubecobra-ratings.json", "r", encoding="utf8") as file:
-    CCRatings = json.loads(file.read())
+    ###########################################################################
+    # Inputs
 
+    def loadMTGAData(self):
+        mtga_data_folder = f"{self.options.mtga_folder}MTGA_Data/Downloads/Raw/"
+        mtga_card_db_files = glob.glob(f"{mtga_data_folder}Raw_CardDatabase_*.mtga")
+        if len(mtga_card_db_files) == 0:
+            raise BuildError(f"No MTGA Card DB files found in {mtga_data_folder}")
 
-def safeInBoosterCheck(card: dict, max: int) -> bool:
-    try:
-        number = int(card["collector_number"])
-        return number > 0 and number <= max
-    except:
-        return False
-
-
-# Keep track of cards that were not added to the database (by (name, set, collector number))). After the first pass this will contain cards never printed in English.
-NonProcessedCards = {}
-if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
-    all_cards = []
-    with gzip.open(BulkDataPath, "rt", encoding="utf8") as file:
-        objects = (json.loads(line) for line in file if line.strip())
-        ScryfallCards = (
-            o for o in objects 
-            if o.get("layout") not in ["token", "double_faced_token", "art_series"]
+        db_age = min(
+            [(datetime.datetime.now() - datetime.datetime.fromtimestamp(os.path.getmtime(x))).days for x in mtga_card_db_files]
+        )
+        print(
+            colored(f"\n  Don't forget to update Arena itself!", "yellow"),
+            colored(f" (Last update {db_age} days ago)\n", "blue"),
         )
 
-        akr_candidates = {}
-        klr_candidates = {}
-        print("\rPreProcessing... ", end="", flush=True)
-        copied = 0
-        handled = 0
-        for c in ScryfallCards:
-            handled += 1
-
-            if c["layout"] in ["token", "double_faced_token", "emblem", "art_series"]:
-                # Essence of Ajani is an playtest emblem that can played as a normal card.
-                if c["name"] not in ["Essence of Ajani"]:
-                    continue
-            # Ignore "variations" of cards: https://scryfall.com/search?q=is%3Avariation ... Except for Arabian Night: Those can appear in normal packs.
-            if "variation" in c and c["variation"] and c["set"] != "arn":
+        MTGALocalization = {key: {} for key in LangCodes}
+        for path in mtga_card_db_files:
+            try:
+                MTGACardDB = sqlite3.connect(path)
+                MTGACardDB.row_factory = sqlite3.Row
+                for lang in LangCodes:
+                    for row in MTGACardDB.execute(f"SELECT LocId, Loc FROM Localizations_{lang}").fetchall():
+                        MTGALocalization[lang][row["LocId"]] = row["Loc"]
+                for o in MTGACardDB.execute(f"SELECT * FROM Cards").fetchall():
+                    # Ignore... Wildcards?! (TitleId 0)
+                    if o["TitleId"] not in MTGALocalization["enUS"]:
+                        continue
+                    fixed_name = MTGALocalization["enUS"][o["TitleId"]].replace(" /// ", " // ")
+                    fixed_name = re.sub(r"<[^>]*>", "", fixed_name)
+                    setCode = o["ExpansionCode"].lower()
+                    if o["IsToken"] == 0:
+                        if setCode == "conf":
+                            setCode = "con"
+                        if setCode == "dar":
+                            setCode = "dom"
+                        collectorNumber = o["CollectorNumber"] if "CollectorNumber" in o else o["CollectorNumber"]
+                        # Process AKR cards separately (except basics)
+                        if setCode == "akr":
+                            if o["Rarity"] != 1:
+                                self.akr_cards[fixed_name] = (o["GrpId"], collectorNumber, ArenaRarity[o["Rarity"]])
+                        if setCode == "klr":
+                            if o["Rarity"] != 1:
+                                self.klr_cards[fixed_name] = (o["GrpId"], collectorNumber, ArenaRarity[o["Rarity"]])
+                        else:
+                            # Jumpstart introduced duplicate (CollectorNumbet, Set), thanks Wizard! :D
+                            # Adding name to disambiguate.
+                            self.arena_ids[(fixed_name, collectorNumber, setCode)] = o["GrpId"]
+
+                        # Also add the digital only version if it exists
+                        if o["DigitalReleaseSet"] != None and o["DigitalReleaseSet"] != "":
+                            digitalSet = o["DigitalReleaseSet"].lower()
+                            digitalSet = re.sub(r'y\d\d-(...)', r'y\1', digitalSet) # Convert alchemy set code (y26-sos -> ysos)
+                            self.arena_ids[(fixed_name, "Digital", digitalSet)] = o["GrpId"]
+
+                        # Also look of the Arena only version (ajmp) of the card on Scryfall
+                        if setCode == "jmp":
+                            self.arena_ids[(fixed_name, collectorNumber, "ajmp")] = o["GrpId"]
+
+                        # From Jumpstart: Prioritizing cards from JMP and M21
+                        if fixed_name not in self.jumpstart_arena_ids or setCode in ["jmp", "m21"]:
+                            self.jumpstart_arena_ids[fixed_name] = o["GrpId"]
+
+                        if "IsRebalanced" in o and o["IsRebalanced"]:
+                            self.arena_ids[("A-" + fixed_name, "A-" + collectorNumber, setCode)] = o["GrpId"]
+                            self.jumpstart_arena_ids["A-" + fixed_name] = o["GrpId"]
+                        # FIXME: J21 collector number differs between Scryfall and MTGA, record them to translate when exporting
+                        #        (Also for secondary cards as there's some created cards in this set.)
+                        if setCode == "j21":
+                            self.j21_collector_numbers[fixed_name] = collectorNumber
+
+            except Exception as e:
+                print(f"Error '{e}' while reading MTGA card database '{path}'")
+
+        print("AKRCards length: {}".format(len(self.akr_cards.keys())))
+        print("KLRCards length: {}".format(len(self.klr_cards.keys())))
+
+    def updateSymbology(self):
+        # Get mana symbols info from Scryfall
+        if not os.path.isfile(ManaSymbolsFile) or self.options.force_symbology:
+            urllib.request.urlretrieve(f"{ScryfallAPI}/symbology", SymbologyFile)
+            mana_symbols = {}
+            with open(SymbologyFile, "r", encoding="utf8") as file:
+                symbols = json.load(file)
+                for s in symbols["data"]:
+                    mana_symbols[s["symbol"]] = {"cmc": s["cmc"], "colors": s["colors"]}
+            with open(ManaSymbolsFile, "w", encoding="utf8") as outfile:
+                json.dump(mana_symbols, outfile, indent=4)
+
+        self.mana_symbols = json.load(open(ManaSymbolsFile, "r"))
+
+    def parseCost(self, mana_cost: str) -> [int, list[str]]:
+        if "//" in mana_cost:
+            mana_cost = mana_cost.split("//")[0].strip()
+        matches = re.findall(r"({[^}]+})", mana_cost)
+        cmc = 0
+        colors = set()
+        for symbol in matches:
+            if symbol in self.mana_symbols:
+                cmc += self.mana_symbols[symbol]["cmc"]
+                colors = colors.union(set(self.mana_symbols[symbol]["colors"]))
+        lcolors = list(colors)
+        lcolors.sort(key=lambda val: {"W": 0, "U": 1, "B": 2, "R": 3, "G": 4}[val])
+        return [int(cmc), lcolors]
+
+    def writeMTGADebugData(self):
+        with open(self.staging.path("data/MTGADataDebug.json"), "w") as outfile:
+            MTGADataDebugToJSON = {}
+            for key in self.arena_ids.keys():
+                MTGADataDebugToJSON[str(key)] = self.arena_ids[key]
+            json.dump(MTGADataDebugToJSON, outfile, sort_keys=True, indent=4)
+        with open(self.staging.path("data/J21MTGACollectorNumbers.json"), "w") as outfile:
+            json.dump(self.j21_collector_numbers, outfile, sort_keys=True, indent=4)
+
+    def downloadBulkData(self):
+        bulk_data_path = self.options.bulk_data_path
+        if os.path.isfile(bulk_data_path) and not self.options.force_download:
+            return
+        # Get Bulk Data URL
+        response = requests.get(f"{ScryfallAPI}/bulk-data", headers=requests_headers)
+        bulkdata = json.loads(response.content)
+        if(response.status_code) != 200:
+            raise BuildError(f"Could not get the bulk data list: {bulkdata}")
+        allcardObject = next((x for x in bulkdata["data"] if x["type"] == self.options.bulk_data_type), None)
+        if allcardObject is None:
+            raise BuildError(f"Could not find {self.options.bulk_data_type} bulk data")
+
+        if os.path.isfile(bulk_data_path):
+            updateTime = datetime.datetime.fromisoformat(allcardObject["updated_at"])
+            localFileTimestamp = os.path.getmtime(bulk_data_path)
+            localFileTime = datetime.datetime.fromtimestamp(localFileTimestamp, tz=datetime.timezone.utc)
+            if updateTime < localFileTime:
+                print(
+                    f"Bulk data is already up-to-date (local: {localFileTime}, online: {allcardObject['updated_at']}, {updateTime})."
+                )
+                return
+        allcardURL = allcardObject["jsonl_download_uri"]
+        print("Downloading {}...".format(allcardURL))
+        urllib.request.urlretrieve(allcardURL, bulk_data_path)
+
+    def refreshLanguageCache(self):
+        options = self.options
+        if not options.default_cards:
+            return
+        # Refreshes are incremental (see LanguageCache.py): Done by every run that may rebuild the cache, not only by dl.
+        refresh = options.force_cache or options.stage == ""
+        for lang in sorted(options.languages - {"en"}):
+            if refresh or not os.path.isfile(cachePath(LanguageCacheFolder, lang)):
+                print(f"Refreshing '{lang}' printings...", end="", flush=True)
+                try:
+                    total, fetched = refreshLanguage(LanguageCacheFolder, lang, requests_headers)
+                except requests.RequestException as e:
+                    print()
+                    raise BuildError(f"Could not refresh the '{lang}' printings from Scryfall: {e}")
+                print(f" {fetched} fetched, {total} cached.")
+
+    def loadSets(self):
+        if not os.path.isfile(ScryfallSets) or self.options.force_download:
+            urllib.request.urlretrieve(f"{ScryfallAPI}/sets", ScryfallSets)
+            os.system(f"npx prettier --write {ScryfallSets}")
+        self.sets_infos = json.load(open(ScryfallSets, "r", encoding="utf8"))["data"]
+        PrimarySets = [
+            s["code"] for s in self.sets_infos if s["set_type"] in ["core", "expansion", "masters", "draft_innovation"]
+        ]
+        PrimarySets.extend(["unf", "ugl", "unh", "ust", "und"])  # Add Un-Sets as primary.
+        PrimarySets.extend(["hbg", "planeshifted_snc", "ydmu"])
+        PrimarySets.append("mat")  # Support mat as a draftable set (mom + mat cards)
+        PrimarySets.append("om1")
+        self.primary_sets = PrimarySets
+
+    # Manually fetch up-to-date data for a specific set (really unoptimized)
+    def fetchSets(self, sets_to_fetch: str):
+        bulk_data_path = self.options.bulk_data_path
+        updatedcards = []
+        for setCode in sets_to_fetch.split(","):
+            print("Fetching cards from {}...".format(setCode))
+            req_result = requests.get(
+                f"{ScryfallAPI}/cards/search?include_extras=true&include_variations=true&order=set&unique=prints&q=e%3A{setCode}", headers=requests_headers
+            ).json()
+
+            print(f"  Expected cards: {req_result['total_cards']}")
+            setcards = req_result["data"]
+            page = 2
+            while req_result["has_more"]:
+                # FIXME: req_result["next_page"] seems to sometimes return stale data for some reason. Maybe a cache issue somewhere and this will just move it, idk.
+                # req_result = requests.get(req_result["next_page"], headers=requests_headers).json()
+                req_result = requests.get(f"{ScryfallAPI}/cards/search?include_extras=true&include_variations=true&order=set&unique=prints&q=e%3A{setCode}&page={page}", headers=requests_headers).json()
+                setcards = setcards + req_result["data"]
+                page += 1
+            print(f"  Got {len(setcards)} cards from Scryfall for {setCode}.")
+            updatedcards = updatedcards + setcards
+        print(f"Total cards: {len(updatedcards)}")
+
+        # Records to replace are found by id in the seekable copy of the bulk data (see BulkCache.py), unchanged ones are skipped
+        self.indexBulkData()
+        records = BulkRecords(bulk_data_path, loadIndex(bulk_data_path))
+        replaced = {}  # frame -> [(offset in frame, length, card)]
+        added = []
+        print(f"Checking {len(updatedcards)} cards...")
+        for card in {card["id"]: card for card in updatedcards}.values():
+            location = records.locate(card["id"])
+            if location is None:
+                added.append(card)
+            elif records.get(card["id"]) != card:
+                n, offset, length = location
+                replaced.setdefault(n, []).append((offset, length, card))
+        if len(replaced) == 0 and len(added) == 0:
+            print("Bulk data already up to date.")
+            return
+
+        tmpFilePath = bulk_data_path + ".tmp"
+        with gzip.open(tmpFilePath, "wb") as outfile:
+            for n in range(len(records.index["frames"])):
+                frame = records.readFrame(n)
+                position = 0
+                for offset, length, card in sorted(replaced.get(n, []), key=lambda r: r[0]):
+                    print(f"  Updating {card['name']}")
+                    line = frame[offset : offset + length]
+                    outfile.write(frame[position:offset])
+                    outfile.write(json.dumps(card, cls=DecimalEncoder).encode("utf8") + line[len(line.rstrip(b",\r\n")) :])
+                    position = offset + length
+                outfile.write(frame[position:])
+
+            print(f"Writing {len(added)} new cards...")
+            for card in added:
+                print(f"  Adding {card['name']}")
+                outfile.write(json.dumps(card, cls=DecimalEncoder).encode("utf8") + b"\n")
+
+        if os.path.isfile(bulk_data_path + ".bak"):
+            os.remove(bulk_data_path + ".bak")
+        os.rename(bulk_data_path, bulk_data_path + ".bak")
+        os.rename(tmpFilePath, bulk_data_path)
+
+    def indexBulkData(self):
+        # Seekable copy of the bulk data, (re)made whenever it's missing or older than the bulk data, e.g. just after a
+        # download or when the bulk data was replaced by hand (see BulkCache.py)
+        bulk_data_path = self.options.bulk_data_path
+        if os.path.isfile(bulk_data_path) and loadIndex(bulk_data_path) is None:
+            print("Recompressing bulk data into seekable frames...", end="", flush=True)
+            print(f" {len(recompress(bulk_data_path)['frames'])} frames.")
+
+    def loadRatings(self):
+        # Ratings derived from CubeCobra card ELO
+        with open("data/cubecobra-ratings.json", "r", encoding="utf8") as file:
+            self.cc_ratings = json.loads(file.read())
+
+        # Per-set ratings derived from Limited data (17lands exports in RatingSourceFolder), mapped onto the CubeCobra ratings
+        # scale. Take precedence over CubeCobra ratings for printings of the corresponding set.
+        if self.options.force_ratings or (not os.path.isfile(RatingsDest) and len(glob.glob(f"{RatingSourceFolder}*")) > 0):
+            print("Aggregating Limited ratings...")
+            written = computeRatings(RatingSourceFolder, self.staging.path(RatingsDest), self.cc_ratings)
+            print(f"Ratings for {written} sets written to {RatingsDest}.")
+        if os.path.isfile(self.staging.read(RatingsDest)):
+            with open(self.staging.read(RatingsDest), "r", encoding="utf8") as file:
+                self.limited_ratings = json.loads(file.read())
+
+    ###########################################################################
+    # Card data cache
+
+    def withCachedTranslations(self, file):
+        """Lines of the default_cards bulk data, followed by the cached printings in the selected languages it doesn't include."""
+        default_ids = set()
+        for line in file:
+            m = IdRegex.search(line)
+            if m is not None:
+                default_ids.add(m.group(1).decode())
+            yield line
+        yield from cachedLines(LanguageCacheFolder, self.options.languages - {"en"}, default_ids)
+
+    def readBulkData(self, file):
+        """Decoded records of the bulk data file (followed by the cached translations with --default-cards).
+        With --languages, records in other languages are discarded before being decoded, except for printings that don't exist
+        in any of the selected languages (see non_processed_cards): The first record of each of them is kept (compressed) and
+        decoded at the end if no record in a selected language showed up."""
+        languages = self.options.languages
+        if self.options.default_cards:
+            file = self.withCachedTranslations(file)
+        if languages is None:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        kept_keys = set()
+        fallback = {}
+        dropped = 0
+        for line in file:
+            if not line.strip():
+                continue
+            m = LangRegex.search(line)
+            if m is None or m.group(1).decode() in languages:
+                c = json.loads(line)
+                key = (c.get("name"), c.get("set"), c.get("collector_number"))
+                kept_keys.add(key)
+                fallback.pop(key, None)
+                yield c
                 continue
+            dropped += 1
+            matches = [r.search(line) for r in KeyRegexes]
+            if None in matches:
+                continue
+            key = tuple(json.loads(b'"' + m.group(1) + b'"') for m in matches)
+            if key not in kept_keys and key not in fallback:
+                fallback[key] = zlib.compress(line)
+        print(f"\rPreProcessing... {dropped} records in other languages skipped, {len(fallback)} of them kept as fallback.")
+        for line in fallback.values():
+            yield json.loads(zlib.decompress(line))
+
+    def buildCache(self):
+        """Rebuilds the card DB from the bulk data: DB files, Arena chunks and printing indexes."""
+        if self.options.engine == "columnar":
+            from ColumnarPreprocess import columnarCards  # Requires polars
+
+            cards, byName, byOracle = columnarCards(self)
+        else:
+            all_cards = self.preprocessBulkData()
+            cards, cardsByName = self.generateCards(all_cards)
+            byName, byOracle = self.rankPrintingGroups(cards, cardsByName)
+        # Image URIs are kept templated, like in the DB files (see ImageURIs.py)
+        templated = {cid: templateImageURIs(c, cid) for cid, c in cards.items()}
+        report = imageURIReport(cards, templated)
+        cards = templated
+        self.writeArenaChunks(cards)
+        self.writePrintingIndexes(byName, byOracle)
+
+        # Downstream stages operate on the cards in memory (see CardDataSession.py), the session also writes the DB files.
+        self.session = CardDataSession(cards=cards, staging=self.staging)
+        print(f"Split DB, starting with {len(cards)} cards")
+        shards = self.session.writeShards()
+        for f, ids in shards.items():
+            print(f"  Added {len(ids)} cards to {os.path.basename(f)}")
+        if sum(len(ids) for ids in shards.values()) != len(cards):
+            print("Error: Some cards were not written to the split DB")
+        saved = 100 * (1 - report["after"] / report["before"]) if report["before"] > 0 else 0
+        print(
+            f"Image URIs: {report['templated']} templated, {report['kept']} kept as is, "
+            f"{report['before']} -> {report['after']} bytes ({saved:.1f}% saved)"
+        )
 
-            # Tag this card as a candidate for AKR card images (to avoid using MTGA images)
-            if c["name"] in AKRCards:
-                if c["name"] not in akr_candidates:
-                    akr_candidates[c["name"]] = {}
-                # Prioritize version of cards from Amonkhet (AKH) or Hour of Devastation (HOU)
-                if (
-                    (c["set"].lower() in ["akh", "hou"])
-                    or c["lang"] not in akr_candidates[c["name"]]
-                    or (
-                        akr_candidates[c["name"]][c["lang"]]["set"] not in ["akh", "hou"]
-                        and (
-                            c["released_at"] > akr_candidates[c["name"]][c["lang"]]["released_at"]
-                            or (c["frame"] == "2015" and akr_candidates[c["name"]][c["lang"]]["frame"] == "1997")
-                        )
-                    )
-                ):
-                    akr_candidates[c["name"]][c["lang"]] = c
-            if c["name"] in KLRCards:
-                if c["name"] not in klr_candidates:
-                    klr_candidates[c["name"]] = {}
-                # Prioritize version of cards from Kaladesh (KLD) or Aether Revolt (AER)
-                if (
-                    (c["set"].lower() in ["kld", "aer"])
-                    or c["lang"] not in klr_candidates[c["name"]]
-                    or (
-                        klr_candidates[c["name"]][c["lang"]]["set"] not in ["kld", "aer"]
-                        and (
-                            c["released_at"] > klr_candidates[c["name"]][c["lang"]]["released_at"]
-                            or (c["frame"] == "2015" and klr_candidates[c["name"]][c["lang"]]["frame"] == "1997")
-                        )
-                    )
-                ):
-                    klr_candidates[c["name"]][c["lang"]] = c
-
-            frontName = c["name"]
-            if " //" in frontName:
-                faceNames = frontName.split(" //")
-                frontName = faceNames[0]
-                # Reversible cards (both sides are the same, just with a different art) special case: There's some inconsistency in the Scryfall data, sometimes the name is repeated, sometimes not. Never repeat it.
-                if faceNames[0] == faceNames[1].strip():
-                    c["name"] = frontName
-                # And some reversible cards also have an adventure... e.g. Bloomvine Regent, becomes "Bloomvine Regent // Claim Territory // Bloomvine Regent"
-                if len(faceNames) == 3 and faceNames[0] == faceNames[2].strip():
-                    c["name"] = f"{faceNames[0]} //{faceNames[1]}"
-            mtga_set = c["set"].lower()
-            if (c["name"], c["collector_number"], mtga_set) in CardsCollectorNumberAndSet:
-                c["arena_id"] = CardsCollectorNumberAndSet[(c["name"], c["collector_number"], mtga_set)]
-            elif (frontName, c["collector_number"], mtga_set) in CardsCollectorNumberAndSet:
-                c["arena_id"] = CardsCollectorNumberAndSet[(frontName, c["collector_number"], mtga_set)]
-            # Check digital only versions (AA1, AA2...)
-            elif (c["name"], "Digital", mtga_set) in CardsCollectorNumberAndSet:
-                c["arena_id"] = CardsCollectorNumberAndSet[(c["name"], "Digital", mtga_set)]
-            elif (frontName, "Digital", mtga_set) in CardsCollectorNumberAndSet:
-                c["arena_id"] = CardsCollectorNumberAndSet[(frontName, "Digital", mtga_set)]
-            elif mtga_set in MTGASetConversions:
-                mtga_set = MTGASetConversions[mtga_set]
-                if (c["name"], c["collector_number"], mtga_set) in CardsCollectorNumberAndSet:
-                    c["arena_id"] = CardsCollectorNumberAndSet[(c["name"], c["collector_number"], mtga_set)]
-                elif (frontName, c["collector_number"], mtga_set) in CardsCollectorNumberAndSet:
-                    c["arena_id"] = CardsCollectorNumberAndSet[(frontName, c["collector_number"], mtga_set)]
-
-            # Workaround for Teferi, Master of Time (M21) variations (exclude all except the first one from boosters)
-            if c["set"] == "m21" and c["collector_number"] in ["275", "276", "277"]:
-                c["booster"] = False
-            # Workaround for premium version of some afr cards
-            cnAsInt = 0
-            try:
-                cnAsInt = int(c["collector_number"])
-                if c["set"] == "afr" and ("★" in c["collector_number"] or cnAsInt > 281):
-                    c["booster"] = False
-            except ValueError:
-                pass
-
-            if "color_indicator" in c:
-                c["colors"].sort(key=lambda val: {"W": 0, "U": 1, "B": 2, "R": 3, "G": 4}[val])
+    def writeArenaChunks(self, cards: dict):
+        MTGACards = {}
+        MTGACardsAlternates = {}
+        for c in cards.values():
+            if "arena_id" in c:
+                MTGACards[c["arena_id"]] = c
+                if c["name"] not in MTGACardsAlternates:
+                    MTGACardsAlternates[c["name"]] = []
+                MTGACardsAlternates[c["name"]].append(c["arena_id"])
+        writeMTGAChunks(MTGACards, MTGACardsAlternates, self.staging.path(MTGAChunksFolder))
+
+    def reapplyArenaData(self) -> bool:
+        """Re-applies the Arena ids and booster rules to the cached card DB (arena stage), without rebuilding it: The Scryfall
+        records of its cards are read by id from the seekable copy of the bulk data (see BulkCache.py), in file order so each
+        frame is only decompressed once, and only go through prepareRecord and cardSelection. Translations and images are
+        kept as is (the AKR/KLR image substitutions are only redone by a cache rebuild).
+        Returns False if the cache has to be rebuilt instead (no up to date seekable copy, or cards missing from it)."""
+        bulk_data_path = self.options.bulk_data_path
+        bulk_index = loadIndex(bulk_data_path)
+        if bulk_index is None:
+            return False
+        records = BulkRecords(bulk_data_path, bulk_index)
+        locations = []
+        for cid in self.cards:
+            location = records.locate(cid)
+            if location is None:
+                return False
+            locations.append((location, cid))
+        locations.sort()
+
+        cards = self.cards
+        updated = set()
+        printings = []
+        for _, cid in locations:
+            c = records.get(cid)
+            self.prepareRecord(c)
+            copyFromFaces(c, "type_line")
+            copyFromFaces(c, "oracle_id")
+            if c["lang"] != "en":
+                self.non_processed_cards[(c["name"], c["set"], c["collector_number"])] = c
             else:
-                c["colors"] = None
-
-            all_cards.append(
-                {
-                    k: c[k]
-                    for k in c
-                    if k
-                    in [
-                        "id",
-                        "oracle_id",
-                        "name",
-                        "printed_name",
-                        "flavor_name",
-                        "mana_cost",
-                        "colors",
-                        "set",
-                        "collector_number",
-                        "lang",
-                        "layout",
-                        "type_line",
-                        "rarity",
-                        "arena_id",
-                        "booster",
-                        "card_faces",
-                        "image_uris",
-                        "oracle_text",
-                        "keywords",
-                        "finishes",
-                        "frame_effects",
-                        "image_status",
-                        "promo",
-                        "promo_types",
-                        "released_at",
-                        "related_cards",
-                        "all_parts",
-                    ]
-                }
+                printings.append(c)
+            selection = self.cardSelection(c)
+            card = cards[cid]
+            # Properties only set for some cards, which may have been lost since the cached build
+            lost = [key for key in ["arena_id", "draft_effects", "related_cards", "layout"] if key in card and key not in selection]
+            if lost or any(card.get(key) != value for key, value in selection.items()):
+                for key in lost:
+                    del card[key]
+                card.update(selection)
+                updated.add(cid)
+        for f, ids in self.session.shards.items():
+            if not updated.isdisjoint(ids):
+                self.session.writeShard(f)
+        print(f"Arena ids and booster rules re-applied: {len(updated)}/{len(cards)} cards updated.")
+        # Same order as generateCards: Printings without an English version last
+        cardsByName = {}
+        for c in printings + list(self.non_processed_cards.values()):
+            cardsByName.setdefault(indexedName(c), []).append(c)
+        self.writeArenaChunks(cards)
+        self.writePrintingIndexes(*self.rankPrintingGroups(cards, cardsByName))
+        return True
+
+    def openBulkData(self):
+        """Lines of the bulk data file, from the seekable copy when it is up to date (frames are decompressed in parallel), see
+        BulkCache.py."""
+        bulk_data_path = self.options.bulk_data_path
+        bulk_index = loadIndex(bulk_data_path)
+        if bulk_index:
+            return contextlib.nullcontext(iterLines(bulk_data_path, bulk_index))
+        return gzip.open(bulk_data_path, "rb")
+
+    def preprocessBulkData(self) -> list[dict]:
+        all_cards = []
+        with self.openBulkData() as file:
+            objects = self.readBulkData(file)
+            ScryfallCards = (
+                o for o in objects
+                if o.get("layout") not in ["token", "double_faced_token", "art_series"]
             )
-            copied += 1
-            if handled % 1000 == 0:
-                print(f"\rPreProcessing...    {copied}/{handled} cards added...", end="", flush=True)
-        print(f"\rPreProcessing done! {copied}/{handled} cards added.")
-
-        print("Fixing AKR images...", end="", flush=True)
-        MissingAKRCards = AKRCards.copy()
-        for name in akr_candidates:
-            del MissingAKRCards[name]
-        if len(MissingAKRCards) > 0:
-            print("MissingAKRCards: ", MissingAKRCards)
-        MissingKLRCards = KLRCards.copy()
-        for name in klr_candidates:
-            del MissingKLRCards[name]
-        if len(MissingKLRCards) > 0:
-            print("MissingKLRCards: ", MissingKLRCards)
 
-        for c in all_cards:
-            if c["set"] == "akr" and c["name"] in akr_candidates and c["lang"] in akr_candidates[c["name"]]:
-                c["image_uris"]["border_crop"] = akr_candidates[c["name"]][c["lang"]]["image_uris"]["border_crop"]
-            if c["set"] == "klr" and c["name"] in klr_candidates and c["lang"] in klr_candidates[c["name"]]:
-                c["image_uris"]["border_crop"] = klr_candidates[c["name"]][c["lang"]]["image_uris"]["border_crop"]
-
-        print(" Done!\n")
-    cards = {}
-    cardsByName = {}
-    Translations = {}
-    print("Generating card data cache...")
-
-    def addCardByName(name: str, c: dict):
-        if name in cardsByName:
-            cardsByName[name].append(c)
-        else:
-            cardsByName[name] = [c]
+            akr_candidates = {}
+            klr_candidates = {}
+            print("\rPreProcessing... ", end="", flush=True)
+            copied = 0
+            handled = 0
+            for c in ScryfallCards:
+                handled += 1
+
+                if c["layout"] in ["token", "double_faced_token", "emblem", "art_series"]:
+                    # Essence of Ajani is an playtest emblem that can played as a normal card.
+                    if c["name"] not in ["Essence of Ajani"]:
+                        continue
+                # Ignore "variations" of cards: https://scryfall.com/search?q=is%3Avariation ... Except for Arabian Night: Those can appear in normal packs.
+                if "variation" in c and c["variation"] and c["set"] != "arn":
+                    continue
 
-    def addCard(c: dict):
-        if "printed_name" in c and c["printed_name"] != c["name"]:
-            addCardByName(c["printed_name"], c)
-        elif "flavor_name" in c and c["flavor_name"] != c["name"]:
-            addCardByName(c["flavor_name"], c)
-        else:
-            addCardByName(c["name"], c)
+                # Tag this card as a candidate for AKR/KLR card images (to avoid using MTGA images)
+                if c["name"] in self.akr_cards:
+                    # Prioritize version of cards from Amonkhet (AKH) or Hour of Devastation (HOU)
+                    updateImageCandidates(akr_candidates, c, ["akh", "hou"])
+                if c["name"] in self.klr_cards:
+                    # Prioritize version of cards from Kaladesh (KLD) or Aether Revolt (AER)
+                    updateImageCandidates(klr_candidates, c, ["kld", "aer"])
+
+                self.prepareRecord(c)
+
+                all_cards.append({k: c[k] for k in c if k in KeptProperties})
+                copied += 1
+                if handled % 1000 == 0:
+                    print(f"\rPreProcessing...    {copied}/{handled} cards added...", end="", flush=True)
+            print(f"\rPreProcessing done! {copied}/{handled} cards added.")
+
+            print("Fixing AKR images...", end="", flush=True)
+            MissingAKRCards = self.akr_cards.copy()
+            for name in akr_candidates:
+                del MissingAKRCards[name]
+            if len(MissingAKRCards) > 0:
+                print("MissingAKRCards: ", MissingAKRCards)
+            MissingKLRCards = self.klr_cards.copy()
+            for name in klr_candidates:
+                del MissingKLRCards[name]
+            if len(MissingKLRCards) > 0:
+                print("MissingKLRCards: ", MissingKLRCards)
+
+            for c in all_cards:
+                if c["set"] == "akr" and c["name"] in akr_candidates and c["lang"] in akr_candidates[c["name"]]:
+                    c["image_uris"]["border_crop"] = akr_candidates[c["name"]][c["lang"]]["image_uris"]["border_crop"]
+                if c["set"] == "klr" and c["name"] in klr_candidates and c["lang"] in klr_candidates[c["name"]]:
+                    c["image_uris"]["border_crop"] = klr_candidates[c["name"]][c["lang"]]["image_uris"]["border_crop"]
+
+            print(" Done!\n")
+        return all_cards
+
+    def prepareRecord(self, c: dict, joined: bool = False):
+        """Fixes up a Scryfall record kept in the card DB (reversible card names, booster workarounds, colors) and sets its
+        Arena id, if any.
+        joined: Its Arena id was already looked up and set (see ColumnarPreprocess.py)."""
+        frontName = fixName(c)
+        if not joined:
+            arena_id = self.lookupArenaID(c["name"], frontName, c["collector_number"], c["set"])
+            if arena_id is not None:
+                c["arena_id"] = arena_id
+
+        # Workaround for Teferi, Master of Time (M21) variations (exclude all except the first one from boosters)
+        if c["set"] == "m21" and c["collector_number"] in ["275", "276", "277"]:
+            c["booster"] = False
+        # Workaround for premium version of some afr cards
+        cnAsInt = 0
+        try:
+            cnAsInt = int(c["collector_number"])
+            if c["set"] == "afr" and ("★" in c["collector_number"] or cnAsInt > 281):
+                c["booster"] = False
+        except ValueError:
+            pass
 
+        if "color_indicator" in c:
+            c["colors"].sort(key=lambda val: {"W": 0, "U": 1, "B": 2, "R": 3, "G": 4}[val])
+        else:
+            c["colors"] = None
+
+    def lookupArenaID(self, name: str, front_name: str, collector_number: str, set_code: str) -> int | None:
+        mtga_set = set_code.lower()
+        for key in [
+            (name, collector_number, mtga_set),
+            (front_name, collector_number, mtga_set),
+            # Digital only versions (AA1, AA2...)
+            (name, "Digital", mtga_set),
+            (front_name, "Digital", mtga_set),
+        ]:
+            if key in self.arena_ids:
+                return self.arena_ids[key]
+        if mtga_set in MTGASetConversions:
+            mtga_set = MTGASetConversions[mtga_set]
+            for key in [(name, collector_number, mtga_set), (front_name, collector_number, mtga_set)]:
+                if key in self.arena_ids:
+                    return self.arena_ids[key]
+        return None
+
+    def cardSelection(self, c: dict) -> dict:
+        """Card DB properties of the (prepared, see prepareRecord) Scryfall record c that don't depend on its translations."""
         selection = {
             key: value
             for key, value in c.items()
@@ -588,20 +1037,11 @@ if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
             selection["mana_cost"] = "{0}"
         selection["type"], selection["subtypes"] = handleTypeLine(c["type_line"].split(" //")[0])
 
-        if c["oracle_id"] in CCRatings:
-            selection["rating"] = CCRatings[c["oracle_id"]]
+        limited_rating = cardRating(self.limited_ratings, c)
+        if limited_rating is not None:
+            selection["rating"] = limited_rating
         else:
-            match selection["rarity"]:
-                case "mythic":
-                    selection["rating"] = 1.0
-                case "rare":
-                    selection["rating"] = 0.8
-                case "uncommon":
-                    selection["rating"] = 0.7
-                case "common":
-                    selection["rating"] = 0.5
-                case _:
-                    selection["rating"] = 0.5
+            selection["rating"] = referenceRating(self.cc_ratings, c["oracle_id"], selection["rarity"])
 
         selection["in_booster"] = c["booster"] and (
             c["layout"] != "meld" or not selection["collector_number"].endswith("b")
@@ -610,11 +1050,7 @@ if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
         if not c["booster"]:
             selection["in_booster"] = False
 
-        if c["type_line"].startswith("Basic"):
-            selection["in_booster"] = False
-            selection["rating"] = 0
-
-        cmc, colors = parseCost(selection["mana_cost"])
+        cmc, colors = self.parseCost(selection["mana_cost"])
         selection["cmc"] = cmc
         selection["colors"] = colors
 
@@ -626,128 +1062,8 @@ if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
         if c["oracle_id"] in DraftEffects:
             selection["draft_effects"] = [{"type": t} for t in DraftEffects[c["oracle_id"]]]
 
-        # Workaround: Not sure why this printing is marked as in booster, but it causes a doubled entry in stx rares
-        if c["id"] == "0826e210-2002-43fe-942d-41922dfd7bc2":
-            selection["in_booster"] = False
-
-        # Workaround: Remove cards from HBG that received a rebalanced version from packs
-        if c["id"] in [
-            "057c66a8-9424-4c88-9707-5d8ef9170119",
-            "e07d5fd5-d513-46d4-8812-6e6e55a6dfda",
-            "a5cbda07-53a0-4526-9955-36f902073cf1",
-            "ea4f1d5d-7991-4a2d-b907-3522e951ad4c",
-            "884565bb-ed33-4372-8c81-487c2ee2f73c",
-        ]:
-            selection["in_booster"] = False
-
-        match c["set"]:
-            case "sta":
-                selection["in_booster"] = not selection["collector_number"].endswith("e")
-            case "akr" | "klr":
-                selection["in_booster"] = c["booster"] and not c["type_line"].startswith("Basic")
-            case "war":
-                if "promo_types" in c and "jpwalker" in c["promo_types"]:
-                    selection["in_booster"] = False
-            # Commanders from CLB commanders deck are incorrectly marked as in_booster by scryfall
-            case "clb":
-                if int(c["collector_number"]) >= 646 and int(c["collector_number"]) <= 649:
-                    selection["in_booster"] = False
-            # Manually remove special printing from Double Masters 2022 packs
-            case "2x2":
-                if int(c["collector_number"]) >= 332:
-                    selection["in_booster"] = False
-            # Make sure retro cards from DMR are marked as in_booster
-            case "dmr":
-                if int(c["collector_number"]) >= 262 and int(c["collector_number"]) <= 401:
-                    selection["in_booster"] = True
-            # Cards from SIR are not marked as in_booster for some reason
-            case "sir":
-                if not c["type_line"].startswith("Basic") and not c["collector_number"].endswith("b"):
-                    selection["in_booster"] = True
-            case "ltr":
-                # Workaround: Remove alternate printings and Jumpstart cards from LTR draft boosters (and the 20 basics)
-                selection["in_booster"] = safeInBoosterCheck(c, 261)
-                if "Ring tempts you" in c["oracle_text"] and (
-                    "all_parts" not in c
-                    or next((x for x in c["all_parts"] if x["id"] == "7215460e-8c06-47d0-94e5-d1832d0218af"), None)
-                    == None
-                ):
-                    if "related_cards" not in selection:
-                        selection["related_cards"] = []
-                    selection["related_cards"].append("7215460e-8c06-47d0-94e5-d1832d0218af")
-
-            case "cmm":
-                selection["in_booster"] = safeInBoosterCheck(c, 436)
-            case "woe":
-                selection["in_booster"] = safeInBoosterCheck(c, 261)
-            case "lci":
-                selection["in_booster"] = safeInBoosterCheck(c, 286)
-            case "ktk":
-                # Duplicates; These versions from Arena should not be in boosters
-                if c["collector_number"].endswith("y"):
-                    selection["in_booster"] = False
-            case "rvr":
-                selection["in_booster"] = safeInBoosterCheck(c, 291)
-            case "mkm":
-                selection["in_booster"] = safeInBoosterCheck(c, 271)
-            case "otj":
-                selection["in_booster"] = safeInBoosterCheck(c, 271)
-            case "otp":
-                selection["in_booster"] = safeInBoosterCheck(c, 65)
-            case "big":
-                selection["in_booster"] = safeInBoosterCheck(c, 30)
-            case "mh3":
-                selection["in_booster"] = safeInBoosterCheck(c, 261)
-            case "blb":
-                selection["in_booster"] = safeInBoosterCheck(c, 261)
-            case "dsk":
-                selection["in_booster"] = safeInBoosterCheck(c, 271)
-            case "usg" | "5ed" | "6ed" | "7ed" | "8ed":
-                if c["collector_number"].endswith("s"):
-                    selection["in_booster"] = False
-            case "mb2":
-                selection["in_booster"] = True
-            case "fdn":
-                selection["in_booster"] = safeInBoosterCheck(c, 271)
-            case "pio":
-                selection["in_booster"] = int(c["collector_number"]) < 279
-            case "inr":
-                try:
-                    if c["collector_number"].endswith("a"):
-                        selection["in_booster"] = int(c["collector_number"][:-1]) < 288
-                    else:
-                        selection["in_booster"] = int(c["collector_number"]) < 288
-                except:
-                    selection["in_booster"] = False
-            case "dft":
-                selection["in_booster"] = safeInBoosterCheck(c, 271)
-            case "tdm":
-                selection["in_booster"] = safeInBoosterCheck(c, 271)
-            case "fin":
-                selection["in_booster"] = safeInBoosterCheck(c, 293)
-                if selection["collector_number"].endswith("b"):
-                    selection["in_booster"] = False
-            case "eoe":
-                selection["in_booster"] = safeInBoosterCheck(c, 261)
-            case "spm":
-                selection["in_booster"] = safeInBoosterCheck(c, 188)
-            case "om1":
-                selection["in_booster"] = True
-            case "tla":
-                selection["in_booster"] = safeInBoosterCheck(c, 281)
-            case "ecl":
-                selection["in_booster"] = safeInBoosterCheck(c, 268)
-            case "tmt":
-                selection["in_booster"] = safeInBoosterCheck(c, 190)
-            case "sos":
-                selection["in_booster"] = safeInBoosterCheck(c, 266)
-            case "msh":
-                selection["in_booster"] = safeInBoosterCheck(c, 276)
-            case "hob":
-                selection["in_booster"] = safeInBoosterCheck(c, 188)
-
-        if c["collector_number"].endswith("†"):
-            selection["in_booster"] = False
+        # Per-set and card specific in-booster/rating overrides, see data/BoosterRules.json
+        self.booster_rules.apply(c, selection)
 
         if c["layout"] == "split":
             if "Aftermath" in c["keywords"]:
@@ -759,123 +1075,109 @@ if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
         elif c["layout"] == "flip":
             selection["layout"] = "flip"
 
-        cards[c["id"]].update(selection)
-
-    for c in all_cards:
-        # Some dual faced Secret Lair cards have some key information hidden in the card_faces array. Extract it.
-        def copyFromFaces(prop: str) -> bool:
-            if prop not in c:
-                if (
-                    "card_faces" in c
-                    and len(c["card_faces"]) > 1
-                    and prop in c["card_faces"][0]
-                    and prop in c["card_faces"][1]
-                    and c["card_faces"][0][prop] == c["card_faces"][1][prop]
-                ):
-                    c[prop] = c["card_faces"][0][prop]
-                elif (
-                    # Very special case for TDM reversible cards with adventures (e.g. Bloomvine Regent)
-                    c["layout"] == "reversible_card"
-                    and "card_faces" in c
-                    and prop in c["card_faces"][0]
-                ):
-                    c[prop] = c["card_faces"][0][prop]
-                else:
-                    print(f"Warning: Missing '{prop}' for card '{c['name']}'.")
-                    return False
-            return True
+        return selection
 
-        if copyFromFaces("type_line") == False:
-            continue
+    def generateCards(self, all_cards: list[dict]) -> tuple[dict, dict]:
+        """Merges the printings of each card in all languages. Returns the cards by id and by name."""
+        cards = {}
+        cardsByName = {}
+        Translations = {}
+        NonProcessedCards = self.non_processed_cards
+        print("Generating card data cache...")
 
-        if c["id"] not in cards:
-            if copyFromFaces("oracle_id") == False:
-                continue
-            cards[c["id"]] = {"id": c["id"], "oracle_id": c["oracle_id"]}
+        def addCardByName(name: str, c: dict):
+            if name in cardsByName:
+                cardsByName[name].append(c)
+            else:
+                cardsByName[name] = [c]
 
-        key = (c["name"], c["set"], c["collector_number"])
-        if key not in Translations:
-            NonProcessedCards[key] = c
-            Translations[key] = {"printed_names": {}, "image_uris": {}}
+        def addCard(c: dict):
+            addCardByName(indexedName(c), c)
+            cards[c["id"]].update(self.cardSelection(c))
 
-        if "printed_name" in c:
-            Translations[key]["printed_names"][c["lang"]] = c["printed_name"]
-        elif "card_faces" in c and "printed_name" in c["card_faces"][0]:
-            Translations[key]["printed_names"][c["lang"]] = c["card_faces"][0]["printed_name"]
+        for c in all_cards:
+            if copyFromFaces(c, "type_line") == False:
+                continue
 
-        if "image_uris" in c and "border_crop" in c["image_uris"]:
-            Translations[key]["image_uris"][c["lang"]] = c["image_uris"]["border_crop"]
-        elif (
-            "card_faces" in c
-            and "image_uris" in c["card_faces"][0]
-            and "border_crop" in c["card_faces"][0]["image_uris"]
-        ):
-            Translations[key]["image_uris"][c["lang"]] = c["card_faces"][0]["image_uris"]["border_crop"]
+            if c["id"] not in cards:
+                if copyFromFaces(c, "oracle_id") == False:
+                    continue
+                cards[c["id"]] = {"id": c["id"], "oracle_id": c["oracle_id"]}
 
-        # Handle back side of double sided cards
-        if c["layout"] == "transform" or c["layout"] == "modal_dfc" or c["layout"] == "reversible_card":
-            if "card_faces" not in c:
-                print(f"/!\\ {c['name']}: Missing card faces with layout {c['layout']}.")
-            else:
-                if "back" not in Translations[key]:
-                    Translations[key]["back"] = {
-                        "name": c["card_faces"][1]["name"],
-                        "printed_names": {},
-                        "image_uris": {},
-                    }
-                    if "type_line" not in c["card_faces"][1]:
-                        print(f"/!\\ {c['name']}: Missing back side type line.")
-                    else:
-                        Translations[key]["back"]["type"], Translations[key]["back"]["subtypes"] = handleTypeLine(
-                            c["card_faces"][1]["type_line"]
-                        )
-                Translations[key]["back"]["printed_names"][c["lang"]] = (
-                    c["card_faces"][1]["printed_name"]
-                    if "printed_name" in c["card_faces"][1]
-                    else c["card_faces"][1]["name"]
-                )
-                if "image_uris" not in c["card_faces"][1]:  # Temp workaround while STX data is still incomplete
-                    print(f"/!\\ {c['name']}: Missing back side image.")
+            key = (c["name"], c["set"], c["collector_number"])
+            if key not in Translations:
+                NonProcessedCards[key] = c
+                Translations[key] = {"printed_names": {}, "image_uris": {}}
+
+            if "printed_name" in c:
+                Translations[key]["printed_names"][c["lang"]] = c["printed_name"]
+            elif "card_faces" in c and "printed_name" in c["card_faces"][0]:
+                Translations[key]["printed_names"][c["lang"]] = c["card_faces"][0]["printed_name"]
+
+            if "image_uris" in c and "border_crop" in c["image_uris"]:
+                Translations[key]["image_uris"][c["lang"]] = c["image_uris"]["border_crop"]
+            elif (
+                "card_faces" in c
+                and "image_uris" in c["card_faces"][0]
+                and "border_crop" in c["card_faces"][0]["image_uris"]
+            ):
+                Translations[key]["image_uris"][c["lang"]] = c["card_faces"][0]["image_uris"]["border_crop"]
+
+            # Handle back side of double sided cards
+            if c["layout"] == "transform" or c["layout"] == "modal_dfc" or c["layout"] == "reversible_card":
+                if "card_faces" not in c:
+                    print(f"/!\\ {c['name']}: Missing card faces with layout {c['layout']}.")
                 else:
-                    Translations[key]["back"]["image_uris"][c["lang"]] = c["card_faces"][1]["image_uris"]["border_crop"]
-
-        if c["lang"] == "en":
-            if key in NonProcessedCards:
-                del NonProcessedCards[key]
+                    if "back" not in Translations[key]:
+                        Translations[key]["back"] = {
+                            "name": c["card_faces"][1]["name"],
+                            "printed_names": {},
+                            "image_uris": {},
+                        }
+                        if "type_line" not in c["card_faces"][1]:
+                            print(f"/!\\ {c['name']}: Missing back side type line.")
+                        else:
+                            Translations[key]["back"]["type"], Translations[key]["back"]["subtypes"] = handleTypeLine(
+                                c["card_faces"][1]["type_line"]
+                            )
+                    Translations[key]["back"]["printed_names"][c["lang"]] = (
+                        c["card_faces"][1]["printed_name"]
+                        if "printed_name" in c["card_faces"][1]
+                        else c["card_faces"][1]["name"]
+                    )
+                    if "image_uris" not in c["card_faces"][1]:  # Temp workaround while STX data is still incomplete
+                        print(f"/!\\ {c['name']}: Missing back side image.")
+                    else:
+                        Translations[key]["back"]["image_uris"][c["lang"]] = c["card_faces"][1]["image_uris"]["border_crop"]
+
+            if c["lang"] == "en":
+                if key in NonProcessedCards:
+                    del NonProcessedCards[key]
+                addCard(c)
+
+        # Handle cards with no English translation
+        print(f"{len(NonProcessedCards)} cards with no English translation.")
+        for key, c in NonProcessedCards.items():
+            print(f" -> Non-english card: {c['name']} ({c['set']}), {c['lang']} {c['booster']}")
+            # c['image_uris'][c['lang']] = Translations[key]['image_uris'][c['lang']]
+            # c['image_uris']['en'] = Translations[key]['image_uris'][c['lang']]
+            Translations[key]["image_uris"]["en"] = Translations[key]["image_uris"][c["lang"]]
             addCard(c)
 
-    # Handle cards with no English translation
-    print(f"{len(NonProcessedCards)} cards with no English translation.")
-    for key, c in NonProcessedCards.items():
-        print(f" -> Non-english card: {c['name']} ({c['set']}), {c['lang']} {c['booster']}")
-        # c['image_uris'][c['lang']] = Translations[key]['image_uris'][c['lang']]
-        # c['image_uris']['en'] = Translations[key]['image_uris'][c['lang']]
-        Translations[key]["image_uris"]["en"] = Translations[key]["image_uris"][c["lang"]]
-        addCard(c)
-
-    MTGACards = {}
-    MTGACardsAlternates = {}
-    for cid in list(cards):
-        c = cards[cid]
-        if "name" in c:
-            key = (c["name"], c["set"], c["collector_number"])
-            if key in Translations:
-                c.update(Translations[key])
-        else:
-            del cards[cid]
-        if "arena_id" in c:
-            MTGACards[c["arena_id"]] = c
-            if c["name"] not in MTGACardsAlternates:
-                MTGACardsAlternates[c["name"]] = []
-            MTGACardsAlternates[c["name"]].append(c["arena_id"])
-
-    with open("client/src/data/MTGACards.json", "w", encoding="utf8") as outfile:
-        json.dump(MTGACards, outfile, ensure_ascii=False, indent=4)
-    with open("client/src/data/MTGAAlternates.json", "w", encoding="utf8") as outfile:
-        json.dump(MTGACardsAlternates, outfile, ensure_ascii=False, indent=4)
-
-    # Select the "best" (most recent, non special) printing of each card
-    def selectCard(a, b):
+        for cid in list(cards):
+            c = cards[cid]
+            if "name" in c:
+                key = (c["name"], c["set"], c["collector_number"])
+                if key in Translations:
+                    c.update(Translations[key])
+            else:
+                del cards[cid]
+        return cards, cardsByName
+
+    def selectCard(self, a: dict, b: dict) -> dict:
+        """The "best" (most recent, non special) of the printings a and b."""
+        NonProcessedCards = self.non_processed_cards
+        PrimarySets = self.primary_sets
         # Avoid non-english cards
         if (a["name"], a["set"], a["collector_number"]) in NonProcessedCards and (
             b["name"],
@@ -900,17 +1202,17 @@ if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
         if a["set"] != "vma" and b["set"] == "vma":
             return a
         # Only one of them is marked as a Primary card in Arena
-        if (a["name"], a["collector_number"], a["set"].lower()) in CardsCollectorNumberAndSet and (
+        if (a["name"], a["collector_number"], a["set"].lower()) in self.arena_ids and (
             b["name"],
             b["collector_number"],
             b["set"].lower(),
-        ) not in CardsCollectorNumberAndSet:
+        ) not in self.arena_ids:
             return a
-        if (a["name"], a["collector_number"], a["set"].lower()) not in CardsCollectorNumberAndSet and (
+        if (a["name"], a["collector_number"], a["set"].lower()) not in self.arena_ids and (
             b["name"],
             b["collector_number"],
             b["set"].lower(),
-        ) in CardsCollectorNumberAndSet:
+        ) in self.arena_ids:
             return b
         # Prefer a card with an Arena ID
         if "arena_id" in a and "arena_id" not in b:
@@ -952,7 +1254,7 @@ if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
             a
             if a["released_at"] > b["released_at"]
             or (
-                a["released_at"] == a["released_at"]
+                a["released_at"] == b["released_at"]
                 and (
                     a["collector_number"] < b["collector_number"]
                     if not (a["collector_number"].isdigit() and b["collector_number"].isdigit())
@@ -962,316 +1264,504 @@ if not os.path.isfile(FirstFinalDataPath) or ForceCache or FetchSet:
             else b
         )
 
-    cardsByNameLower = {}
-    for name in cardsByName:
-        cardsByNameLower[name.lower()] = functools.reduce(selectCard, cardsByName[name])["id"]
-    # Handle both references to the full names for just the front face
-    for name in list(cardsByNameLower):
-        if " // " in name and name.split(" //")[0] not in cardsByNameLower:
-            cardsByNameLower[name.split(" //")[0]] = cardsByNameLower[name]
-
-    cards_items = list(cards.items())
-    print(f"Split DB, starting with {len(cards)} cards")
-    total = 0
-    for i in range(4):
-        part = dict(cards_items[i * len(cards) // 4 : (i + 1) * len(cards) // 4])
-        print(f"  Adding {len(part)} cards to MTGCards.{i}.json")
-        total += len(part)
-        with open(f"data/MTGCards.{i}.json", "w", encoding="utf8") as outfile:
-            json.dump(part, outfile, ensure_ascii=False, indent=4)
-    if total != len(cards):
-        print("Error: Some cards were not written to the split DB")
-
-    with open("data/CardsByName.json", "w", encoding="utf8") as outfile:
-        json.dump(cardsByNameLower, outfile, ensure_ascii=False, indent=4)
-
-cards = {}
-DBFiles = glob.glob("data/MTGCards.*.json")
-for f in DBFiles:
-    with open(f, "r", encoding="utf8") as file:
-        cards.update(json.loads(file.read()))
-
-# Retrieve basic land ids for each set
-BasicLandIDs = {}
-for cid in cards:
-    if (
-        cards[cid]["type"].startswith("Basic")
-        and (cards[cid]["name"], cards[cid]["set"], cards[cid]["collector_number"]) not in NonProcessedCards
-    ):
-        if cards[cid]["set"] not in BasicLandIDs:
-            BasicLandIDs[cards[cid]["set"]] = []
-        BasicLandIDs[cards[cid]["set"]].append(cid)
-    for mtgset in BasicLandIDs:
-        BasicLandIDs[mtgset].sort()
-with open(BasicLandIDsPath, "w+", encoding="utf8") as basiclandidsfile:
-    json.dump(BasicLandIDs, basiclandidsfile, ensure_ascii=False, indent=4)
+    def rankPrintings(self, printings: list[dict], cards: dict) -> list[str]:
+        """Ids of printings (of the card DB), most preferred first. The first one is the one selectCard would pick by reducing
+        the list."""
+        best = functools.reduce(self.selectCard, printings)
+        others = sorted(
+            (p for p in printings if p is not best),
+            key=functools.cmp_to_key(lambda a, b: -1 if self.selectCard(a, b) is a else 1),
+        )
+        return list(dict.fromkeys(p["id"] for p in [best] + others if p["id"] in cards))
+
+    def rankPrintingGroups(self, cards: dict, cardsByName: dict) -> tuple[dict, dict]:
+        """Ranked printings (see rankPrintings) of each name of cardsByName (see generateCards), and of each oracle id."""
+        byName = {name: self.rankPrintings(printings, cards) for name, printings in cardsByName.items()}
+        printingsByOracle = {}
+        for printings in cardsByName.values():
+            for p in printings:
+                printingsByOracle.setdefault(p["oracle_id"], []).append(p)
+        byOracle = {oracle_id: self.rankPrintings(printings, cards) for oracle_id, printings in printingsByOracle.items()}
+        return byName, byOracle
+
+    def writePrintingIndexes(self, byName: dict, byOracle: dict):
+        """Writes the printing indexes and CardsByName.json from the ranked printings (see rankPrintingGroups)."""
+        printingsByName = {}
+        for name, ranked in byName.items():
+            if len(ranked) > 0:
+                printingsByName[name.lower()] = ranked
+        # Handle both references to the full names for just the front face
+        for name in list(printingsByName):
+            if " // " in name and name.split(" //")[0] not in printingsByName:
+                printingsByName[name.split(" //")[0]] = printingsByName[name]
+        cardsByNameLower = {name: printings[0] for name, printings in printingsByName.items()}
+
+        with open(self.staging.path("data/CardsByName.json"), "w", encoding="utf8") as outfile:
+            json.dump(cardsByNameLower, outfile, ensure_ascii=False, indent=4)
+        with open(self.staging.path(PrintingsByNamePath), "w", encoding="utf8") as outfile:
+            json.dump(printingsByName, outfile, ensure_ascii=False, separators=(",", ":"))
+        with open(self.staging.path(PrintingsByOraclePath), "w", encoding="utf8") as outfile:
+            json.dump(byOracle, outfile, separators=(",", ":"))
+        print(f"Printing indexes: {len(printingsByName)} names, {len(byOracle)} oracle ids.")
+
+    ###########################################################################
+    # Stages operating on the card DB in memory
+
+    def runSessionStages(self):
+        options = self.options
+        Session = self.session
+
+        # Refresh ratings in the existing DB files without rebuilding the whole cache
+        if options.force_ratings and not self.cache_rebuilt:
+            for f, updated in Session.patchRatings(self.limited_ratings, self.cc_ratings).items():
+                print(f"  {f}: {updated} ratings updated.")
+
+        if options.force_features or ((self.db_updated or options.force_ratings) and os.path.isdir(CardFeaturesFolder)):
+            try:
+                print(f"Exported {Session.exportFeatures(CardFeaturesFolder)} card feature rows to {CardFeaturesFolder}.")
+            except ImportError:
+                print(colored("numpy is required to export card features.", "red"))
+
+        # Optional dictionary encoded copy of the DB with templated image URIs (see CardDBEncoding.py and ImageURIs.py), same
+        # split as the regular DB files.
+        if options.encoded:
+            for f, report in Session.writeEncoded(EncodedDBFolder).items():
+                print(f"Encoded {f}:")
+                printEncodingReport(report)
+
+        # Optional oracle/printing normalized copy of the DB (see CardDBNormalization.py)
+        if options.normalized:
+            oracle_count, plain_size, normalized_size = Session.writeNormalized(NormalizedDBFolder)
+            print(
+                f"Normalized DB: {len(self.cards)} printings of {oracle_count} cards written to {NormalizedDBFolder}, "
+                f"{plain_size} -> {normalized_size} bytes ({100 * (1 - normalized_size / plain_size):.1f}% saved, unindented sizes)."
+            )
 
-###############################################################################
-# Generate Jumpstart pack data
-
-if not os.path.isfile(JumpstartBoostersDist) or ForceJumpstart:
-    print("Extracting Jumpstart Boosters...")
-    jumpstartBoosters = []
-
-    regex = re.compile(r"(\d+) (.*)")
-    swaps = {}
-    with open(JumpstartSwaps, "r", encoding="utf8") as file:
-        swaps = json.loads(file.read())
-    for path in glob.glob("{}/*.txt".format(JumpstartBoostersFolder)):
-        with open(path, "r", encoding="utf8") as file:
-            lines = file.readlines()
-            booster = {"name": lines[0].strip(), "cards": []}
-            for line in lines[1:]:
-                m = regex.match(line.strip())
-                if m:
-                    count = int(m.group(1))
-                    name = m.group(2)
-                    if name in swaps:
-                        name = swaps[name]
-                    if name in CardNameToArenaIDForJumpstart:
-                        cid = None
-                        for c in cards:
-                            if "arena_id" in cards[c] and cards[c]["arena_id"] == CardNameToArenaIDForJumpstart[name]:
-                                cid = cards[c]["id"]
-                                break
-                        # Some cards are labeled as JMP in Arena but not on Scryfall (Swaped cards). We can search for an alternative version.
-                        if cid == None:
-                            print("{} ({}) not found in cards...".format(name, cid))
-                            candidates = [
-                                key for key, val in cards.items() if val["name"] == name and val["set"] != "jmp"
-                            ]
-                            if len(candidates) == 0:
-                                print(f" > Cannot find a good candidate ID for {name} !!")
-                            else:
-                                cid = max(candidates)
-                                print(f"> Using {cid}")
-                        booster["cards"] += [cid] * count
+        # Optional English-only core shards and per-language translation packs (see TranslationPacks.py)
+        if options.translation_packs:
+            print(f"Writing translation packs to {TranslationPacksFolder}...")
+            for lang, pack in Session.writeTranslationPacks(TranslationPacksFolder).items():
+                if pack is None:
+                    print(f"  {lang}: Removed")
+                    continue
+                size, count, rewritten = pack
+                print(f"  {lang}: {size / 1024 / 1024:7.2f} MB, {count} cards{'' if rewritten else ' (unchanged)'}")
+
+        if self.db_updated or not os.path.isfile(CardNameIndexPath):
+            print("Building card name index...")
+            name_index = Session.writeNameIndex(CardNameIndexPath)
+            print(f"  {len(name_index['names'])} names, {len(name_index['trigrams'])} trigrams.")
+
+    ###########################################################################
+    # Downstream stages
+
+    def runDownstreamStages(self) -> dict[str, StageResult]:
+        # Loaded before forking, so the stages share them
+        self.session.name_index
+        self.cards_by_name_index = self.session.cards_by_name
+        # Mirrors CardVersionsByName in src/Cards.ts
+        self.card_versions_by_name = {}
+        for cid, c in self.cards.items():
+            self.card_versions_by_name.setdefault(c["name"].split(" //")[0].lower(), []).append(cid)
+            if "printed_names" in c and "en" in c["printed_names"] and c["printed_names"]["en"] != c["name"]:
+                self.card_versions_by_name.setdefault(c["printed_names"]["en"].lower(), []).append(cid)
+
+        DownstreamStages = [
+            Stage("thelist", self.theListStage),
+            Stage("cubes", self.cubesStage),
+            Stage("counts", self.countCardsStage),
+            Stage("setinfos", self.setInfosStage, "thread", after=("counts",)),
+            Stage("constants", self.constantsStage, "thread", after=("setinfos",)),
+        ]
+        if not os.path.isfile(JumpstartBoostersDist) or self.options.force_jumpstart:
+            DownstreamStages.insert(0, Stage("jumpstart", self.jumpstartStage))
+        return runStages(DownstreamStages)
+
+    def jumpstartStage(self) -> StageResult:
+        cards = self.cards
+        result = StageResult()
+        result.log("Extracting Jumpstart Boosters...")
+        jumpstartBoosters = []
+        cardIDsByArenaID = {}
+        for cid, c in cards.items():
+            if "arena_id" in c:
+                cardIDsByArenaID.setdefault(c["arena_id"], cid)
+
+        regex = re.compile(r"(\d+) (.*)")
+        swaps = {}
+        with open(JumpstartSwaps, "r", encoding="utf8") as file:
+            swaps = json.loads(file.read())
+        for path in sorted(glob.glob("{}/*.txt".format(JumpstartBoostersFolder))):
+            with open(path, "r", encoding="utf8") as file:
+                lines = file.readlines()
+                booster = {"name": lines[0].strip(), "cards": []}
+                for line in lines[1:]:
+                    m = regex.match(line.strip())
+                    if m:
+                        count = int(m.group(1))
+                        name = m.group(2)
+                        if name in swaps:
+                            name = swaps[name]
+                        if name in self.jumpstart_arena_ids:
+                            cid = cardIDsByArenaID.get(self.jumpstart_arena_ids[name])
+                            # Some cards are labeled as JMP in Arena but not on Scryfall (Swaped cards). We can search for an alternative version.
+                            if cid == None:
+                                result.log("{} ({}) not found in cards...".format(name, cid))
+                                candidates = [
+                                    key for key, val in cards.items() if val["name"] == name and val["set"] != "jmp"
+                                ]
+                                if len(candidates) == 0:
+                                    result.log(f" > Cannot find a good candidate ID for {name} !!")
+                                else:
+                                    cid = max(candidates)
+                                    result.log(f"> Using {cid}")
+                            booster["cards"] += [cid] * count
+                        else:
+                            result.log("Jumpstart Boosters: Card '{}' not found.".format(name))
+                jumpstartBoosters.append(booster)
+        result.log("Jumpstart Boosters: ", len(jumpstartBoosters))
+        result.output(JumpstartBoostersDist, jumpstartBoosters, ensure_ascii=False)
+        result.log("Jumpstart boosters dumped to disk.")
+        return result
+
+    # Convert The List card names files to their corresponding IDs. Prefer plst version if available.
+    def theListStage(self) -> StageResult:
+        result = StageResult()
+        cardsByName = {}
+        for c in self.cards.values():
+            cardsByName.setdefault(c["name"], []).append(c)
+        for the_list_file in sorted(glob.glob("src/data/TheList/*.txt")):
+            the_list_cards = {}
+            with open(the_list_file, "r", encoding="utf8") as file:
+                result.log("Processing: ", the_list_file)
+                for line in file:
+                    name = line.strip().split("(")[0].strip()
+                    cset = line.strip().split("(")[1].split(")")[0].strip().lower()
+
+                    # Search for the plst version
+                    candidates = [v for v in cardsByName.get(name, []) if v["set"] == "plist" or v["set"] == "plst"]
+                    if len(candidates) > 0:
+                        c = candidates[0]
+                        # Multiple possibiliies, search for the best match
+                        if len(candidates) > 1:
+                            for card in candidates:
+                                # Scryfall includes the code of the original set into the collector number
+                                if cset in card["collector_number"].lower():
+                                    c = card
+                                    break
                     else:
-                        print("Jumpstart Boosters: Card '{}' not found.".format(name))
-            jumpstartBoosters.append(booster)
-    print("Jumpstart Boosters: ", len(jumpstartBoosters))
-    with open(JumpstartBoostersDist, "w", encoding="utf8") as outfile:
-        json.dump(jumpstartBoosters, outfile, ensure_ascii=False)
-    print("Jumpstart boosters dumped to disk.")
-
-###############################################################################
-
-
-def overrideViewbox(svgPath, expectedViewbox, correctedViewbox):
-    with open(svgPath, "r") as inputFile:
-        inputFile.seek(0)
-        content = inputFile.read()
-        if 'viewBox="%s"' % expectedViewbox not in content:
-            print("svg did not have expected viewbox: %s" % svgPath)
-            return
-        content = content.replace('viewBox="%s"' % expectedViewbox, 'viewBox="%s"' % correctedViewbox)
-    with open(svgPath, "w") as outputFile:
-        outputFile.write(content)
-
-
-array = []
-for key, value in cards.items():
-    array.append(value)
-
-print("Cards in database: ", len(array))
-array.sort(key=lambda c: c["set"])
-groups = groupby(array, lambda c: c["set"])
-setinfos = {}
-
-# Convert The List card names files to their corresponding IDs. Prefer plst version if available.
-# This is extremely ineficient, I don't care right now.
-for the_list_file in glob.glob("src/data/TheList/*.txt"):
-    the_list_cards = {}
-    with open(the_list_file, "r", encoding="utf8") as file:
-        print("Processing: ", the_list_file)
-        for line in file:
-            name = line.strip().split("(")[0].strip()
-            cset = line.strip().split("(")[1].split(")")[0].strip().lower()
-
-            # Search for the plst version
-            candidates = [
-                v for k, v in cards.items() if v["name"] == name and (v["set"] == "plist" or v["set"] == "plst")
-            ]
-            if len(candidates) > 0:
-                c = candidates[0]
-                # Multiple possibiliies, search for the best match
-                if len(candidates) > 1:
-                    for card in candidates:
-                        # Scryfall includes the code of the original set into the collector number
-                        if cset in card["collector_number"].lower():
-                            c = card
-                            break
-            else:
-                # Revert to the original if not available
-                c = next(v for k, v in cards.items() if v["name"] == name and v["set"] == cset)
-            if c["rarity"] not in the_list_cards:
-                the_list_cards[c["rarity"]] = []
-            the_list_cards[c["rarity"]].append(c["id"])
-    json.dump(the_list_cards, open(the_list_file.replace(".txt", ".json"), "w", encoding="utf8"), indent=2)
-
-
-def getIcon(mtgset, icon_path):
-    if not os.path.isfile(
-        "client/public/" + icon_path
-    ):  # or filecmp.cmp("client/public/" + icon_path, "client/public/img/sets/default.svg", shallow=False):
-        try:
-            response = requests.get("https://api.scryfall.com/sets/{}".format(mtgset))
-            scryfall_set_data = json.loads(response.content)
-            if scryfall_set_data and "icon_svg_uri" in scryfall_set_data:
-                urllib.request.urlretrieve(scryfall_set_data["icon_svg_uri"], "client/public/" + icon_path)
-                if set == "rna":
-                    overrideViewbox(icon_path, "0 0 32 32", "0 6 32 20")
-                return icon_path
-        except:
-            print("Error getting set '{}' icon:".format(mtgset), sys.exc_info()[0])
-    else:
-        return icon_path
-    return None
-
-
-nth = 1
-set_per_line = m1.floor(os.get_terminal_size().columns / 14)
-subsets = []  # List of sub-sets associated to a larger, standard set.
-for mtgset, group in groups:
-    cardList = list(group)
-    candidates = [x for x in SetsInfos if x["code"] == mtgset]
-    if len(candidates) == 0:
-        print("\nWarning: Set '{}' not found in SetsInfos.\n".format(mtgset))
-        continue
-    setdata = candidates[0]
-    if "parent_set_code" in setdata and mtgset != "ydmu" and mtgset != "om1":
-        subsets.append(mtgset)
-    setinfos[mtgset] = {
-        "code": mtgset,
-        "fullName": setdata["name"],
-        "cardCount": len(cardList),
-        "isPrimary": mtgset in PrimarySets,
-    }
-    if "block" in setdata:
-        setinfos[mtgset]["block"] = setdata["block"]
-    # con is a reserved keyword on windows
-    icon_path = "img/sets/{}.svg".format(mtgset if mtgset != "con" else "conf")
-    if getIcon(mtgset, icon_path) != None:
-        setinfos[mtgset]["icon"] = icon_path
-    print(" | {:6s} {:4d}".format(mtgset, len(cardList)), end=(" |\n" if nth % set_per_line == 0 else ""))
-    nth += 1
-    cardList.sort(key=lambda c: c["rarity"])
-    for rarity, rarityGroup in groupby(cardList, lambda c: c["rarity"]):
-        rarityGroupList = list(rarityGroup)
-        setinfos[mtgset][rarity + "Count"] = len(rarityGroupList)
-
-setinfos["planeshifted_snc"] = {}
-setinfos["planeshifted_snc"].update(setinfos["snc"])
-setinfos["planeshifted_snc"].update(
-    {
-        "code": "planeshifted_snc",
-        "fullName": "Planeshifted New Capenna",
-        "isPrimary": True,
-    }
-)
-
-setinfos["mb1"] = {
-    "code": "mb1",
-    "fullName": "Mystery Booster",
-    "icon": "img/sets/mb1.svg",
-    "isPrimary": True,
-}
-PrimarySets.append("mb1")
-setinfos["mb1_convention_2019"] = {
-    "code": "mb1_convention_2019",
-    "fullName": "Mystery Booster Convention 2019",
-    "icon": "img/sets/mb1.svg",
-    "isPrimary": True,
-}
-PrimarySets.append("mb1_convention_2019")
-setinfos["mb1_convention_2021"] = {
-    "code": "mb1_convention_2021",
-    "fullName": "Mystery Booster Convention 2021",
-    "icon": "img/sets/mb1.svg",
-    "isPrimary": True,
-}
-PrimarySets.append("mb1_convention_2021")
-PrimarySets.append("mb2")
-
-# Add Portal sets as draftable (They're not meant to be drafted, but some users want to try anyway!)
-PrimarySets.append("por")
-PrimarySets.append("p02")
-PrimarySets.append("ptk")
-
-# Create fake primary sets for each version of the Shadows over Innistrad Remastered bonus sheet, so users can choose rather than rely on the auto rotation.
-with open("src/data/shadow_of_the_past.json", "r") as bonusSheetsFile:
-    bonusSheets = json.loads(bonusSheetsFile.read())
-    bonusSheetsIndex = 0
-    for bonusSheet in bonusSheets:
-        code = f"sir{bonusSheetsIndex}"
-        PrimarySets.append(code)
-        setinfos[code] = {}
-        setinfos[code].update(setinfos["sir"])
-        setinfos[code].update(
+                        # Revert to the original if not available
+                        c = next(v for v in cardsByName.get(name, []) if v["set"] == cset)
+                    if c["rarity"] not in the_list_cards:
+                        the_list_cards[c["rarity"]] = []
+                    the_list_cards[c["rarity"]].append(c["id"])
+            result.output(the_list_file.replace(".txt", ".json"), the_list_cards, indent=2)
+        return result
+
+    # Set infos, downloading missing set icons (in threads). Value: (setinfos, subsets)
+    def countCardsStage(self) -> StageResult:
+        # Single pass over all cards: Basic land ids, card count per set and per rarity
+        result = StageResult()
+        BasicLandIDs = {}
+        set_card_counts = {}
+        set_rarity_counts = {}
+        for cid, c in self.cards.items():
+            mtgset = c["set"]
+            set_card_counts[mtgset] = set_card_counts.get(mtgset, 0) + 1
+            rarity_counts = set_rarity_counts.setdefault(mtgset, {})
+            rarity_counts[c["rarity"]] = rarity_counts.get(c["rarity"], 0) + 1
+            if c["type"].startswith("Basic") and (c["name"], mtgset, c["collector_number"]) not in self.non_processed_cards:
+                BasicLandIDs.setdefault(mtgset, []).append(cid)
+        for mtgset in BasicLandIDs:
+            BasicLandIDs[mtgset].sort()
+        result.output(BasicLandIDsPath, BasicLandIDs, ensure_ascii=False, indent=4)
+        result.value = (set_card_counts, set_rarity_counts)
+        return result
+
+    def setInfosStage(self, counts: tuple[dict, dict]) -> StageResult:
+        SetCardCounts, SetRarityCounts = counts
+        SetsInfosByCode = {}
+        for set_data in self.sets_infos:
+            SetsInfosByCode.setdefault(set_data["code"], set_data)
+
+        result = StageResult()
+        setinfos = {}
+        nth = 1
+        set_per_line = m1.floor(shutil.get_terminal_size().columns / 14)
+        subsets = []  # List of sub-sets associated to a larger, standard set.
+        known_sets = [mtgset for mtgset in sorted(SetCardCounts) if mtgset in SetsInfosByCode]
+        # con is a reserved keyword on windows
+        icon_paths = {mtgset: "img/sets/{}.svg".format(mtgset if mtgset != "con" else "conf") for mtgset in known_sets}
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            icons = dict(zip(known_sets, executor.map(lambda mtgset: getIcon(mtgset, icon_paths[mtgset]), known_sets)))
+        for mtgset in sorted(SetCardCounts):
+            if mtgset not in SetsInfosByCode:
+                result.log("\nWarning: Set '{}' not found in SetsInfos.\n".format(mtgset))
+                continue
+            setdata = SetsInfosByCode[mtgset]
+            if "parent_set_code" in setdata and mtgset != "ydmu" and mtgset != "om1":
+                subsets.append(mtgset)
+            setinfos[mtgset] = {
+                "code": mtgset,
+                "fullName": setdata["name"],
+                "cardCount": SetCardCounts[mtgset],
+                "isPrimary": mtgset in self.primary_sets,
+            }
+            if "block" in setdata:
+                setinfos[mtgset]["block"] = setdata["block"]
+            if icons[mtgset] != None:
+                setinfos[mtgset]["icon"] = icon_paths[mtgset]
+            result.log(" | {:6s} {:4d}".format(mtgset, SetCardCounts[mtgset]), end=(" |\n" if nth % set_per_line == 0 else ""))
+            nth += 1
+            for rarity, count in sorted(SetRarityCounts[mtgset].items()):
+                setinfos[mtgset][rarity + "Count"] = count
+        result.value = (setinfos, subsets)
+        return result
+
+    def getCardVersionsByName(self, name: str) -> list[str]:
+        lowered = name.lower()
+        if lowered in self.card_versions_by_name:
+            return self.card_versions_by_name[lowered]
+        return self.card_versions_by_name.get(lowered.split(" //")[0], [])
+
+    def isAmbiguousName(self, name: str) -> bool:
+        return len({self.cards[cid]["oracle_id"] for cid in self.getCardVersionsByName(name)}) > 1
+
+    def compileCubeLine(self, line: str) -> str | None:
+        cards = self.cards
+        CardsByNameIndex = self.cards_by_name_index
+        m = ArenaLineRegex.match(line)
+        if not m:
+            return None
+        name, cset, number = m.group("name"), m.group("set"), m.group("number")
+        if cset:
+            cset = cset.lower()
+            cset = {"dar": "dom", "conf": "con"}.get(cset, cset)
+        # Same logic as matchCardVersion in src/parseCardList.ts
+        if not cset and not number and name.lower() in CardsByNameIndex:
+            return CardsByNameIndex[name.lower()]
+        candidates = [
+            cid
+            for cid in self.getCardVersionsByName(name)
+            if (not cset or cards[cid]["set"] == cset) and (not number or cards[cid]["collector_number"] == number)
+        ]
+        if len(candidates) > 0:
+            numbered = [cid for cid in candidates if cards[cid]["collector_number"].isdigit()]
+            if len(numbered) == 0:
+                return candidates[0]
+            return min(numbered, key=lambda cid: int(cards[cid]["collector_number"]))
+        # Names containing parentheses may have been mistaken for a set
+        if "(" in line:
+            m = SimpleLineRegex.match(line)
+            if m and m.group("name").lower() in CardsByNameIndex:
+                return CardsByNameIndex[m.group("name").lower()]
+        return None
+
+    # Value: Errors
+    def cubesStage(self) -> StageResult:
+        result = StageResult()
+        errors = []
+        for path in sorted(glob.glob(f"{CubesFolder}/*.txt")):
+            with open(path, "rb") as file:
+                raw = file.read()
+            lines = [l.strip() for l in raw.decode("utf8").splitlines()]
+            if next((l for l in lines if l != "" and not l.startswith("#")), "").startswith("["):
+                # Lists with sections are left to the server's parser.
+                continue
+            cube_cards = {}
+            unresolved = []
+            ambiguous = []
+            for line in lines:
+                if line == "":
+                    continue
+                if line.startswith("#"):
+                    if line == "# maybeboard":
+                        break
+                    continue
+                cid = self.compileCubeLine(line)
+                if cid is None:
+                    unresolved.append(line)
+                    continue
+                m = ArenaLineRegex.match(line)
+                if not m.group("set") and self.isAmbiguousName(m.group("name")):
+                    ambiguous.append(line)
+                count = int(m.group("count")) if m.group("count") else 1
+                cube_cards[cid] = cube_cards.get(cid, 0) + count
+            for line in unresolved:
+                m = ArenaLineRegex.match(line)
+                suggestion = self.session.name_index.lookup(m.group("name")) if m else None
+                errors.append(
+                    f"{path}: Could not find '{line}'." + (f" Did you mean '{self.cards[suggestion[0]]['name']}'?" if suggestion else "")
+                )
+            for line in ambiguous:
+                warning = f"Warning: {path}: '{line}' matches several cards, using the default one (specify the set)."
+                result.log(colored(warning, "yellow"))
+            result.output(
+                f"{CompiledCubesFolder}/{os.path.basename(path).replace('.txt', '.json')}",
+                {
+                    "source_hash": hashlib.sha1(raw).hexdigest(),
+                    "sheets": {"default": {"collation": "random", "cards": cube_cards}},
+                    "layouts": False,
+                    "customCards": None,
+                    "unresolved": unresolved,
+                    "ambiguous": ambiguous,
+                },
+                ensure_ascii=False,
+                indent=4,
+            )
+        result.log(f"Local cubes compiled to {CompiledCubesFolder}.")
+        result.value = errors
+        return result
+
+    ###########################################################################
+    # Set infos, constants and checks
+
+    def constantsStage(self, setinfos_and_subsets: tuple[dict, list[str]]) -> StageResult:
+        """Sets infos (with the additional pseudo sets) and the list of primary sets in src/data/constants.json."""
+        setinfos, subsets = setinfos_and_subsets
+        result = StageResult()
+        PrimarySets = list(self.primary_sets)
+        setinfos["planeshifted_snc"] = {}
+        setinfos["planeshifted_snc"].update(setinfos["snc"])
+        setinfos["planeshifted_snc"].update(
             {
-                "code": code,
-                "block": "Shadows over Innistrad Remastered",
-                "fullName": f"SIR: {bonusSheet['name']}",
+                "code": "planeshifted_snc",
+                "fullName": "Planeshifted New Capenna",
                 "isPrimary": True,
             }
         )
-        bonusSheetsIndex += 1
-
-# Pioneer Masters
-PrimarySets.append("pio")
-for i in range(0, 3):
-    code = f"pio{i}"
-    PrimarySets.append(code)
-    setinfos[code] = {}
-    setinfos[code].update(setinfos["pio"])
-    setinfos[code].update(
-        {
-            "code": code,
-            "block": "Pioneer Masters",
+
+        setinfos["mb1"] = {
+            "code": "mb1",
+            "fullName": "Mystery Booster",
+            "icon": "img/sets/mb1.svg",
             "isPrimary": True,
         }
-    )
-setinfos["pio0"]["fullName"] = "Pioneer Masters: Devotion"
-setinfos["pio1"]["fullName"] = "Pioneer Masters: Planeswalkers"
-setinfos["pio2"]["fullName"] = "Pioneer Masters: Spells"
-
-with open(SetsInfosPath, "w+", encoding="utf8") as setinfosfile:
-    setinfos_disk = {}
-    for set_code in setinfos:
-        setinfos_disk[set_code] = {
-            k: setinfos[set_code][k]
-            for k in filter(lambda k: k in setinfos[set_code], ["code", "fullName", "block", "icon"])
+        PrimarySets.append("mb1")
+        setinfos["mb1_convention_2019"] = {
+            "code": "mb1_convention_2019",
+            "fullName": "Mystery Booster Convention 2019",
+            "icon": "img/sets/mb1.svg",
+            "isPrimary": True,
+        }
+        PrimarySets.append("mb1_convention_2019")
+        setinfos["mb1_convention_2021"] = {
+            "code": "mb1_convention_2021",
+            "fullName": "Mystery Booster Convention 2021",
+            "icon": "img/sets/mb1.svg",
+            "isPrimary": True,
         }
-    json.dump(setinfos_disk, setinfosfile, ensure_ascii=False, indent=4)
-
-constants = {}
-with open("src/data/constants.json", "r", encoding="utf8") as constantsFile:
-    constants = json.loads(constantsFile.read())
-constants["PrimarySets"] = [
-    s
-    for s in PrimarySets
-    if s in setinfos
-    and s not in subsets
-    and s
-    not in [
-        "ren",
-        "rin",
-        "a22",
-        "y22",
-        "j22",
-        "sis",
-        "ltc",
-        "who",
-        "wot",
-        "acr",
-        "spe",
-        "aa2",
-        "mar",
-        "omb",
-        "fra",
-        "trk",
-        "mbc",
-    ]
-]  # Exclude some codes that are actually part of larger sets (tsb, fmb1, h1r... see subsets), or aren't out yet
-with open("src/data/constants.json", "w", encoding="utf8") as constantsFile:
-    json.dump(constants, constantsFile, ensure_ascii=False, indent=4)
+        PrimarySets.append("mb1_convention_2021")
+        PrimarySets.append("mb2")
+
+        # Add Portal sets as draftable (They're not meant to be drafted, but some users want to try anyway!)
+        PrimarySets.append("por")
+        PrimarySets.append("p02")
+        PrimarySets.append("ptk")
+
+        # Create fake primary sets for each version of the Shadows over Innistrad Remastered bonus sheet, so users can choose rather than rely on the auto rotation.
+        with open("src/data/shadow_of_the_past.json", "r") as bonusSheetsFile:
+            bonusSheets = json.loads(bonusSheetsFile.read())
+            bonusSheetsIndex = 0
+            for bonusSheet in bonusSheets:
+                code = f"sir{bonusSheetsIndex}"
+                PrimarySets.append(code)
+                setinfos[code] = {}
+                setinfos[code].update(setinfos["sir"])
+                setinfos[code].update(
+                    {
+                        "code": code,
+                        "block": "Shadows over Innistrad Remastered",
+                        "fullName": f"SIR: {bonusSheet['name']}",
+                        "isPrimary": True,
+                    }
+                )
+                bonusSheetsIndex += 1
+
+        # Pioneer Masters
+        PrimarySets.append("pio")
+        for i in range(0, 3):
+            code = f"pio{i}"
+            PrimarySets.append(code)
+            setinfos[code] = {}
+            setinfos[code].update(setinfos["pio"])
+            setinfos[code].update(
+                {
+                    "code": code,
+                    "block": "Pioneer Masters",
+                    "isPrimary": True,
+                }
+            )
+        setinfos["pio0"]["fullName"] = "Pioneer Masters: Devotion"
+        setinfos["pio1"]["fullName"] = "Pioneer Masters: Planeswalkers"
+        setinfos["pio2"]["fullName"] = "Pioneer Masters: Spells"
+
+        setinfos_disk = {}
+        for set_code in setinfos:
+            setinfos_disk[set_code] = {
+                k: setinfos[set_code][k]
+                for k in filter(lambda k: k in setinfos[set_code], ["code", "fullName", "block", "icon"])
+            }
+        result.output(SetsInfosPath, setinfos_disk, ensure_ascii=False, indent=4)
+
+        constants = {}
+        with open(self.staging.read("src/data/constants.json"), "r", encoding="utf8") as constantsFile:
+            constants = json.loads(constantsFile.read())
+        constants["PrimarySets"] = [
+            s
+            for s in PrimarySets
+            if s in setinfos
+            and s not in subsets
+            and s
+            not in [
+                "ren",
+                "rin",
+                "a22",
+                "y22",
+                "j22",
+                "sis",
+                "ltc",
+                "who",
+                "wot",
+                "acr",
+                "spe",
+                "aa2",
+                "mar",
+                "omb",
+                "fra",
+                "trk",
+                "mbc",
+            ]
+        ]  # Exclude some codes that are actually part of larger sets (tsb, fmb1, h1r... see subsets), or aren't out yet
+        result.output("src/data/constants.json", constants, ensure_ascii=False, indent=4)
+        return result
+
+    def checkOutputs(self) -> list[str]:
+        # Validate the staged outputs (see CardDBChecks.py).
+        print("Checking card DB...")
+        CheckStart = time.perf_counter()
+        CheckErrors, CheckWarnings = checkCardDB(
+            db_files=[self.staging.read(f) for f in sorted(self.session.shards)],
+            checks=[c for c in AllChecks if c not in self.options.skipped_checks],
+            staging=self.staging,
+        )
+        for w in CheckWarnings:
+            print(colored(w, "yellow"))
+        print(f"Card DB checked in {time.perf_counter() - CheckStart:.2f}s.")
+        return CheckErrors
+
+
+if __name__ == "__main__":
+    try:
+        Options = BuildOptions(sys.argv[1:])
+        # --profile: Sample the whole run, profile written to data/profiles at exit (see Profiler.py)
+        if Options.profile:
+            startProfiling(f"ManageCardData-{Options.stage or 'default'}")
+        Errors = CardDataBuild(Options).run()
+    except BuildError as e:
+        print(colored(str(e), "red"))
+        sys.exit(1)
+    if len(Errors) > 0:
+        for e in Errors:
+            print(colored(e, "red"))
+        sys.exit(1)
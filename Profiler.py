@@ -0,0 +1,240 @@
+###############################################################################
+# Low overhead sampling profiler for ManageCardData.py and the scripts (standard library only).
+#
+# A background thread records the call stacks of all threads every --interval milliseconds (5 by default); nothing is
+# traced between samples, so the profiled code runs at full speed. Idle worker threads (waiting for work) are ignored.
+# Outputs, written at exit to data/profiles/{name}-{date} (+ extension):
+#   .speedscope.json  one profile per thread, open with https://www.speedscope.app
+#   .collapsed.txt    "frame;frame;frame <microseconds>" lines, for flamegraph.pl, inferno or speedscope
+#   .summary.json     self and total time of each function, used by compare
+#   .top.txt          the hottest functions, also printed
+# Forked worker processes (see LimitedRatings.poolExecutor) are not sampled, only the time the main process waits for them.
+# Sampling is paused while the downstream stages of ManageCardData.py are forked (see profilingPaused).
+#
+# python ManageCardData.py [stage] --profile             profiles a build
+# python scripts/JumpIn.py --profile                   (any script importing scripts/ProfileScript.py)
+# python Profiler.py [--interval 5] <script.py> [args]   profiles any script
+# python Profiler.py compare <before.summary.json> <after.summary.json> [--top 30]
+
+import os
+import sys
+import json
+import time
+import runpy
+import atexit
+import datetime
+import threading
+import contextlib
+from collections import Counter
+
+ProfilesFolder = "data/profiles"
+DefaultInterval = 0.005
+TopCount = 30
+# Leaf functions of threads waiting for work
+IdleFunctions = {("threading.py", "wait"), ("queue.py", "get"), ("selectors.py", "select"), ("thread.py", "_worker")}
+
+
+def frameKey(code) -> tuple[str, str, int]:
+    return (code.co_qualname, code.co_filename, code.co_firstlineno)
+
+
+def frameName(frame: tuple[str, str, int]) -> str:
+    return f"{frame[0]} ({os.path.basename(frame[1])}:{frame[2]})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = DefaultInterval):
+        self.interval = interval
+        self.stacks = Counter()  # (thread name, (frame, ...) from the root) -> sampled seconds
+        self.sample_count = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        self.resume()
+
+    def stop(self):
+        self.pause()
+        self.duration = time.perf_counter() - self._start
+
+    def pause(self):
+        """Stops the sampling thread until resume() (e.g. while forking: A child would inherit it in an unknown state)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def resume(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        main_id = threading.main_thread().ident
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frameKey(frame.f_code))
+                    frame = frame.f_back
+                leaf = stack[0]
+                if thread_id != main_id and (os.path.basename(leaf[1]), leaf[0].split(".")[-1]) in IdleFunctions:
+                    continue
+                self.stacks[(names.get(thread_id, str(thread_id)), tuple(reversed(stack)))] += elapsed
+            self.sample_count += 1
+
+    ###########################################################################
+    # Outputs
+
+    def summary(self) -> dict:
+        """Self and total seconds of each function (recursive calls counted once)."""
+        functions = {}
+        for (_, stack), seconds in self.stacks.items():
+            for frame in set(stack):
+                functions.setdefault(frameName(frame), [0.0, 0.0])[1] += seconds
+            functions[frameName(stack[-1])][0] += seconds
+        return {
+            "duration": self.duration,
+            "interval": self.interval,
+            "samples": self.sample_count,
+            "functions": {name: {"self": s, "total": t} for name, (s, t) in functions.items()},
+        }
+
+    def speedscope(self, name: str) -> dict:
+        frames = {}
+        profiles = {}
+        for (thread, stack), seconds in sorted(self.stacks.items()):
+            profile = profiles.setdefault(
+                thread,
+                {"type": "sampled", "name": thread, "unit": "seconds", "startValue": 0, "samples": [], "weights": []},
+            )
+            profile["samples"].append([frames.setdefault(frame, len(frames)) for frame in stack])
+            profile["weights"].append(seconds)
+        for profile in profiles.values():
+            profile["endValue"] = sum(profile["weights"])
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "Profiler.py",
+            "shared": {"frames": [{"name": f[0], "file": f[1], "line": f[2]} for f in frames]},
+            "profiles": list(profiles.values()),
+        }
+
+    def collapsed(self) -> str:
+        lines = []
+        for (thread, stack), seconds in sorted(self.stacks.items()):
+            path = ";".join([thread] + [frameName(frame).replace(";", ":") for frame in stack])
+            lines.append(f"{path} {round(seconds * 1e6)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, prefix: str) -> str:
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        summary = self.summary()
+        with open(f"{prefix}.speedscope.json", "w", encoding="utf8") as outfile:
+            json.dump(self.speedscope(os.path.basename(prefix)), outfile)
+        with open(f"{prefix}.collapsed.txt", "w", encoding="utf8") as outfile:
+            outfile.write(self.collapsed())
+        with open(f"{prefix}.summary.json", "w", encoding="utf8") as outfile:
+            json.dump(summary, outfile, indent=4)
+        top = topFunctions(summary)
+        with open(f"{prefix}.top.txt", "w", encoding="utf8") as outfile:
+            outfile.write(top)
+        return top
+
+
+def topFunctions(summary: dict, count: int = TopCount) -> str:
+    functions = sorted(summary["functions"].items(), key=lambda f: f[1]["self"], reverse=True)[:count]
+    lines = [
+        f"{summary['samples']} samples in {summary['duration']:.2f}s ({1000 * summary['interval']:.0f}ms interval)",
+        f"  {'Self':>8} {'Total':>8}  Function",
+    ]
+    for name, f in functions:
+        lines.append(f"  {f['self']:7.2f}s {f['total']:7.2f}s  {name}")
+    return "\n".join(lines) + "\n"
+
+
+def compare(before_path: str, after_path: str, count: int = TopCount) -> str:
+    """Functions whose total time changed the most between two profiles."""
+    with open(before_path, "r", encoding="utf8") as file:
+        before = json.load(file)
+    with open(after_path, "r", encoding="utf8") as file:
+        after = json.load(file)
+    names = set(before["functions"]) | set(after["functions"])
+    totals = {
+        name: (before["functions"].get(name, {}).get("total", 0.0), after["functions"].get(name, {}).get("total", 0.0))
+        for name in names
+    }
+    changes = sorted(totals.items(), key=lambda t: abs(t[1][1] - t[1][0]), reverse=True)[:count]
+    lines = [
+        f"Duration: {before['duration']:.2f}s -> {after['duration']:.2f}s ({after['duration'] - before['duration']:+.2f}s)",
+        f"  {'Before':>8} {'After':>8} {'Change':>8}  Function (total time)",
+    ]
+    for name, (b, a) in changes:
+        lines.append(f"  {b:7.2f}s {a:7.2f}s {a - b:+7.2f}s  {name}")
+    return "\n".join(lines) + "\n"
+
+
+ActiveProfiler = None  # Started by startProfiling
+
+
+@contextlib.contextmanager
+def profilingPaused():
+    """Pauses the running profiler, if any, e.g. to fork worker processes (see StageScheduler.forkStages)."""
+    profiler = ActiveProfiler
+    if profiler is None or profiler._thread is None:
+        yield
+        return
+    profiler.pause()
+    try:
+        yield
+    finally:
+        profiler.resume()
+
+
+def startProfiling(name: str, interval: float | None = None) -> SamplingProfiler:
+    """Samples the process until it exits, then writes the profile to ProfilesFolder and prints the hottest functions."""
+    if interval is None and "--interval" in sys.argv:
+        interval = float(sys.argv[sys.argv.index("--interval") + 1]) / 1000
+    profiler = SamplingProfiler(interval or DefaultInterval)
+    prefix = f"{ProfilesFolder}/{name}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+
+    def finish():
+        profiler.stop()
+        print(profiler.write(prefix), end="")
+        print(f"Profile written to {prefix}.*")
+
+    global ActiveProfiler
+    ActiveProfiler = profiler
+    atexit.register(finish)
+    profiler.start()
+    return profiler
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "compare":
+        count = int(args[args.index("--top") + 1]) if "--top" in args else TopCount
+        print(compare(args[1], args[2], count), end="")
+    elif len(args) > 0:
+        interval = None
+        if args[0] == "--interval" and len(args) > 2:
+            interval = float(args[1]) / 1000
+            args = args[2:]
+        script = args[0]
+        sys.argv = args
+        sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+        startProfiling(os.path.splitext(os.path.basename(script))[0], interval)
+        runpy.run_path(script, run_name="__main__")
+    else:
+        print("Usage: python Profiler.py [--interval <ms>] <script.py> [args]")
+        print("       python Profiler.py compare <before.summary.json> <after.summary.json> [--top 30]")
+        sys.exit(1)
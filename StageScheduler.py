@@ -0,0 +1,131 @@
+###############################################################################
+# Concurrent execution of the downstream stages of ManageCardData.py (the ones only reading the card DB).
+#
+# "process" stages are CPU bound (name resolution): Each one runs in a worker process forked from the main process. It
+# inherits the stage function and what it references (e.g. the build and its card DB, shared copy-on-write), only the
+# results are pickled. They run in threads where fork is not available. Forking while other threads run is unsafe (a child
+# could inherit a lock held by one of them): Process stages are forked before any thread is started, with the profiler paused. "thread" stages are I/O bound (downloads) and
+# run in threads, they can depend on other stages and receive their results as arguments.
+# Stages don't write anything themselves: They return StageResult objects, and writeResults writes the files and prints the
+# logs in stage order, so the outputs don't depend on which stage finishes first.
+
+import json
+import time
+import traceback
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from Profiler import profilingPaused
+
+
+class StageResult:
+    def __init__(self):
+        self.outputs = []  # (path, value, json.dump keyword arguments)
+        self.logs = []
+        self.value = None  # Passed to the dependent stages
+        self.duration = 0.0
+
+    def log(self, *args, end="\n"):
+        self.logs.append(" ".join(str(a) for a in args) + end)
+
+    def output(self, path: str, value, **dump_args):
+        self.outputs.append((path, value, dump_args))
+
+
+class Stage:
+    def __init__(self, name: str, function, kind: str = "process", after: tuple[str, ...] = ()):
+        """function takes the results (StageResult.value) of the stages listed in after and returns a StageResult."""
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown stage kind '{kind}'")
+        if kind == "process" and len(after) > 0:
+            # Forking once threads are running is unsafe: Process stages are all started first.
+            raise ValueError(f"Process stage '{name}' cannot depend on other stages")
+        self.name = name
+        self.function = function
+        self.kind = kind
+        self.after = tuple(after)
+
+
+def timedRun(function, *args) -> StageResult:
+    start = time.perf_counter()
+    result = function(*args)
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def runForked(function, connection):
+    """Runs in the forked worker process, sends the result (or the error) back."""
+    try:
+        connection.send(timedRun(function))
+    except BaseException:
+        connection.send(RuntimeError(traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+def receive(process, connection) -> StageResult:
+    try:
+        result = connection.recv()
+    except EOFError:
+        process.join()
+        result = RuntimeError(f"Worker process '{process.name}' exited with code {process.exitcode}")
+    process.join()
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+
+def forkStages(stages: list[Stage]) -> dict:
+    """Starts a worker process for each stage, returns (process, connection to receive its result) by stage name."""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return {}
+    context = multiprocessing.get_context("fork")
+    forked = {}
+    # The profiler's sampling thread (see Profiler.py) is the only other thread running at this point
+    with profilingPaused():
+        for stage in stages:
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=runForked, args=(stage.function, sender), name=stage.name)
+            process.start()
+            sender.close()
+            forked[stage.name] = (process, receiver)
+    return forked
+
+
+def runStages(stages: list[Stage]) -> dict[str, StageResult]:
+    """Runs all stages, each one as soon as its dependencies are done. Returns the results by stage name, in stage order."""
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        if not set(stage.after) <= names:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s) {set(stage.after) - names}")
+    results = {}
+    process_stages = [stage for stage in stages if stage.kind == "process"]
+    # Forked before any thread is started
+    forked = forkStages(process_stages)
+    with ThreadPoolExecutor() as threads:
+        running = {}
+        for stage in process_stages:
+            if stage.name in forked:
+                running[threads.submit(receive, *forked[stage.name])] = stage
+            else:
+                running[threads.submit(timedRun, stage.function)] = stage
+        waiting = [stage for stage in stages if stage.kind == "thread"]
+        while running or waiting:
+            for stage in [s for s in waiting if all(d in results for d in s.after)]:
+                waiting.remove(stage)
+                running[threads.submit(timedRun, stage.function, *[results[d].value for d in stage.after])] = stage
+            if not running:
+                raise ValueError(f"Circular stage dependencies: {[s.name for s in waiting]}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future).name] = future.result()
+    return {stage.name: results[stage.name] for stage in stages}
+
+
+def writeResults(results: dict[str, StageResult], output_path=None):
+    """output_path: Maps an output path to where it is actually written (e.g. the build's staging folder)."""
+    for name, result in results.items():
+        print("".join(result.logs), end="")
+        for path, value, dump_args in result.outputs:
+            with open(output_path(path) if output_path else path, "w", encoding="utf8") as outfile:
+                json.dump(value, outfile, **dump_args)
+    print("Stages: " + ", ".join(f"{name} {result.duration:.2f}s" for name, result in results.items()))
@@ -0,0 +1,124 @@
+###############################################################################
+# Per-language translation packs.
+#
+# Splits the card DB into English-only core shards and one pack per other language:
+#   {folder}/core/MTGCards.N.json:  cards with only the 'en' entries of printed_names/image_uris (and back faces)
+#   {folder}/{lang}.json:           {card id: {"printed_name": ..., "image_uri": ..., "back": {"printed_name": ..., "image_uri": ...}}}
+# Packs are written with sorted keys and only rewritten when their content changes, so unchanged languages are left untouched.
+# Packs of languages the DB no longer has (e.g. after a build with fewer --languages) are deleted. During a build, packs are
+# written to a staged copy of the folder (see BuildStaging.py): Unchanged files are copied over, stale packs left out.
+# Image URIs are stored as given, templated when written from a CardDataSession (see ImageURIs.py), pack entries by the id
+# of their card.
+# loadTranslationPack/applyTranslationPack are the reference consumer: Load a language on first use and merge it into cards,
+# expandImageURIs then expands the URIs of the merged card when it's used.
+
+import os
+import json
+import glob
+import shutil
+import hashlib
+
+
+def splitTranslations(card: dict, packs: dict) -> dict:
+    """Returns the English-only version of card, adding its other languages to packs ({lang: {card id: entry}})."""
+    core = dict(card)
+    faces = [("", card, core)]
+    if "back" in card:
+        core["back"] = dict(card["back"])
+        faces.append(("back", card["back"], core["back"]))
+    for face, source, dest in faces:
+        for prop, key in [("printed_names", "printed_name"), ("image_uris", "image_uri")]:
+            if prop not in source:
+                continue
+            dest[prop] = {lang: v for lang, v in source[prop].items() if lang == "en"}
+            for lang, value in source[prop].items():
+                if lang == "en":
+                    continue
+                entry = packs.setdefault(lang, {}).setdefault(card["id"], {})
+                if face:
+                    entry = entry.setdefault(face, {})
+                entry[key] = value
+    return core
+
+
+def writeIfChanged(path: str, content: bytes, previous: str | None = None) -> bool:
+    """previous: Where the current version of the file is, when writing a new copy of the folder: It is copied over (keeping
+    its modification time) if unchanged."""
+    current = previous or path
+    if os.path.isfile(current):
+        with open(current, "rb") as file:
+            if hashlib.sha1(file.read()).digest() == hashlib.sha1(content).digest():
+                if current != path:
+                    shutil.copy2(current, path)
+                return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def writeTranslationPacks(cards: dict, folder: str, parts: int = 4, previous: str | None = None) -> dict:
+    """Writes the core shards and translation packs, deletes the stale ones.
+    previous: Folder of the current packs, when folder is a new (e.g. staged) copy of it replacing it as a whole: Stale packs
+    are then left out instead of deleted.
+    Returns {lang: (size in bytes, card count, rewritten)}, None for the deleted packs."""
+    previous = previous if previous is not None and os.path.normpath(previous) != os.path.normpath(folder) else None
+    os.makedirs(f"{folder}/core", exist_ok=True)
+    packs = {}
+    core = {cid: splitTranslations(card, packs) for cid, card in cards.items()}
+    items = list(core.items())
+    report = {}
+    core_size = 0
+    core_rewritten = False
+    for i in range(parts):
+        content = json.dumps(
+            dict(items[i * len(items) // parts : (i + 1) * len(items) // parts]), ensure_ascii=False
+        ).encode("utf8")
+        name = f"core/MTGCards.{i}.json"
+        core_rewritten = writeIfChanged(f"{folder}/{name}", content, previous and f"{previous}/{name}") or core_rewritten
+        core_size += len(content)
+    report["en"] = (core_size, len(core), core_rewritten)
+    for lang, pack in sorted(packs.items()):
+        content = json.dumps(pack, ensure_ascii=False, sort_keys=True).encode("utf8")
+        rewritten = writeIfChanged(f"{folder}/{lang}.json", content, previous and f"{previous}/{lang}.json")
+        report[lang] = (len(content), len(pack), rewritten)
+    for path in sorted(glob.glob(f"{previous or folder}/*.json")):
+        lang = os.path.basename(path).removesuffix(".json")
+        if lang not in packs:
+            if previous is None:
+                os.remove(path)
+            report[lang] = None
+    return report
+
+
+LoadedPacks = {}
+
+
+def loadTranslationPack(folder: str, lang: str) -> dict:
+    if lang not in LoadedPacks:
+        path = f"{folder}/{lang}.json"
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf8") as file:
+                LoadedPacks[lang] = json.loads(file.read())
+        else:
+            LoadedPacks[lang] = {}
+    return LoadedPacks[lang]
+
+
+def applyTranslationPack(card: dict, pack: dict, lang: str) -> dict:
+    """Returns a copy of the (core) card with the translations of lang merged in."""
+    entry = pack.get(card["id"])
+    if entry is None:
+        return card
+    card = dict(card)
+    faces = [(card, entry)]
+    if "back" in card and "back" in entry:
+        card["back"] = dict(card["back"])
+        faces.append((card["back"], entry["back"]))
+    for dest, source in faces:
+        if "printed_name" in source:
+            dest["printed_names"] = {**dest.get("printed_names", {}), lang: source["printed_name"]}
+        if "image_uri" in source:
+            dest["image_uris"] = {**dest.get("image_uris", {}), lang: source["image_uri"]}
+    return card
@@ -0,0 +1,171 @@
+###############################################################################
+# Watch mode for ManageCardData.py: Rebuilds the card data when its inputs change.
+#
+# Usage: python WatchCardData.py [--mtga <MTGA folder>] [--poll 10] [--debounce 60] [--bulk-interval 3600]
+#                                [--on-publish "<shell command>"] [--once] [other ManageCardData.py options]
+#
+# Watched inputs and the ManageCardData.py stage they trigger (the strongest pending one wins):
+#   Scryfall bulk data (updated_at, polled every --bulk-interval seconds)             -> dl
+#   MTGA Raw_CardDatabase_*.mtga files, data/BoosterRules.json                        -> arena
+#   data/JumpstartBoosters/*.txt                                                      -> jmp
+#   src/data/TheList/*.txt, data/cubes/*.txt                                          -> default run (cached card DB is reused)
+# The bulk data checked is the one ManageCardData.py uses: default_cards with --default-cards, all_cards otherwise.
+# The arena stage only re-applies the Arena ids and booster rules to the cached card DB (ManageCardData.py falls back to a
+# full cache rebuild when it can't).
+# A build starts once the inputs have been stable for --debounce seconds (Arena patches write several files).
+# Builds run with --no-publish: ManageCardData.py leaves its validated outputs in its staging folder, and they are only
+# moved into place (see BuildStaging.py) once it succeeded, so a failed build leaves nothing live. Then data/LastBuild.json
+# is replaced atomically and the --on-publish command, if any, is run (e.g. to restart the server).
+# Options not listed above (e.g. --languages) are passed to ManageCardData.py.
+
+import os
+import sys
+import json
+import glob
+import time
+import hashlib
+import datetime
+import subprocess
+import requests
+from termcolor import colored
+from BuildStaging import Staging
+
+ValueOptions = ["--mtga", "--poll", "--debounce", "--bulk-interval", "--on-publish"]
+ScryfallAPI = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com")
+BulkDataType = "default_cards" if "--default-cards" in sys.argv else "all_cards"
+BulkDataPath = "data/scryfall-default-cards.jsonl.gz" if "--default-cards" in sys.argv else "data/scryfall-all-cards.jsonl.gz"
+BuildInfoPath = "data/LastBuild.json"
+# Stages in increasing order of strength: A stronger stage also covers everything done by the weaker ones.
+Stages = ["", "jmp", "arena", "cache", "dl"]
+
+
+def option(name, default=None):
+    if name in sys.argv and sys.argv.index(name) + 1 < len(sys.argv):
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+MTGAFolder = option("--mtga", "H:/SteamLibrary/steamapps/common/MTGA/")
+WatchedInputs = [
+    (f"{MTGAFolder}MTGA_Data/Downloads/Raw/Raw_CardDatabase_*.mtga", "arena"),
+    ("data/JumpstartBoosters/*.txt", "jmp"),
+    ("src/data/TheList/*.txt", ""),
+    ("data/cubes/*.txt", ""),
+    ("data/BoosterRules.json", "arena"),
+]
+
+
+def snapshot(pattern: str) -> dict:
+    files = {}
+    for path in glob.glob(pattern):
+        try:
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:  # Removed since the glob
+            pass
+    return files
+
+
+def bulkDataOutdated() -> bool:
+    try:
+        response = requests.get(f"{ScryfallAPI}/bulk-data", headers={"User-Agent": "Draftmancer DB Updater"})
+        response.raise_for_status()
+        bulk_data = next(x for x in response.json()["data"] if x["type"] == BulkDataType)
+    except Exception as e:
+        print(colored(f"Could not check Scryfall bulk data: {e}", "yellow"))
+        return False
+    if not os.path.isfile(BulkDataPath):
+        return True
+    local_time = datetime.datetime.fromtimestamp(os.path.getmtime(BulkDataPath), tz=datetime.timezone.utc)
+    return datetime.datetime.fromisoformat(bulk_data["updated_at"]) > local_time
+
+
+def mtgaDBAge(files: dict) -> float | None:
+    if len(files) == 0:
+        return None
+    return (time.time() - max(mtime for mtime, _ in files.values()) / 1e9) / 3600
+
+
+def publish(stage: str, reasons: list[str], duration: float) -> bool:
+    staging = Staging.load()
+    if staging is None:
+        print(colored("No staged outputs to publish.", "red"))
+        return False
+    staging.publish()
+    shards = {}
+    for path in sorted(glob.glob("data/MTGCards.*.json")):
+        with open(path, "rb") as file:
+            shards[os.path.basename(path)] = hashlib.sha1(file.read()).hexdigest()
+    info = {
+        "finished_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "stage": stage,
+        "reasons": reasons,
+        "duration": round(duration, 1),
+        "shards": shards,
+    }
+    tmp_path = BuildInfoPath + ".tmp"
+    with open(tmp_path, "w", encoding="utf8") as outfile:
+        json.dump(info, outfile, indent=4)
+    os.replace(tmp_path, BuildInfoPath)
+    command = option("--on-publish")
+    if command:
+        print(f"Running '{command}'...")
+        subprocess.run(command, shell=True)
+    return True
+
+
+def build(stage: str, reasons: list[str]) -> bool:
+    passthrough = [
+        a
+        for i, a in enumerate(sys.argv[1:], 1)
+        if a not in ValueOptions and sys.argv[i - 1] not in ValueOptions and a != "--once"
+    ]
+    args = [sys.executable, "ManageCardData.py"] + ([stage] if stage else []) + ["--mtga", MTGAFolder, "--no-publish"] + passthrough
+    print(colored(f"[{time.strftime('%H:%M:%S')}] Rebuilding ({', '.join(reasons)}): {' '.join(args[1:])}", "blue"))
+    start = time.perf_counter()
+    result = subprocess.run(args)
+    duration = time.perf_counter() - start
+    if result.returncode != 0:
+        print(colored(f"ManageCardData.py failed (exit code {result.returncode}) after {duration:.0f}s.", "red"))
+        return False
+    if not publish(stage, reasons, duration):
+        return False
+    print(colored(f"Build published in {duration:.0f}s.", "green"))
+    return True
+
+
+if __name__ == "__main__":
+    poll = float(option("--poll", "10"))
+    debounce = float(option("--debounce", "60"))
+    bulk_interval = float(option("--bulk-interval", "3600"))
+
+    snapshots = [snapshot(pattern) for pattern, _ in WatchedInputs]
+    age = mtgaDBAge(snapshots[0])
+    print(f"Watching {sum(len(s) for s in snapshots)} files" + (f", MTGA DB updated {age:.1f} hours ago." if age else "."))
+    pending = {}  # reason -> stage
+    last_change = 0.0
+    last_bulk_check = float("-inf")
+    while True:
+        now = time.monotonic()
+        if now - last_bulk_check >= bulk_interval:
+            last_bulk_check = now
+            if bulkDataOutdated():
+                pending["Scryfall bulk data"] = "dl"
+                last_change = now
+        for i, (pattern, stage) in enumerate(WatchedInputs):
+            current = snapshot(pattern)
+            if current != snapshots[i]:
+                changed = {p for p in current.keys() | snapshots[i].keys() if current.get(p) != snapshots[i].get(p)}
+                print(f"[{time.strftime('%H:%M:%S')}] {len(changed)} file(s) changed: {', '.join(sorted(changed)[:3])}")
+                snapshots[i] = current
+                pending[pattern] = stage
+                last_change = now
+        if pending and now - last_change >= debounce:
+            stage = max(pending.values(), key=Stages.index)
+            reasons = sorted(pending)
+            pending = {}
+            # On failure, the build is retried on the next change or bulk data update.
+            build(stage, reasons)
+            if "--once" in sys.argv:
+                break
+        time.sleep(poll)
@@ -1,4 +1,34 @@
 import { ArenaID } from "@/CardTypes";
-import _mtgaAlternates from "./data/MTGAAlternates.json" with { type: "json" };
-export const MTGAAlternates = _mtgaAlternates as { [name: string]: ArenaID[] };
-export default MTGAAlternates;
+import { Manifest } from "./MTGACards";
+
+type MTGAAlternatesChunk = { [name: string]: ArenaID[] };
+
+// Same as alternatesChunk in ManageCardData.py
+export function alternatesChunk(name: string): string {
+	const first = name.substring(0, 1).toLowerCase();
+	return first >= "a" && first <= "z" ? first : "_";
+}
+
+const Chunks: { [chunk: string]: Promise<MTGAAlternatesChunk> } = {};
+
+function loadChunk(chunk: string): Promise<MTGAAlternatesChunk> {
+	if (!(chunk in Chunks))
+		Chunks[chunk] = import(
+			/* webpackChunkName: "mtga-alternates-[request]" */ `./data/mtga/${Manifest.alternates[chunk]}`
+		).then((m) => m.default as MTGAAlternatesChunk);
+	return Chunks[chunk];
+}
+
+// Arena ids of every version of each of these cards, by name.
+export async function getMTGAAlternates(names: string[]): Promise<MTGAAlternatesChunk> {
+	const chunks = [...new Set(names.map(alternatesChunk))].filter((c) => c in Manifest.alternates);
+	const loaded = await Promise.all(chunks.map(loadChunk));
+	const r: MTGAAlternatesChunk = {};
+	for (const name of names) {
+		const chunk = loaded[chunks.indexOf(alternatesChunk(name))];
+		if (chunk && name in chunk) r[name] = chunk[name];
+	}
+	return r;
+}
+
+export default getMTGAAlternates;
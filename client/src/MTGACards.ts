@@ -1,6 +1,36 @@
 import { ArenaID, Card } from "@/CardTypes";
-import _mtgaCards from "./data/MTGACards.json" with { type: "json" };
+import _manifest from "./data/mtga/Manifest.json" with { type: "json" };
+import { lazyImageURIs } from "../../src/ImageURIs";
 
-export const MTGACards = _mtgaCards as { [aid: ArenaID]: Card };
+type MTGACardsChunk = { [aid: ArenaID]: Card };
 
-export default MTGACards;
+// Written by writeMTGAChunks in ManageCardData.py (cache and arena stages) along with the chunks. They're build outputs, not
+// tracked: Run it before building the client.
+export const Manifest = _manifest as {
+	cards: { [set: string]: { file: string; min: ArenaID; max: ArenaID; count: number } };
+	alternates: { [chunk: string]: string };
+};
+
+// Arena cards are split by set (see writeMTGAChunks in ManageCardData.py), each chunk is fetched once, when first needed.
+const Chunks: { [set: string]: Promise<MTGACardsChunk> } = {};
+
+function loadChunk(set: string): Promise<MTGACardsChunk> {
+	if (!(set in Chunks))
+		Chunks[set] = import(
+			/* webpackChunkName: "mtga-cards-[request]" */ `./data/mtga/${Manifest.cards[set].file}`
+		).then((m) => {
+			// Image URIs are stored templated, and kept that way in memory (see ImageURIs.ts)
+			const chunk = m.default as MTGACardsChunk;
+			for (const card of Object.values(chunk)) lazyImageURIs(card);
+			return chunk;
+		});
+	return Chunks[set];
+}
+
+// All Arena cards of the requested sets (all of them by default).
+export async function loadMTGACards(sets: string[] = Object.keys(Manifest.cards)): Promise<MTGACardsChunk> {
+	const chunks = await Promise.all(sets.filter((s) => s in Manifest.cards).map(loadChunk));
+	return Object.assign({}, ...chunks);
+}
+
+export default loadMTGACards;
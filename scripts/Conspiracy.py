@@ -1,9 +1,13 @@
+import os
 import requests
 import json
+import ProfileScript  # --profile
+
+ScryfallAPI = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com")
 
 draft_effects = {}
 
-r = requests.get('https://api.scryfall.com/cards/search?q=o:"Draft ~ face up"')
+r = requests.get(f'{ScryfallAPI}/cards/search?q=o:"Draft ~ face up"')
 d = json.loads(r.content)
 print("export const FaceUpCards: OracleID[] = [")
 for c in d["data"]:
@@ -13,7 +17,7 @@ for c in d["data"]:
     print(f"\t\"{c['oracle_id']}\", // {c['name']}")
 print("];")
 
-r = requests.get('https://api.scryfall.com/cards/search?q=o:"Reveal ~ as you draft it"')
+r = requests.get(f'{ScryfallAPI}/cards/search?q=o:"Reveal ~ as you draft it"')
 d = json.loads(r.content)
 print("export const RevealedCards: OracleID[] = [")
 for c in d["data"]:
@@ -24,7 +28,7 @@ for c in d["data"]:
 print("];")
 
 r = requests.get(
-    'https://api.scryfall.com/cards/search?q=o:"Reveal ~ as you draft it and note how many cards you’ve drafted this draft round, including ~."'
+    f'{ScryfallAPI}/cards/search?q=o:"Reveal ~ as you draft it and note how many cards you’ve drafted this draft round, including ~."'
 )
 d = json.loads(r.content)
 print("export const NoteDraftedCards: OracleID[] = [")
@@ -35,7 +39,7 @@ for c in d["data"]:
     print(f"\t\"{c['oracle_id']}\", // {c['name']}")
 print("];")
 
-r = requests.get('https://api.scryfall.com/cards/search?q=o:"As you draft a card, you may remove it from the draft"')
+r = requests.get(f'{ScryfallAPI}/cards/search?q=o:"As you draft a card, you may remove it from the draft"')
 d = json.loads(r.content)
 for c in d["data"]:
     if c["oracle_id"] not in draft_effects:
@@ -43,7 +47,7 @@ for c in d["data"]:
     draft_effects[c["oracle_id"]].append("RemoveDraftCard")
 
 r = requests.get(
-    'https://api.scryfall.com/cards/search?q=o:"As you draft a card, you may reveal it, note its name, then turn ~ face down."'
+    f'{ScryfallAPI}/cards/search?q=o:"As you draft a card, you may reveal it, note its name, then turn ~ face down."'
 )
 d = json.loads(r.content)
 for c in d["data"]:
@@ -52,7 +56,7 @@ for c in d["data"]:
     draft_effects[c["oracle_id"]].append("NoteCardName")
 
 r = requests.get(
-    'https://api.scryfall.com/cards/search?q=o:"As you draft a creature card, you may reveal it, note its creature types, then turn ~ face down."'
+    f'{ScryfallAPI}/cards/search?q=o:"As you draft a creature card, you may reveal it, note its creature types, then turn ~ face down."'
 )
 d = json.loads(r.content)
 for c in d["data"]:
@@ -61,7 +65,7 @@ for c in d["data"]:
     draft_effects[c["oracle_id"]].append("NoteCreatureTypes")
 
 r = requests.get(
-    'https://api.scryfall.com/cards/search?q=o:"As you draft a creature card, you may reveal it, note its name, then turn ~ face down."'
+    f'{ScryfallAPI}/cards/search?q=o:"As you draft a creature card, you may reveal it, note its name, then turn ~ face down."'
 )
 d = json.loads(r.content)
 for c in d["data"]:
@@ -70,7 +74,7 @@ for c in d["data"]:
     draft_effects[c["oracle_id"]].append("NoteCreatureName")
 
 r = requests.get(
-    'https://api.scryfall.com/cards/search?q=o:"Reveal ~ as you draft it and note the player who passed it to you"'
+    f'{ScryfallAPI}/cards/search?q=o:"Reveal ~ as you draft it and note the player who passed it to you"'
 )
 d = json.loads(r.content)
 for c in d["data"]:
@@ -79,7 +83,7 @@ for c in d["data"]:
     draft_effects[c["oracle_id"]].append("NotePassingPlayer")
 
 r = requests.get(
-    'https://api.scryfall.com/cards/search?q=o:"The player to your right chooses a color, you choose another color, then the player to your left chooses a third color."'
+    f'{ScryfallAPI}/cards/search?q=o:"The player to your right chooses a color, you choose another color, then the player to your left chooses a third color."'
 )
 d = json.loads(r.content)
 for c in d["data"]:
@@ -1,5 +1,9 @@
+import os
 import json
 import requests
+import ProfileScript  # --profile
+
+ScryfallAPI = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com")
 
 # Retrieve Shadow of the Past (Shadow over Innistrad Remastered bonus list) cards IDs from Scryfall
 
@@ -105,7 +109,7 @@ for l in ShadowOfPastLists:
     print(l["name"])
     l["card_ids"] = []
     for card in l["card_names"]:
-        r = requests.get(f"https://api.scryfall.com/cards/named?exact={card}&set=sis")
+        r = requests.get(f"{ScryfallAPI}/cards/named?exact={card}&set=sis")
         d = r.json()
         if d["object"] != "card":
             print("Failed to find card: ", card)
@@ -1,12 +1,17 @@
 ###############################################################################
 # Retrieve Jumpstart 2022 pack information directly from Wizards' site
 
+import os
 import requests
 import re 
 import json
+import ProfileScript  # --profile
+
+ScryfallAPI = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com")
+WizardsURL = os.environ.get("WIZARDS_URL", "https://magic.wizards.com")
 
 Jumpstart22BoostersDist = 'src/data/Jumpstart2022Boosters.json'
-PacketListURL = "https://magic.wizards.com/en/news/feature/jumpstart-2022-booster-themes-and-card-lists"
+PacketListURL = f"{WizardsURL}/en/news/feature/jumpstart-2022-booster-themes-and-card-lists"
 TitleRegex = r"<deck-list data-id=\"[^\"]+\" deck-title=\"([^\"\(]+)( \(\d\))?\" format=\"Limited\">"
 CardsRegex = r"<main-deck>\n([^<]+)\n</main-deck>"
 CardLineRegex = r"^(\d) (.*)$"
@@ -18,7 +23,7 @@ def fix_cardname(n):
 
 J22Cards = {}
 print("Fetching J22 cards...")
-result = requests.get(json.loads(requests.get(f"https://api.scryfall.com/sets/j22").content)["search_uri"]).json()
+result = requests.get(json.loads(requests.get(f"{ScryfallAPI}/sets/j22").content)["search_uri"]).json()
 for c in result["data"]:
     J22Cards[c["name"]] = c["id"]
 while result["has_more"]:
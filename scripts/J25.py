@@ -5,8 +5,12 @@ import json
 import urllib.parse
 import html
 import time
+import ProfileScript  # --profile
 
-PacketListURL = "https://magic.wizards.com/en/news/announcements/foundations-jumpstart-booster-themes"
+ScryfallAPI = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com")
+WizardsURL = os.environ.get("WIZARDS_URL", "https://magic.wizards.com")
+
+PacketListURL = f"{WizardsURL}/en/news/announcements/foundations-jumpstart-booster-themes"
 
 TitleRegex = r"<deck-list.* deck-title=\"(.*)\" format=\".*\">"
 CardRegex = r"(?:(\d+) )?(.+)"
@@ -35,7 +39,7 @@ def addCard(card):
         return
 
 def requestCards(s):
-    res = requests.get(f"https://api.scryfall.com/cards/search?include_extras=true&include_variations=true&order=set&q=e%3A{s}&unique=prints").json()
+    res = requests.get(f"{ScryfallAPI}/cards/search?include_extras=true&include_variations=true&order=set&q=e%3A{s}&unique=prints").json()
     for card in res["data"]:
         addCard(card)
     while res["has_more"]:
@@ -59,7 +63,7 @@ if not os.path.isfile(OutputFile):
         #    r = requests.get(f"https://api.scryfall.com/cards/named?exact={name}&set=fdn")
         #    time.sleep(0.1)
         #    if r.status_code != 200:
-        r = requests.get(f"https://api.scryfall.com/cards/named?exact={name}")
+        r = requests.get(f"{ScryfallAPI}/cards/named?exact={name}")
         time.sleep(0.1)
         if r.status_code != 200:
             print(f"Card not found: {name}")
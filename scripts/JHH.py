@@ -1,15 +1,28 @@
 ###############################################################################
 # Retreive Jumpstart: Historic Horizons pack information directly from Wizards' site
 
+import os
+import re
+import sys
+import json
+import requests
+import ProfileScript  # --profile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from CardDataSession import CardDataSession
+
 JumpstartHHBoostersDist = 'src/data/JumpstartHHBoosters.json'
-PacketListURL = "https://magic.wizards.com/en/articles/archive/magic-digital/jumpstart-historic-horizons-packet-lists-2021-07-26"
+PacketListURL = os.environ.get("WIZARDS_URL", "https://magic.wizards.com") + "/en/articles/archive/magic-digital/jumpstart-historic-horizons-packet-lists-2021-07-26"
 TitleRegex = r"<span class=\"deck-meta\">\s*<h4>([^<]+)</h4>"
 CardsRegex = r"<span class=\"card-count\">(\d+)</span>\s*<span class=\"card-name\">(?:<a[^>]*>)?([^<]+)(?:</a>)?</span>"
 AlternateLinesRegex = r"<tr[\s\S]*?<\/tr>"
 AlternateCardsRegex = r"<td><a href=\"https://gatherer\.wizards\.com/Pages/Card/Details\.aspx\?name=.*\" class=\"autocard-link\" data-image-url=\"https://gatherer\.wizards\.com/Handlers/Image\.ashx\?type=card&amp;name=.*\">(.+)</a></td>\s*<td>(\d+)%</td>"
 TotalRegex = r"<div class=\"regular-card-total\">(\d+) Cards"
+Rarity = {"mythic": 0, "rare": 1, "uncommon": 2, "common": 3, "special": 4, "bonus": 5}  # Rarest first
 
 if not os.path.isfile(JumpstartHHBoostersDist):
+    session = CardDataSession()  # Built card DB (run ManageCardData.py first)
+    cards = session.cards
     CardIDsByName = {}
     for cid in cards:
         cardname = cards[cid]["name"].split(" //")[0]
@@ -126,7 +139,7 @@ if not os.path.isfile(JumpstartHHBoostersDist):
         else:
             print("Added Pack '{}', {} + {} = {}/{} cards.".format(matches_arr[idx].group(1), len(jhh_cards), len(altcards), found_cards, total_expected_cards))
             jumpstartHHBoosters.append({"name": matches_arr[idx].group(1), "colors": list(colors), "cycling_land": cycling_land,
-                                        "image": cards[rarest_card]["image_uris"]["en"] if rarest_card != None else None, "cards": jhh_cards, "alts": altcards})
+                                        "image": session.card(rarest_card)["image_uris"]["en"] if rarest_card != None else None, "cards": jhh_cards, "alts": altcards})
     print("Jumpstart Boosters: {}/46".format(len(jumpstartHHBoosters)))
     with open(JumpstartHHBoostersDist, 'w', encoding="utf8") as outfile:
         json.dump(jumpstartHHBoosters, outfile, indent=4, ensure_ascii=False,)
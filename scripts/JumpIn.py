@@ -1,39 +1,47 @@
 ###############################################################################
 # Retreive JumpIn pack information directly from Wizards' site
 import os
+import sys
 import requests
 import re
 import json
 import urllib.parse
 import html
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import ProfileScript  # --profile
+
+ScryfallAPI = os.environ.get("SCRYFALL_API_URL", "https://api.scryfall.com")
+WizardsURL = os.environ.get("WIZARDS_URL", "https://magic.wizards.com")
 
 Sets = [
-    {"set": "fdn", "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-foundations"},
+    {"set": "fdn", "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-foundations"},
     {
         "set": "dsk",
-        "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-duskmourn-house-of-horror",
+        "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-duskmourn-house-of-horror",
     },
-    {"set": "blb", "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-bloomburrow"},
+    {"set": "blb", "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-bloomburrow"},
     {
         "set": "otj",
-        "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-outlaws-of-thunder-junction",
+        "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-outlaws-of-thunder-junction",
     },
     {
         "set": "mkm",
-        "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-murders-at-karlov-manor",
+        "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-murders-at-karlov-manor",
     },
     {
         "set": "lci",
-        "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-the-lost-caverns-of-ixalan",
+        "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-the-lost-caverns-of-ixalan",
     },
-    {"set": "woe", "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-update-for-wilds-of-eldraine"},
-    {"set": "ltr", "url": "https://magic.wizards.com/en/news/mtg-arena/jump-into-middle-earth-on-mtg-arena"},
+    {"set": "woe", "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-update-for-wilds-of-eldraine"},
+    {"set": "ltr", "url": f"{WizardsURL}/en/news/mtg-arena/jump-into-middle-earth-on-mtg-arena"},
     {
         "set": "one",
-        "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-phyrexia-all-will-be-one",
+        "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-phyrexia-all-will-be-one",
     },
-    {"set": "bro", "url": "https://magic.wizards.com/en/news/mtg-arena/jump-in-packets-update-for-the-brothers-war"},
-    # {"set": "dmu", "url": "https://magic.wizards.com/en/news/mtg-arena/jump-packets-update-dominaria-united-2022-08-31"},
+    {"set": "bro", "url": f"{WizardsURL}/en/news/mtg-arena/jump-in-packets-update-for-the-brothers-war"},
+    # {"set": "dmu", "url": f"{WizardsURL}/en/news/mtg-arena/jump-packets-update-dominaria-united-2022-08-31"},
 ]
 
 TitleRegex = r"<deck-list.* deck-title=\"(.*)\" format=\".*\">"
@@ -41,135 +49,212 @@ CardRegex = r"(\d+) (.*)"
 AlternateLinesRegex = r"<tr[\s\S]*?<\/tr>"
 AlternateCardsRegex = r"<td>(?:(?:<auto-card.*>|<a class=\"autocard-link\".*>))([^<]+)(?:<\/auto-card>|<\/a>)?<\/td>\s*\n\s*<td>(\d+)%<\/td>"
 
-for entry in Sets:
+# Usage: python scripts/JumpIn.py [--parallel [workers]] [--profile]
+# With --parallel, sets are processed concurrently. All requests (Wizards' site and Scryfall) still go through a single shared rate limiter.
+Parallel = "--parallel" in sys.argv
+Workers = len(Sets)
+if Parallel and len(sys.argv) > sys.argv.index("--parallel") + 1 and sys.argv[sys.argv.index("--parallel") + 1].isdigit():
+    Workers = int(sys.argv[sys.argv.index("--parallel") + 1])
+
+RequestInterval = 0.1  # Scryfall asks for 50-100ms between requests
+
+class RateLimiter:
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_request = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_request - now
+            self.next_request = max(now, self.next_request) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+Limiter = RateLimiter(RequestInterval)
+PrintLock = threading.Lock()
+Cancelled = threading.Event()  # Set when a set failed: Other workers stop at their next request
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def get(url):
+    while True:
+        if Cancelled.is_set():
+            raise ExtractionError("Cancelled")
+        Limiter.wait()
+        r = requests.get(url)
+        if r.status_code != 429:
+            return r
+        time.sleep(float(r.headers.get("Retry-After", 1)))
+
+
+def dumpAtomically(data, path):
+    tmpPath = f"{path}.tmp"
+    with open(tmpPath, "w", encoding="utf8") as outfile:
+        json.dump(
+            data,
+            outfile,
+            indent=4,
+            ensure_ascii=False,
+        )
+    os.replace(tmpPath, path)
+
+
+def extractSet(entry):
     Set = entry["set"]
     PacketListURL = entry["url"]
 
+    def log(*args):
+        with PrintLock:
+            print(f"[{Set}]", *args)
+
     CardsByName = {}
     CardsByID = {}
 
     OutputFile = f"src/data/JumpInBoosters_{Set}.json"
-    if not os.path.isfile(OutputFile):
-
-        def getCardFromName(name):
-            if name in CardsByName:
-                return CardsByName[name]
-            name = html.unescape(name)
-            name = urllib.parse.quote(name)
-            r = requests.get(f"https://api.scryfall.com/cards/named?exact={name}&set={Set}")
+    if os.path.isfile(OutputFile):
+        return 0
+
+    def getCardFromName(name):
+        if name in CardsByName:
+            return CardsByName[name]
+        quoted = urllib.parse.quote(html.unescape(name))
+        r = get(f"{ScryfallAPI}/cards/named?exact={quoted}&set={Set}")
+        if r.status_code != 200:
+            r = get(f"{ScryfallAPI}/cards/named?exact={quoted}")
             if r.status_code != 200:
-                r = requests.get(f"https://api.scryfall.com/cards/named?exact={name}")
-                if r.status_code != 200:
-                    print(f"Card not found: {name}")
-                    exit()
-            CardsByName[name] = r.json()
-            CardsByID[r.json()["id"]] = r.json()
-            return r.json()
-
-        NameFixes = {}
-
-        def fix_cardname(n):
-            r = n.split(" //")[0].strip()
-            if r in NameFixes:
-                return NameFixes[r]
-            return r
+                raise ExtractionError(f"[{Set}] Card not found: {name}")
+        CardsByName[name] = r.json()
+        CardsByID[r.json()["id"]] = r.json()
+        return r.json()
+
+    NameFixes = {}
+
+    def fix_cardname(n):
+        r = n.split(" //")[0].strip()
+        if r in NameFixes:
+            return NameFixes[r]
+        return r
+
+    log(f"Extracting boosters for set {Set}...")
+    jumpInBoosters = []
+    page = get(PacketListURL).text
+    matches = re.finditer(TitleRegex, page, re.MULTILINE)
+    matches_arr = []
+    for m in matches:
+        matches_arr.append(m)
+
+    for idx in range(len(matches_arr)):
+        deck_name = matches_arr[idx].group(1)
+        log(f"Deck: {deck_name} ({idx + 1}/{len(matches_arr)})")
+
+        # find next occurrence of "<main-deck>"
+        start = page.find("<main-deck>", matches_arr[idx].span()[1]) + len("<main-deck>")
+        end = page.find("</main-deck>", start)
+        deck = page[start:end]
+
+        colors = set()
 
-        print(f"Extracting boosters for set {Set}...")
-        jumpInBoosters = []
-        page = requests.get(PacketListURL).text
-        matches = re.finditer(TitleRegex, page, re.MULTILINE)
-        matches_arr = []
-        for m in matches:
-            matches_arr.append(m)
-
-        for idx in range(len(matches_arr)):
-            deck_name = matches_arr[idx].group(1)
-            print(f"Deck: {deck_name}")
-
-            # find next occurrence of "<main-deck>"
-            start = page.find("<main-deck>", matches_arr[idx].span()[1]) + len("<main-deck>")
-            end = page.find("</main-deck>", start)
-            deck = page[start:end]
-
-            colors = set()
-
-            cards_matches = re.findall(CardRegex, deck)
-            set_cards = []
-            for c in cards_matches:
-                count = int(c[0])
-                cardname = fix_cardname(c[1])
+        cards_matches = re.findall(CardRegex, deck)
+        set_cards = []
+        for c in cards_matches:
+            count = int(c[0])
+            cardname = fix_cardname(c[1])
+            card = getCardFromName(cardname)
+            for color in filter(lambda a: a in "WUBRG", card["color_identity"]):
+                colors.add(color)
+            for i in range(count):  # Add the card c[0] times
+                set_cards.append(card["id"])
+            log(f"  {count} {card['name']:<50} ({card['id']})")
+        if len(set_cards) == 0:
+            raise ExtractionError(f"[{Set}] Error: Not cards? ({deck_name})")
+
+        start = page.find("<tbody>", matches_arr[idx].span()[1]) + len("<tbody>")
+        end = page.find("</tbody>", start)
+
+        altcards = []
+        altline_matches = re.findall(AlternateLinesRegex, page[start:end])
+        for l in altline_matches:
+            alt_matches = re.findall(AlternateCardsRegex, l)
+            altslot = []
+            for altidx, alt in enumerate(alt_matches):
+                cardname = fix_cardname(alt[0])
+                percentage = int(alt[1])
                 card = getCardFromName(cardname)
-                for color in filter(lambda a: a in "WUBRG", card["color_identity"]):
-                    colors.add(color)
-                for i in range(count):  # Add the card c[0] times
-                    set_cards.append(card["id"])
-                print(f"  {count} {card['name']:<50} ({card['id']})")
-            if len(set_cards) == 0:
-                print("Error: Not cards?")
-                exit()
-
-            start = page.find("<tbody>", matches_arr[idx].span()[1]) + len("<tbody>")
-            end = page.find("</tbody>", start)
-
-            altcards = []
-            altline_matches = re.findall(AlternateLinesRegex, page[start:end])
-            for l in altline_matches:
-                alt_matches = re.findall(AlternateCardsRegex, l)
-                altslot = []
-                for altidx, alt in enumerate(alt_matches):
-                    cardname = fix_cardname(alt[0])
-                    percentage = int(alt[1])
-                    card = getCardFromName(cardname)
-                    altslot.append({"name": card["name"], "id": card["id"], "weight": percentage})
-                    print(f"  [{percentage:>2}%] {card['name']:<50} ({card['id']})")
-                    if altidx == 0 and card["id"] in set_cards:
-                        set_cards.remove(card["id"])
-                if len(altslot) > 0:
-                    altcards.append(altslot)
-                else:
-                    print("Boosters: Empty Alt Slot.")
-                    print(alt_matches)
-            if len(altcards) == 0:
-                print("Error: Not alts?")
-                exit()
-            print(f"Added Pack '{deck_name}', {len(set_cards)} + {len(altcards)} cards.")
-
-            image = None
-            image_rarity = None
-            rarity_values = {"common": 0, "uncommon": 1, "rare": 2, "mythic": 3, "special": 4}
-            for cid in set_cards:
-                c = CardsByID[cid]
-                if image == None or c["rarity"] > image_rarity and "image_uris" in c:
-                    image = c["image_uris"]["border_crop"]
-                    image_rarity = c["rarity"]
-
-            if image == None:
-                image = "/img/cardback.webp"
-
-            if os.path.isfile(f"client/public/img/jumpin/{deck_name.lower()}.png"):
-                image = f"/img/jumpin/{deck_name.lower()}.png"
-
-            jumpInBoosters.append(
-                {
-                    "name": deck_name,
-                    "colors": list(colors),
-                    "cycling_land": False,
-                    "image": image,
-                    "cards": set_cards,
-                    "alts": altcards,
-                }
-            )
-        print(f"JumpIn Boosters: {len(jumpInBoosters)}")
-        for c in jumpInBoosters:
-            print(
-                f"{c['name']:<30}: {len(c['cards'])} + {len(c['alts'])} = {len(c['cards']) + len(c['alts'])} cards - {c['image']}"
-            )
-        if len(jumpInBoosters) > 0:
-            with open(OutputFile, "w", encoding="utf8") as outfile:
-                json.dump(
-                    jumpInBoosters,
-                    outfile,
-                    indent=4,
-                    ensure_ascii=False,
-                )
-            print("Dumped to disk.")
+                altslot.append({"name": card["name"], "id": card["id"], "weight": percentage})
+                log(f"  [{percentage:>2}%] {card['name']:<50} ({card['id']})")
+                if altidx == 0 and card["id"] in set_cards:
+                    set_cards.remove(card["id"])
+            if len(altslot) > 0:
+                altcards.append(altslot)
+            else:
+                log("Boosters: Empty Alt Slot.")
+                log(alt_matches)
+        if len(altcards) == 0:
+            raise ExtractionError(f"[{Set}] Error: Not alts? ({deck_name})")
+        log(f"Added Pack '{deck_name}', {len(set_cards)} + {len(altcards)} cards.")
+
+        image = None
+        image_rarity = None
+        for cid in set_cards:
+            c = CardsByID[cid]
+            if image == None or c["rarity"] > image_rarity and "image_uris" in c:
+                image = c["image_uris"]["border_crop"]
+                image_rarity = c["rarity"]
+
+        if image == None:
+            image = "/img/cardback.webp"
+
+        if os.path.isfile(f"client/public/img/jumpin/{deck_name.lower()}.png"):
+            image = f"/img/jumpin/{deck_name.lower()}.png"
+
+        jumpInBoosters.append(
+            {
+                "name": deck_name,
+                "colors": list(colors),
+                "cycling_land": False,
+                "image": image,
+                "cards": set_cards,
+                "alts": altcards,
+            }
+        )
+    log(f"JumpIn Boosters: {len(jumpInBoosters)}")
+    for c in jumpInBoosters:
+        log(
+            f"{c['name']:<30}: {len(c['cards'])} + {len(c['alts'])} = {len(c['cards']) + len(c['alts'])} cards - {c['image']}"
+        )
+    if len(jumpInBoosters) > 0:
+        dumpAtomically(jumpInBoosters, OutputFile)
+        log("Dumped to disk.")
+    return len(jumpInBoosters)
+
+
+try:
+    if Parallel:
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=Workers) as executor:
+            futures = {executor.submit(extractSet, entry): entry["set"] for entry in Sets}
+            done = 0
+            try:
+                for future in as_completed(futures):
+                    done += 1
+                    result = future.result()
+                    with PrintLock:
+                        print(f"Set {futures[future]} done ({result} packets). {done}/{len(Sets)} sets processed.")
+            except ExtractionError:
+                # Don't wait for the other sets: Drop the queued ones and stop the running ones
+                Cancelled.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+        print(f"All sets processed in {time.monotonic() - start_time:.1f}s.")
+    else:
+        for entry in Sets:
+            extractSet(entry)
+except ExtractionError as e:
+    print(e)
+    sys.exit(1)
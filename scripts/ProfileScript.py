@@ -0,0 +1,14 @@
+###############################################################################
+# --profile option of the scripts: Importing this module samples the script when it's run with --profile, the profile is
+# written to data/profiles at exit (see Profiler.py).
+#
+# Usage (in a script): import ProfileScript  # --profile
+
+import os
+import sys
+
+if "--profile" in sys.argv:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Profiler import startProfiling
+
+    startProfiling(os.path.splitext(os.path.basename(sys.argv[0]))[0])
@@ -2,6 +2,7 @@ import fs from "fs";
 import { glob } from "glob";
 import JSONStream from "JSONStream";
 import { memoryReport } from "./utils.js";
+import { lazyImageURIs } from "./ImageURIs.js";
 
 import { ArenaID, Card, CardID, getNextCardID, UniqueCard } from "./CardTypes.js";
 
@@ -44,6 +45,8 @@ if (process.env.NODE_ENV !== "production") {
 		await cardsPromise;
 	}
 }
+// Image URIs are stored templated in the DB files, and kept that way in memory (see ImageURIs.ts)
+for (const card of tmpCards.values()) lazyImageURIs(card);
 console.timeEnd("Parsing Cards");
 //memoryReport();
 
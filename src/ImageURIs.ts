@@ -0,0 +1,44 @@
+import type { Card } from "./CardTypes";
+
+// Templated card image URIs (see ImageURIs.py): The card DB (data/MTGCards.*.json and the client's Arena card chunks) only
+// stores the varying parts of Scryfall image URIs, "~" + face ("f" or "b") + id of the printing without dashes (omitted if
+// it's the card id) + "?" + version, e.g. "~f?1562404626". Any other URI is stored as is ("~" is doubled if it starts with one).
+
+const Faces: { [face: string]: string } = { f: "front", b: "back" };
+
+export function expandImageURI(value: string, cid: string): string {
+	if (!value.startsWith("~")) return value;
+	if (value.startsWith("~~")) return value.substring(1);
+	const face = Faces[value[1]];
+	const [id, version] = value.substring(2).split("?");
+	if (!face || version === undefined) return value;
+	const uriID =
+		id === "" ? cid : `${id.slice(0, 8)}-${id.slice(8, 12)}-${id.slice(12, 16)}-${id.slice(16, 20)}-${id.slice(20)}`;
+	return `https://cards.scryfall.io/border_crop/${face}/${uriID[0]}/${uriID[1]}/${uriID}.jpg?${version}`;
+}
+
+const Templated = Symbol("Templated image URIs");
+const CardID = Symbol("Card ID");
+type LazyImageURIs = { [lang: string]: string; [Templated]: { [lang: string]: string }; [CardID]: string };
+
+// One getter per language, shared by all cards (objects with the same languages then share their hidden class).
+const Getters: { [lang: string]: (this: LazyImageURIs) => string } = {};
+function getter(lang: string) {
+	if (!(lang in Getters))
+		Getters[lang] = function (this: LazyImageURIs) {
+			return expandImageURI(this[Templated][lang], this[CardID]);
+		};
+	return Getters[lang];
+}
+
+// Replaces the templated image URIs of both faces of card (in place) by objects expanding them when accessed, including when
+// they are copied or serialized (e.g. sent to clients): Only the templated values are kept in memory.
+export function lazyImageURIs(card: Pick<Card, "id" | "image_uris" | "back">) {
+	for (const face of [card, card.back]) {
+		if (!face?.image_uris) continue;
+		const lazy = { [Templated]: face.image_uris, [CardID]: card.id } as LazyImageURIs;
+		for (const lang in face.image_uris) Object.defineProperty(lazy, lang, { get: getter(lang), enumerable: true });
+		face.image_uris = lazy;
+	}
+	return card;
+}
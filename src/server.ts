@@ -3,6 +3,7 @@ import "source-map-support/register.js";
 export const DraftmancerPort = process.env.PORT || 3000;
 
 import fs from "fs";
+import crypto from "crypto";
 import axios, { AxiosError, AxiosResponse } from "axios";
 import compression from "compression";
 import express, { json as ExpressJSON, text as ExpressText, static as ExpressStatic } from "express";
@@ -39,7 +40,7 @@ import {
 	UsableDraftEffect,
 	OptionalOnPickDraftEffect,
 } from "./CardTypes.js";
-import { MTGACards, getUnique, getCard } from "./Cards.js";
+import { MTGACards, getUnique, getCard, isValidCardID } from "./Cards.js";
 import { parseLine, parseCardList } from "./parseCardList.js";
 import { SessionID, UserID } from "./IDTypes.js";
 import { CustomCardList } from "./CustomCardList.js";
@@ -141,11 +142,34 @@ function startPublicSession(s: Session) {
 	}
 }
 
+// Local cube precompiled by ManageCardData.py, if it is up-to-date and matches the current card database.
+function loadCompiledCube(cube: { name: string; filename: string }, source: Buffer): CustomCardList | null {
+	const compiledPath = `./data/cubes/compiled/${cube.filename.replace(/\.txt$/, ".json")}`;
+	if (!fs.existsSync(compiledPath)) return null;
+	try {
+		const compiled = JSON.parse(fs.readFileSync(compiledPath, "utf8"));
+		if (compiled.source_hash !== crypto.createHash("sha1").update(source).digest("hex")) return null;
+		// Lines that couldn't be resolved: Let the parser report them. Ambiguous lines resolve to the same card as the parser's.
+		if (compiled.unresolved.length > 0 || !compiled.ambiguous) return null;
+		if (!Object.keys(compiled.sheets.default.cards).every((cid) => isValidCardID(cid))) return null;
+		return { name: cube.name, sheets: compiled.sheets, layouts: false, customCards: null };
+	} catch (e) {
+		console.error(`Error loading precompiled cube '${compiledPath}': `, e);
+		return null;
+	}
+}
+
 // Prepare local custom card lists
 const ParsedCubeLists: { [name: string]: CustomCardList } = {};
 for (const cube of Constants.CubeLists) {
 	if (cube.filename) {
-		const r = parseCardList(fs.readFileSync(`./data/cubes/${cube.filename}`, "utf8"), {
+		const source = fs.readFileSync(`./data/cubes/${cube.filename}`);
+		const compiled = loadCompiledCube({ name: cube.name, filename: cube.filename }, source);
+		if (compiled) {
+			ParsedCubeLists[cube.name] = compiled;
+			continue;
+		}
+		const r = parseCardList(source.toString("utf8"), {
 			name: cube.name,
 		});
 		if (isSocketError(r)) {
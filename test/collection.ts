@@ -2,11 +2,10 @@
 
 import { describe, it, beforeEach, afterEach, before, after } from "mocha";
 import { expect } from "chai";
-import { getCard } from "../src/Cards.js";
+import { getCard, MTGACards } from "../src/Cards.js";
 import { Sessions } from "../src/Session.js";
 import { makeClients, enableLogs, disableLogs, waitForClientDisconnects, ackNoError, getUID } from "./src/common.js";
 
-import MTGACards from "../client/src/data/MTGACards.json" with { type: "json" };
 import { PlainCollection, UniqueCard } from "../src/CardTypes.js";
 
 describe("Collection Restriction", function () {
@@ -0,0 +1,328 @@
+###############################################################################
+# Local stand-in for the Scryfall API and Wizards articles, to run ManageCardData.py and scripts/*.py offline.
+#
+# Usage: python test/manual/StandInServer.py [--port 8765] [--fixtures test/manual/standin] [--latency 0] [--jitter 0]
+#                                            [--rate-limit 0] [--429-rate 0] [--page-size 175] [--seed 0] [--record]
+# Then point the tools to it:
+#   SCRYFALL_API_URL=http://localhost:8765/scryfall WIZARDS_URL=http://localhost:8765/wizards python ManageCardData.py dl
+#
+# Routes (under /scryfall):
+#   /bulk-data, /files/{all_cards,default_cards}.jsonl.gz  Synthetic bulk data built from {fixtures}/cards.jsonl
+#   /cards/search?q=...&page=N                              Paged search over cards.jsonl. Supported terms: e:/set:, lang:
+#                                                           (lang:any for all), date>=, date<=, o:"text"
+#   /cards/named?exact=...&set=...                          Most recent English printing with this name (or front face)
+#   /sets, /sets/{code}                                     From {fixtures}/sets.json ({"object": "list", "data": [...]})
+#   /symbology                                              {fixtures}/symbology.json
+#   /icons/{code}.svg                                       Placeholder set icon
+# /wizards/{path} serves {fixtures}/wizards/{path}.html.
+# Recorded responses ({fixtures}/recorded/{scryfall|wizards}/{quoted path and query}) take precedence over synthetic ones.
+# With --record, requests without a fixture are forwarded to the real service and their responses recorded.
+#
+# Fault injection: --latency/--jitter (ms) delay every response, --rate-limit (requests per second, 0: unlimited) and
+# --429-rate (probability) answer 429 Too Many Requests with a Retry-After header. GET /stats returns request counters.
+
+import os
+import re
+import sys
+import json
+import gzip
+import time
+import random
+import datetime
+import threading
+import urllib.parse
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+Upstreams = {"scryfall": "https://api.scryfall.com", "wizards": "https://magic.wizards.com"}
+TermRegex = re.compile(r'(\w+)(>=|<=|:|>|<|=)("([^"]*)"|[^\s"]+)')
+PlaceholderIcon = b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 32 32"><circle cx="16" cy="16" r="14"/></svg>'
+
+
+def option(name, default=None):
+    if name in sys.argv and sys.argv.index(name) + 1 < len(sys.argv):
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+def parseQuery(query: str) -> list[tuple[str, str, str]]:
+    """Splits a Scryfall query into (key, operator, value) terms, values can be double quoted."""
+    terms = []
+    position = 0
+    for m in TermRegex.finditer(query):
+        if query[position : m.start()].strip():
+            raise ValueError(f"Unsupported search term '{query[position : m.start()].strip()}'")
+        terms.append((m.group(1).lower(), m.group(2), m.group(4) if m.group(4) is not None else m.group(3)))
+        position = m.end()
+    if query[position:].strip():
+        raise ValueError(f"Unsupported search term '{query[position:].strip()}'")
+    return terms
+
+
+def collectorNumberKey(card: dict):
+    digits = "".join(ch for ch in card.get("collector_number", "") if ch.isdigit())
+    return (card.get("set", ""), int(digits) if digits else 0, card.get("collector_number", ""))
+
+
+class Fixtures:
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.cards = []
+        cards_path = f"{folder}/cards.jsonl"
+        self.updated_at = datetime.datetime.now(datetime.timezone.utc)
+        if os.path.isfile(cards_path):
+            with open(cards_path, "r", encoding="utf8") as file:
+                self.cards = [json.loads(line) for line in file if line.strip()]
+            self.updated_at = datetime.datetime.fromtimestamp(os.path.getmtime(cards_path), tz=datetime.timezone.utc)
+        self.sets = {"object": "list", "has_more": False, "data": []}
+        if os.path.isfile(f"{folder}/sets.json"):
+            with open(f"{folder}/sets.json", "r", encoding="utf8") as file:
+                self.sets = json.load(file)
+        self.bulk_files = {}
+        self.lock = threading.Lock()
+
+    def bulkFile(self, bulk_type: str) -> bytes:
+        with self.lock:
+            if bulk_type not in self.bulk_files:
+                cards = self.cards
+                if bulk_type == "default_cards":
+                    # One record per printing: English if available, otherwise the first one
+                    by_printing = {}
+                    for c in cards:
+                        key = (c.get("set"), c.get("collector_number"))
+                        if key not in by_printing or (c.get("lang") == "en" and by_printing[key].get("lang") != "en"):
+                            by_printing[key] = c
+                    cards = list(by_printing.values())
+                content = "".join(json.dumps(c, ensure_ascii=False) + "\n" for c in cards).encode("utf8")
+                self.bulk_files[bulk_type] = gzip.compress(content)
+            return self.bulk_files[bulk_type]
+
+    def search(self, query: str) -> list[dict]:
+        cards = self.cards
+        lang = "en"
+        for key, op, value in parseQuery(query):
+            value_lower = value.lower()
+            if key in ("e", "set", "s") and op == ":":
+                cards = [c for c in cards if c.get("set") == value_lower]
+            elif key == "lang" and op == ":":
+                lang = value_lower
+            elif key == "date" and op in (">=", ">", "<=", "<", ":", "="):
+                compare = {
+                    ">=": lambda d: d >= value,
+                    ">": lambda d: d > value,
+                    "<=": lambda d: d <= value,
+                    "<": lambda d: d < value,
+                }.get(op, lambda d: d == value)
+                cards = [c for c in cards if compare(c.get("released_at", ""))]
+            elif key in ("o", "oracle") and op == ":":
+                texts = lambda c: [c.get("oracle_text", "")] + [f.get("oracle_text", "") for f in c.get("card_faces", [])]
+                needle = value_lower.replace("~", "")
+                cards = [c for c in cards if any(needle in t.lower().replace(c["name"].lower(), "") for t in texts(c))]
+            else:
+                raise ValueError(f"Unsupported search term '{key}{op}{value}'")
+        if lang != "any":
+            cards = [c for c in cards if c.get("lang") == lang]
+        return sorted(cards, key=collectorNumberKey)
+
+    def named(self, exact: str, set_code: str | None) -> dict | None:
+        exact = exact.lower()
+        matches = [
+            c
+            for c in self.cards
+            if c.get("lang") == "en"
+            and (c["name"].lower() == exact or c["name"].split(" //")[0].lower() == exact)
+            and (set_code is None or c.get("set") == set_code.lower())
+        ]
+        return max(matches, key=lambda c: c.get("released_at", "")) if matches else None
+
+
+class StandIn:
+    def __init__(self):
+        self.fixtures = Fixtures(option("--fixtures", os.path.join(os.path.dirname(__file__), "standin")))
+        self.latency = float(option("--latency", "0")) / 1000
+        self.jitter = float(option("--jitter", "0")) / 1000
+        self.rate_limit = float(option("--rate-limit", "0"))
+        self.error_rate = float(option("--429-rate", "0"))
+        self.page_size = int(option("--page-size", "175"))
+        self.record = "--record" in sys.argv
+        self.random = random.Random(int(option("--seed", "0")))
+        self.recent = []  # Timestamps of the requests of the last second
+        self.stats = {"requests": 0, "throttled": 0, "paths": {}}
+        self.lock = threading.Lock()
+
+    def throttled(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.stats["requests"] += 1
+            self.recent = [t for t in self.recent if now - t < 1.0]
+            limited = (self.rate_limit > 0 and len(self.recent) >= self.rate_limit) or (
+                self.error_rate > 0 and self.random.random() < self.error_rate
+            )
+            if limited:
+                self.stats["throttled"] += 1
+            else:
+                self.recent.append(now)
+            return limited
+
+    def delay(self) -> float:
+        with self.lock:
+            return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+
+State: StandIn = None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if "--verbose" in sys.argv:
+            super().log_message(format, *args)
+
+    def send(self, status: int, body: bytes, content_type: str = "application/json", headers: dict = {}):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sendJSON(self, value, status: int = 200):
+        self.send(status, json.dumps(value, ensure_ascii=False).encode("utf8"))
+
+    def sendError(self, status: int, details: str):
+        code = {400: "bad_request", 404: "not_found", 429: "rate_limited"}.get(status, "error")
+        self.sendJSON({"object": "error", "code": code, "status": status, "details": details}, status)
+
+    def base(self) -> str:
+        return f"http://{self.headers.get('Host', 'localhost')}"
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path == "/stats":
+            return self.sendJSON(State.stats)
+        time.sleep(State.delay())
+        if State.throttled():
+            return self.send(429, b'{"object": "error", "code": "rate_limited", "status": 429}', headers={"Retry-After": "1"})
+        prefix, _, path = url.path.lstrip("/").partition("/")
+        endpoint = f"/{prefix}/{path.split('/')[0]}"
+        with State.lock:
+            State.stats["paths"][endpoint] = State.stats["paths"].get(endpoint, 0) + 1
+        if prefix not in Upstreams:
+            return self.sendError(404, f"Unknown prefix '/{prefix}', use /scryfall or /wizards.")
+
+        recorded = os.path.join(State.fixtures.folder, "recorded", prefix, urllib.parse.quote(f"/{path}?{url.query}", safe=""))
+        if os.path.isfile(recorded):
+            with open(recorded, "rb") as file:
+                return self.send(200, file.read(), self.contentType(path))
+        params = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            if prefix == "scryfall" and self.scryfall(path, params):
+                return
+            if prefix == "wizards":
+                article = os.path.join(State.fixtures.folder, "wizards", path + ".html")
+                if os.path.isfile(article):
+                    with open(article, "rb") as file:
+                        return self.send(200, file.read(), "text/html; charset=utf-8")
+        except ValueError as e:
+            return self.sendError(400, str(e))
+        if State.record:
+            return self.forward(prefix, path, url.query, recorded)
+        self.sendError(404, f"No fixture for /{prefix}/{path}")
+
+    @staticmethod
+    def contentType(path: str) -> str:
+        for ext, content_type in [(".html", "text/html; charset=utf-8"), (".svg", "image/svg+xml"), (".gz", "application/gzip")]:
+            if path.endswith(ext):
+                return content_type
+        return "application/json"
+
+    def scryfall(self, path: str, params: dict) -> bool:
+        """Synthetic Scryfall endpoints, returns False if path isn't one of them."""
+        fixtures = State.fixtures
+        base = f"{self.base()}/scryfall"
+        if path == "bulk-data":
+            entries = [
+                {
+                    "object": "bulk_data",
+                    "type": bulk_type,
+                    "updated_at": fixtures.updated_at.isoformat(),
+                    "download_uri": f"{base}/files/{bulk_type}.jsonl.gz",
+                    "jsonl_download_uri": f"{base}/files/{bulk_type}.jsonl.gz",
+                    "content_encoding": "gzip",
+                }
+                for bulk_type in ["all_cards", "default_cards"]
+            ]
+            self.sendJSON({"object": "list", "has_more": False, "data": entries})
+        elif path.startswith("files/") and path.endswith(".jsonl.gz"):
+            self.send(200, fixtures.bulkFile(path[len("files/") : -len(".jsonl.gz")]), "application/gzip")
+        elif path == "cards/search":
+            cards = fixtures.search(params.get("q", ""))
+            page = int(params.get("page", "1"))
+            data = cards[(page - 1) * State.page_size : page * State.page_size]
+            if len(data) == 0:
+                self.sendError(404, "Your query didn't match any cards.")
+                return True
+            result = {"object": "list", "total_cards": len(cards), "has_more": page * State.page_size < len(cards), "data": data}
+            if result["has_more"]:
+                result["next_page"] = f"{base}/cards/search?{urllib.parse.urlencode({**params, 'page': page + 1})}"
+            self.sendJSON(result)
+        elif path == "cards/named":
+            card = fixtures.named(params.get("exact", params.get("fuzzy", "")), params.get("set"))
+            if card is None:
+                self.sendError(404, "No cards found matching this name.")
+            else:
+                self.sendJSON(card)
+        elif path == "sets":
+            self.sendJSON(fixtures.sets)
+        elif path.startswith("sets/"):
+            code = path[len("sets/") :].lower()
+            entry = next((s for s in fixtures.sets["data"] if s["code"] == code), None)
+            if entry is None:
+                self.sendError(404, f"No set with code '{code}'.")
+                return True
+            self.sendJSON(
+                {
+                    **entry,
+                    "icon_svg_uri": f"{base}/icons/{code}.svg",
+                    "search_uri": f"{base}/cards/search?order=set&q=e%3A{code}&unique=prints",
+                }
+            )
+        elif path.startswith("icons/"):
+            self.send(200, PlaceholderIcon, "image/svg+xml")
+        elif path == "symbology" and os.path.isfile(f"{fixtures.folder}/symbology.json"):
+            with open(f"{fixtures.folder}/symbology.json", "rb") as file:
+                self.send(200, file.read())
+        else:
+            return False
+        return True
+
+    def forward(self, prefix: str, path: str, query: str, recorded: str):
+        url = f"{Upstreams[prefix]}/{path}" + (f"?{query}" if query else "")
+        request = urllib.request.Request(url, headers={"User-Agent": "Draftmancer DB Updater (stand-in recorder)"})
+        try:
+            with urllib.request.urlopen(request) as response:
+                body = response.read()
+        except urllib.error.HTTPError as e:
+            return self.send(e.code, e.read())
+        os.makedirs(os.path.dirname(recorded), exist_ok=True)
+        with open(recorded, "wb") as file:
+            file.write(body)
+        print(f"Recorded {url}")
+        self.send(200, body, self.contentType(path))
+
+
+if __name__ == "__main__":
+    State = StandIn()
+    port = int(option("--port", "8765"))
+    server = ThreadingHTTPServer(("localhost", port), Handler)
+    print(
+        f"Stand-in listening on http://localhost:{port} ({len(State.fixtures.cards)} cards, "
+        f"{len(State.fixtures.sets['data'])} sets from {State.fixtures.folder})"
+    )
+    print(f"  SCRYFALL_API_URL=http://localhost:{port}/scryfall WIZARDS_URL=http://localhost:{port}/wizards", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(State.stats, indent=4))
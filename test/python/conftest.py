@@ -0,0 +1,6 @@
+# Tests of the Python card data tools (ManageCardData.py and its modules), run from the repository root:
+#   python -m pytest test/python
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
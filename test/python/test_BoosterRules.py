@@ -0,0 +1,154 @@
+# data/BoosterRules.json must reproduce the in-booster and rating overrides addCard used to hardcode (legacyOverrides).
+import os
+import itertools
+
+import pytest
+
+from BoosterRules import RuleTable, loadRules
+
+RingEmblem = "7215460e-8c06-47d0-94e5-d1832d0218af"
+HBGRebalanced = [
+    "057c66a8-9424-4c88-9707-5d8ef9170119",
+    "e07d5fd5-d513-46d4-8812-6e6e55a6dfda",
+    "a5cbda07-53a0-4526-9955-36f902073cf1",
+    "ea4f1d5d-7991-4a2d-b907-3522e951ad4c",
+    "884565bb-ed33-4372-8c81-487c2ee2f73c",
+]
+MaxCollectorNumbers = {
+    "ltr": 261, "cmm": 436, "woe": 261, "lci": 286, "rvr": 291, "mkm": 271, "otj": 271, "otp": 65, "big": 30, "mh3": 261,
+    "blb": 261, "dsk": 271, "fdn": 271, "dft": 271, "tdm": 271, "fin": 293, "eoe": 261, "spm": 188, "tla": 281, "ecl": 268,
+    "tmt": 190, "sos": 266, "msh": 276, "hob": 188,
+}  # fmt: skip
+
+
+def safeInBoosterCheck(card: dict, max: int) -> bool:
+    try:
+        number = int(card["collector_number"])
+        return number > 0 and number <= max
+    except:
+        return False
+
+
+def legacyOverrides(c: dict, selection: dict):
+    """The overrides of addCard before data/BoosterRules.json."""
+    if c["type_line"].startswith("Basic"):
+        selection["in_booster"] = False
+        selection["rating"] = 0
+    if c["id"] == "0826e210-2002-43fe-942d-41922dfd7bc2" or c["id"] in HBGRebalanced:
+        selection["in_booster"] = False
+    cn = c["collector_number"]
+    match c["set"]:
+        case "sta":
+            selection["in_booster"] = not selection["collector_number"].endswith("e")
+        case "akr" | "klr":
+            selection["in_booster"] = c["booster"] and not c["type_line"].startswith("Basic")
+        case "war":
+            if "promo_types" in c and "jpwalker" in c["promo_types"]:
+                selection["in_booster"] = False
+        case "clb":
+            if int(cn) >= 646 and int(cn) <= 649:
+                selection["in_booster"] = False
+        case "2x2":
+            if int(cn) >= 332:
+                selection["in_booster"] = False
+        case "dmr":
+            if int(cn) >= 262 and int(cn) <= 401:
+                selection["in_booster"] = True
+        case "sir":
+            if not c["type_line"].startswith("Basic") and not cn.endswith("b"):
+                selection["in_booster"] = True
+        case "ltr":
+            selection["in_booster"] = safeInBoosterCheck(c, 261)
+            if "Ring tempts you" in c["oracle_text"] and (
+                "all_parts" not in c or next((x for x in c["all_parts"] if x["id"] == RingEmblem), None) == None
+            ):
+                selection.setdefault("related_cards", []).append(RingEmblem)
+        case "ktk":
+            if cn.endswith("y"):
+                selection["in_booster"] = False
+        case "usg" | "5ed" | "6ed" | "7ed" | "8ed":
+            if cn.endswith("s"):
+                selection["in_booster"] = False
+        case "mb2" | "om1":
+            selection["in_booster"] = True
+        case "pio":
+            selection["in_booster"] = int(cn) < 279
+        case "inr":
+            try:
+                selection["in_booster"] = int(cn[:-1] if cn.endswith("a") else cn) < 288
+            except:
+                selection["in_booster"] = False
+        case "fin":
+            selection["in_booster"] = safeInBoosterCheck(c, 293) and not selection["collector_number"].endswith("b")
+        case s if s in MaxCollectorNumbers:
+            selection["in_booster"] = safeInBoosterCheck(c, MaxCollectorNumbers[s])
+    if cn.endswith("†"):
+        selection["in_booster"] = False
+
+
+Sets = ["sta", "akr", "klr", "war", "clb", "2x2", "dmr", "sir", "ltr", "ktk", "usg", "7ed", "mb2", "om1", "pio", "inr", "fin"]
+Sets += list(MaxCollectorNumbers) + ["xyz"]  # No set specific rule
+CollectorNumbers = ["0", "1", "30", "65", "188", "261", "262", "271", "272", "278", "279", "287", "288", "293", "294", "331"]
+CollectorNumbers += ["332", "401", "402", "436", "437", "645", "646", "649", "650", "12a", "287a", "288a", "5b", "1e", "3s"]
+CollectorNumbers += ["7y", "4†", "A12", "★5", "12-2"]
+
+
+def cards():
+    ids = ["00000000-0000-0000-0000-000000000001", "0826e210-2002-43fe-942d-41922dfd7bc2", HBGRebalanced[0]]
+    for cset, cn, basic, booster, cid in itertools.product(Sets, CollectorNumbers, (False, True), (False, True), ids):
+        yield {
+            "id": cid,
+            "set": cset,
+            "collector_number": cn,
+            "type_line": "Basic Land — Forest" if basic else "Creature — Elf",
+            "booster": booster,
+            "oracle_text": "",
+        }
+    # Set specific properties
+    yield {"id": ids[0], "set": "war", "collector_number": "1", "type_line": "Planeswalker", "booster": True,
+           "oracle_text": "", "promo_types": ["jpwalker"]}  # fmt: skip
+    for all_parts in (None, [{"id": RingEmblem}], [{"id": ids[0]}]):
+        card = {"id": ids[0], "set": "ltr", "collector_number": "1", "type_line": "Creature", "booster": True,
+                "oracle_text": "Whenever the Ring tempts you, draw a card."}  # fmt: skip
+        if all_parts is not None:
+            card["all_parts"] = all_parts
+        yield card
+
+
+@pytest.fixture(scope="module")
+def table() -> RuleTable:
+    return loadRules(os.path.join(os.path.dirname(__file__), "..", "..", "data", "BoosterRules.json"))
+
+
+def test_rules_match_legacy_overrides(table):
+    checked = 0
+    for card in cards():
+        expected = {"collector_number": card["collector_number"], "in_booster": card["booster"], "rating": 0.5}
+        try:
+            legacyOverrides(card, expected)
+        except ValueError:
+            continue  # Non numeric collector number in a set where the build used to fail
+        selection = {"collector_number": card["collector_number"], "in_booster": card["booster"], "rating": 0.5}
+        table.apply(card, selection)
+        assert selection == expected, card
+        checked += 1
+    assert checked > 10000
+
+
+def test_cn_range():
+    table = RuleTable({"sets": {"tst": [{"in_booster": True, "when": {"cn_range": [10, None], "cn_suffixes": ["", "a"]}}]}})
+    results = {}
+    for cn in ["9", "10", "10a", "10b", "999", "x10"]:
+        selection = {"in_booster": False}
+        table.apply({"id": "", "set": "tst", "collector_number": cn}, selection)
+        results[cn] = selection["in_booster"]
+    assert results == {"9": False, "10": True, "10a": True, "10b": False, "999": True, "x10": False}
+
+
+def test_invalid_rules():
+    with pytest.raises(ValueError):
+        RuleTable({"before": [{"when": {"basic": True}}]})
+    with pytest.raises(ValueError):
+        RuleTable({"before": [{"in_booster": True, "when": {"cn_suffixes": ["a"]}}]})
+    with pytest.raises(ValueError):
+        RuleTable({"before": [{"in_booster": "maybe"}]})
@@ -0,0 +1,66 @@
+import gzip
+import json
+import uuid
+
+import pytest
+
+from BulkCache import BulkRecords, cachePaths, iterLines, loadIndex, recompress
+
+
+def makeRecord(i: int) -> dict:
+    return {
+        "object": "card",
+        "id": str(uuid.UUID(int=i * 7919)),
+        "name": f"Card {i}",
+        "set": ["aaa", "bbb", "ccc"][(i // 10) % 3],
+        "collector_number": str(i),
+        "oracle_text": "Lorem ipsum " * (i % 5),
+    }
+
+
+@pytest.fixture
+def bulk(tmp_path):
+    records = [makeRecord(i) for i in range(200)]
+    lines = [b"[\n"] + [json.dumps(r).encode() + b",\n" for r in records[:-1]] + [json.dumps(records[-1]).encode() + b"\n", b"]\n"]
+    path = str(tmp_path / "scryfall-all-cards.jsonl.gz")
+    with gzip.open(path, "wb") as file:
+        file.writelines(lines)
+    index = recompress(path, workers=2, frame_size=1000)
+    return path, index, records, lines
+
+
+def test_frames_hold_whole_lines(bulk):
+    path, index, records, lines = bulk
+    assert len(index["frames"]) > 10
+    # Still a valid gzip file, holding the same lines
+    with gzip.open(cachePaths(path)[0], "rb") as file:
+        assert file.readlines() == lines
+    assert sum(f[3] for f in index["frames"]) == len(lines)
+    assert list(iterLines(path, index, workers=2)) == lines
+
+
+def test_index_is_up_to_date(bulk):
+    path, index, *_ = bulk
+    assert loadIndex(path) == json.loads(json.dumps(index))
+    with gzip.open(path, "ab") as file:
+        file.write(b"\n")
+    assert loadIndex(path) is None
+
+
+def test_set_scan(bulk):
+    path, index, records, _ = bulk
+    expected = [r for r in records if r["set"] == "bbb"]
+    scanned = [json.loads(l.rstrip(b",\n")) for l in iterLines(path, index, sets={"bbb"}) if b'"set": "bbb"' in l]
+    assert scanned == expected
+    lines = list(BulkRecords(path, index).setLines("bbb"))
+    assert [json.loads(l.rstrip(b",\n")) for l in lines] == expected
+
+
+
+def test_records_by_id(bulk):
+    path, index, records, _ = bulk
+    bulk_records = BulkRecords(path, index)
+    assert bulk_records.count == len(records)
+    for r in records:
+        assert bulk_records.get(r["id"]) == r
+    assert bulk_records.get(str(uuid.UUID(int=1))) is None
@@ -0,0 +1,43 @@
+from CardDBEncoding import decodeCards, encodeCards, encodingReport
+
+Cards = {
+    "6d16b4a2-5d8c-4c4e-9a3f-2b0e0d9a7c11": {
+        "id": "6d16b4a2-5d8c-4c4e-9a3f-2b0e0d9a7c11",
+        "name": "Llanowar Elves",
+        "set": "dom",
+        "rarity": "common",
+        "type": "Creature",
+        "subtypes": ["Elf", "Druid"],
+        "mana_cost": "{G}",
+        "colors": ["G"],
+        "image_uris": {
+            "en": "https://cards.scryfall.io/border_crop/front/6/d/6d16b4a2-5d8c-4c4e-9a3f-2b0e0d9a7c11.jpg?1562737232"
+        },
+    },
+    "0b7a6d3c-1c6a-4a4f-8f0a-6a2d7b1b0e22": {
+        "id": "0b7a6d3c-1c6a-4a4f-8f0a-6a2d7b1b0e22",
+        "name": "Fyndhorn Elves",
+        "set": "ice",
+        "rarity": "common",
+        "type": "Creature",
+        "subtypes": ["Elf", "Druid"],
+        "mana_cost": "{G}",
+        "colors": ["G"],
+        "image_uris": {"en": "https://example.com/not-templated.jpg"},
+    },
+}
+
+
+def test_round_trip():
+    encoded = encodeCards(Cards)
+    assert decodeCards(encoded) == Cards
+    # Repeated values are stored once
+    assert encoded["dictionaries"]["subtypes"] == [["Elf", "Druid"]]
+    assert encoded["dictionaries"]["set"] == ["dom", "ice"]
+    assert decodeCards(encodeCards(Cards, template_image_uris=False)) == Cards
+
+
+def test_report():
+    report = encodingReport(Cards, encodeCards(Cards))
+    assert set(report["fields"]) == {"set", "rarity", "type", "subtypes", "mana_cost", "colors", "layout"}
+    assert report["fields"]["subtypes"]["distinct"] == 1
@@ -0,0 +1,36 @@
+from CardDBNormalization import NormalizedCardDB, normalizeCards, writeNormalizedDB
+
+
+def printing(cid: str, oracle_id: str, name: str, set_code: str, **fields) -> dict:
+    card = {"id": cid, "oracle_id": oracle_id, "name": name, "set": set_code, "mana_cost": "{R}", "cmc": 1, "colors": ["R"]}
+    card.update({"type": "Instant", "subtypes": [], "rating": 3.0})
+    card.update(fields)
+    return card
+
+
+Cards = {
+    "a1": printing("a1", "bolt", "Lightning Bolt", "lea"),
+    "a2": printing("a2", "bolt", "Lightning Bolt", "m10"),
+    "a3": printing("a3", "bolt", "Lightning Bolt", "2x2", rating=4.5),  # Per-set rating
+    "b1": printing("b1", "shock", "Shock", "m19", draft_effects=["x"]),
+    "b2": printing("b2", "shock", "Shock", "sta"),
+    "b3": printing("b3", "shock", "Shock", "akh", draft_effects=["x"]),
+}
+
+
+def test_oracle_fields_are_shared():
+    oracles, printings = normalizeCards(Cards)
+    assert oracles["bolt"]["rating"] == 3.0
+    assert printings["a1"] == {"id": "a1", "oracle_id": "bolt", "set": "lea"}
+    assert printings["a3"]["rating"] == 4.5
+    assert printings["b2"]["_absent"] == ["draft_effects"]
+
+
+def test_loader_rebuilds_cards(tmp_path):
+    writeNormalizedDB(Cards, str(tmp_path), parts=2)
+    db = NormalizedCardDB(str(tmp_path))
+    assert len(db) == len(Cards)
+    assert {cid: db[cid] for cid in db.ids()} == Cards
+    assert db.get("unknown") is None
+    assert db.printingsOf("shock") == ["b1", "b2", "b3"]
+    assert db.printingsOf("unknown") == []
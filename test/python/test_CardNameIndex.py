@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from CardNameIndex import CardNameIndex, buildNameIndex, normalizeName
+
+Cards = {
+    "1": {"id": "1", "name": "Lightning Bolt", "printed_names": {"en": "Lightning Bolt", "fr": "Éclair"}},
+    "2": {"id": "2", "name": "Lightning Bolt", "printed_names": {"en": "Lightning Bolt"}},
+    "3": {"id": "3", "name": "Æther Vial", "printed_names": {"en": "Æther Vial"}},
+    "4": {"id": "4", "name": "Fire // Ice", "printed_names": {"en": "Fire // Ice", "ja": "火 // 氷"}},
+    "5": {"id": "5", "name": "Urza's Saga", "printed_names": {"en": "Urza's Saga"}},
+}
+CardsByName = {"lightning bolt": "2", "æther vial": "3", "fire // ice": "4", "fire": "4", "urza's saga": "5"}
+
+
+@pytest.fixture
+def index(tmp_path) -> CardNameIndex:
+    path = tmp_path / "CardNameIndex.json"
+    path.write_text(json.dumps(buildNameIndex(Cards, CardsByName), ensure_ascii=False), encoding="utf8")
+    return CardNameIndex(str(path))
+
+
+def test_normalize_name():
+    assert normalizeName("Urza’s  Saga") == "urza's saga"
+    assert normalizeName("Æther Vial") == "aether vial"
+    assert normalizeName("Fire /// Ice") == "fire // ice"
+    assert normalizeName("Jötun Grunt") == "jotun grunt"
+
+
+def test_exact_lookups_use_the_preferred_printing(index):
+    assert index.lookup("Lightning Bolt") == ("2", 1.0, "lightning bolt")
+    assert index.lookup("Aether Vial")[0] == "3"
+    assert index.lookup("Urza`s Saga")[0] == "5"
+    assert index.lookup("Fire /// Ice")[0] == "4"
+    # Translations, front face of translated split cards
+    assert index.lookup("eclair")[0] == "2"
+    assert index.lookup("火")[0] == "4"
+    # Arena rebalanced names fall back to the original card
+    assert index.lookup("A-Lightning Bolt") == ("2", 1.0, "lightning bolt")
+
+
+def test_fuzzy_lookups(index):
+    card_id, score, name = index.lookup("Lightnig Bolt")
+    assert (card_id, name) == ("2", "lightning bolt")
+    assert 0.5 <= score < 1.0
+    assert index.lookup("Completely Unrelated") is None
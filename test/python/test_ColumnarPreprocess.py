@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("polars")
+import polars as pl
+
+from ColumnarPreprocess import arenaJoin, benchBuild, columnarCards, compareOutputs, dictCards, fixedNames, mtgaFrame
+from ColumnarPreprocess import syntheticBulkData
+from ManageCardData import BuildOptions, CardDataBuild, fixName
+
+
+@pytest.fixture(scope="module")
+def bulk(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("bulk") / "scryfall-all-cards.jsonl.gz")
+    return path, syntheticBulkData(path, 600, seed=1)
+
+
+@pytest.mark.parametrize("args", [[], ["--languages", "fr,ja"]])
+def test_same_outputs_as_dict_engine(bulk, args):
+    path, arena = bulk
+    expected_build, build = benchBuild(path, args, arena), benchBuild(path, args, arena)
+    expected = dictCards(expected_build)
+    # Small batches: The records of a printing are spread over several of them
+    result = columnarCards(build, batch_lines=50)
+    assert compareOutputs(expected_build, expected, build, result) == []
+    assert len(build.non_processed_cards) > 0
+    assert any("arena_id" in c for c in result[0].values())
+
+
+def test_names_and_arena_ids():
+    build = CardDataBuild(BuildOptions([]))
+    build.arena_ids = {
+        ("Bloomvine Regent // Claim Territory", "1", "tdm"): 1,
+        ("Front", "2", "neo"): 2,
+        ("Digital Card", "Digital", "ymid"): 3,
+        ("Converted", "4", "y22"): 4,
+        ("Plain // Plain", "5", "sld"): 5,
+    }
+    names = [
+        ("Bloomvine Regent // Claim Territory // Bloomvine Regent", "1", "TDM"),
+        ("Front // Back", "2", "neo"),
+        ("Digital Card", "10", "ymid"),
+        ("Converted", "4", "ymid"),
+        ("Plain // Plain", "5", "sld"),
+        ("A // B // C // A", "6", "sld"),
+        ("Missing", "7", "neo"),
+    ]
+    df = pl.DataFrame(names, schema=["name", "collector_number", "set"], orient="row")
+    df = arenaJoin(df.with_columns(fixedNames()), mtgaFrame(build.arena_ids))
+    results = df.select("name", "front_name", "joined_arena_id").iter_rows()
+    for (name, cn, set_code), (fixed, front, arena_id) in zip(names, results):
+        c = {"name": name}
+        assert front == fixName(c)
+        assert fixed == c["name"]
+        assert arena_id == build.lookupArenaID(fixed, front, cn, set_code)
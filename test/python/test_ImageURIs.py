@@ -0,0 +1,65 @@
+from CardDBEncoding import decodeCards, encodeCards
+from CardDBNormalization import NormalizedCardDB, writeNormalizedDB
+from ImageURIs import expandImageURI, expandImageURIs, templateImageURI, templateImageURIs
+from TranslationPacks import LoadedPacks, applyTranslationPack, loadTranslationPack, writeTranslationPacks
+
+CardID = "6d16b4a2-5d8c-4c4e-9a3f-2b0e0d9a7c11"
+OtherID = "0b7a6d3c-1c6a-4a4f-8f0a-6a2d7b1b0e22"
+
+Card = {
+    "id": CardID,
+    "oracle_id": "elves",
+    "name": "Llanowar Elves",
+    "image_uris": {
+        "en": f"https://cards.scryfall.io/border_crop/front/6/d/{CardID}.jpg?1562737232",
+        "fr": f"https://cards.scryfall.io/border_crop/front/0/b/{OtherID}.jpg?1562737233",
+        "ja": "~https://example.com/tilde.jpg",
+    },
+    "back": {
+        "name": "Back",
+        "image_uris": {
+            "en": f"https://cards.scryfall.io/border_crop/back/6/d/{CardID}.jpg?1562737232",
+            "fr": "https://example.com/not-templated.jpg",
+        },
+    },
+}
+
+
+def test_template():
+    assert templateImageURI(Card["image_uris"]["en"], CardID) == "~f?1562737232"
+    assert templateImageURI(Card["image_uris"]["fr"], CardID) == f"~f{OtherID.replace('-', '')}?1562737233"
+    assert templateImageURI(Card["back"]["image_uris"]["en"], CardID) == "~b?1562737232"
+    # Other URIs are kept, "~" is escaped
+    assert templateImageURI("https://example.com/not-templated.jpg", CardID) == "https://example.com/not-templated.jpg"
+    assert templateImageURI("~https://example.com/tilde.jpg", CardID) == "~~https://example.com/tilde.jpg"
+    # Folders not matching the id are kept as is
+    mismatch = f"https://cards.scryfall.io/border_crop/front/0/0/{CardID}.jpg?1"
+    assert templateImageURI(mismatch, CardID) == mismatch
+
+
+def test_round_trip():
+    for uri in [*Card["image_uris"].values(), *Card["back"]["image_uris"].values()]:
+        assert expandImageURI(templateImageURI(uri, CardID), CardID) == uri
+    templated = templateImageURIs(Card, CardID)
+    assert templated["image_uris"]["en"] == "~f?1562737232"
+    assert Card["image_uris"]["en"].startswith("https://")  # Copied, not templated in place
+    assert expandImageURIs(templated, CardID) == Card
+
+
+def test_templated_outputs(tmp_path):
+    # Outputs written from templated cards (as kept by CardDataSession), expanded by their reference loaders
+    cards = {CardID: templateImageURIs(Card, CardID)}
+    assert decodeCards(encodeCards(cards, templated=True)) == {CardID: Card}
+
+    writeNormalizedDB(cards, str(tmp_path / "normalized"), parts=1)
+    assert NormalizedCardDB(str(tmp_path / "normalized"))[CardID] == Card
+
+    writeTranslationPacks(cards, str(tmp_path / "translations"), parts=1)
+    LoadedPacks.clear()
+    pack = loadTranslationPack(str(tmp_path / "translations"), "fr")
+    assert pack[CardID]["image_uri"] == cards[CardID]["image_uris"]["fr"]
+    core = {**Card, "image_uris": {"en": "~f?1562737232"}, "back": {"name": "Back", "image_uris": {"en": "~b?1562737232"}}}
+    fr = expandImageURIs(applyTranslationPack(core, pack, "fr"), CardID)
+    assert fr["image_uris"] == {"en": Card["image_uris"]["en"], "fr": Card["image_uris"]["fr"]}
+    assert fr["back"]["image_uris"] == Card["back"]["image_uris"]
+    LoadedPacks.clear()
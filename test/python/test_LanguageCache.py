@@ -0,0 +1,54 @@
+import pytest
+import requests
+
+import LanguageCache
+from LanguageCache import MaxRetries, retryDelay, searchPrints
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, content: dict | None = None, headers: dict | None = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def json(self):
+        return self.content
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    """Responses returned in order by requests.get, and the delays slept."""
+    queue, sleeps = [], []
+    monkeypatch.setattr(LanguageCache.requests, "get", lambda *args, **kwargs: queue.pop(0))
+    monkeypatch.setattr(LanguageCache.time, "sleep", sleeps.append)
+    return queue, sleeps
+
+
+def test_retries_honour_retry_after(responses):
+    queue, sleeps = responses
+    queue += [
+        FakeResponse(429, headers={"Retry-After": "3"}),
+        FakeResponse(200, {"data": [{"id": "1"}], "has_more": True}),
+        FakeResponse(429),
+        FakeResponse(200, {"data": [{"id": "2"}], "has_more": False}),
+    ]
+    assert searchPrints("lang:fr", {}) == [{"id": "1"}, {"id": "2"}]
+    assert sleeps == [3.0, LanguageCache.RequestInterval, 1.0]
+
+
+def test_retries_are_capped(responses):
+    queue, sleeps = responses
+    queue += [FakeResponse(429, headers={"Retry-After": "1"}) for _ in range(MaxRetries + 1)]
+    with pytest.raises(requests.HTTPError):
+        searchPrints("lang:fr", {})
+    assert len(sleeps) == MaxRetries
+
+
+def test_retry_delay():
+    assert retryDelay(FakeResponse(429, headers={"Retry-After": "2.5"}), 0) == 2.5
+    assert retryDelay(FakeResponse(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0) == 0.0
+    assert retryDelay(FakeResponse(429), 3) == 8.0
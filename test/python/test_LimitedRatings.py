@@ -0,0 +1,45 @@
+import json
+
+from LimitedRatings import computeRatings, referenceRating
+
+Reference = {"a": 0.0, "b": 1.0, "c": 2.0}
+
+
+def writeCSV(path, rows):
+    path.write_text("\n".join(",".join(str(v) for v in row) for row in rows) + "\n", encoding="utf8")
+
+
+def test_sets_from_column_or_sources(tmp_path):
+    # 17lands card ratings export: No set column, the file name prefix isn't a set code
+    writeCSV(tmp_path / "card-ratings-2024-05-01.csv", [["Name", "GIH WR", "# GIH"], ["A", "60%", 100], ["B", "50%", 100]])
+    (tmp_path / "Sources.json").write_text(json.dumps({"card-ratings-2024-05-01.csv": "MKM"}), encoding="utf8")
+    (tmp_path / "draft-data.json").write_text(
+        json.dumps([{"name": "C", "expansion": "OTJ", "avg_pick": 2.0}, {"name": "D", "expansion": "OTJ", "avg_pick": 5.0}]),
+        encoding="utf8",
+    )
+    writeCSV(tmp_path / "unknown.csv", [["Name", "GIH WR"], ["E", "55%"]])
+    dest = tmp_path / "ratings.json"
+    assert computeRatings(str(tmp_path), str(dest), Reference, workers=1) == 2
+    ratings = json.loads(dest.read_text(encoding="utf8"))
+    assert ratings == {"mkm": {"A": 2.0, "B": 0.0}, "otj": {"C": 2.0, "D": 0.0}}
+
+
+def test_metrics_are_normalized_separately(tmp_path):
+    writeCSV(
+        tmp_path / "mkm.csv",
+        [["Name", "Expansion", "GIH WR", "# GIH", "ATA"], ["A", "MKM", "40%", 10, ""], ["B", "MKM", "60%", 10, ""]]
+        + [["C", "MKM", "", "", 1.0], ["D", "MKM", "", "", 9.0]],
+    )
+    # Second file of the same set: Win rate for a card only rated by its pick order in the first one
+    writeCSV(tmp_path / "mkm2.csv", [["Name", "Expansion", "GIH WR", "# GIH"], ["D", "MKM", "50%", 10]])
+    dest = tmp_path / "ratings.json"
+    computeRatings(str(tmp_path), str(dest), Reference, workers=1)
+    ratings = json.loads(dest.read_text(encoding="utf8"))["mkm"]
+    # Win rates (A < D < B) take precedence over the pick order, C only has its pick order (best pick)
+    assert ratings == {"A": 0.0, "B": 2.0, "C": 2.0, "D": 1.0}
+
+
+def test_reference_rating():
+    assert referenceRating({"o": 1.5}, "o", "common") == 1.5
+    assert referenceRating({}, "o", "rare") == 0.8
+    assert referenceRating({}, "o", "special") == 0.5
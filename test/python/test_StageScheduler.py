@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+import Profiler
+from Profiler import SamplingProfiler, profilingPaused
+from StageScheduler import Stage, StageResult, runStages
+
+
+def valueStage(value):
+    def run(*args):
+        result = StageResult()
+        result.value = (value, args)
+        return result
+
+    return run
+
+
+def test_dependencies_receive_results():
+    results = runStages(
+        [
+            Stage("a", valueStage("a")),
+            Stage("b", valueStage("b"), "thread", after=("a",)),
+            Stage("c", valueStage("c"), "thread", after=("b",)),
+        ]
+    )
+    assert list(results) == ["a", "b", "c"]
+    assert results["a"].value == ("a", ())
+    assert results["c"].value == ("c", (("b", (("a", ()),)),))
+
+
+def test_stage_validation():
+    assert Stage("a", valueStage("a")).after == ()
+    with pytest.raises(ValueError):
+        Stage("a", valueStage("a"), after=("b",))
+    with pytest.raises(ValueError):
+        runStages([Stage("a", valueStage("a"), "thread", after=("b",))])
+
+
+def test_profiler_paused_while_forking(monkeypatch):
+    profiler = SamplingProfiler(0.001)
+    monkeypatch.setattr(Profiler, "ActiveProfiler", profiler)
+    profiler.start()
+    try:
+        with profilingPaused():
+            assert "SamplingProfiler" not in [t.name for t in threading.enumerate()]
+        assert "SamplingProfiler" in [t.name for t in threading.enumerate()]
+        assert runStages([Stage("a", valueStage("a"))])["a"].value == ("a", ())
+    finally:
+        profiler.stop()
+    assert "SamplingProfiler" not in [t.name for t in threading.enumerate()]
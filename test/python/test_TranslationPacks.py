@@ -0,0 +1,49 @@
+import os
+
+from TranslationPacks import LoadedPacks, applyTranslationPack, loadTranslationPack, writeTranslationPacks
+
+
+
+def card(cid: str, languages: list[str]) -> dict:
+    return {
+        "id": cid,
+        "name": f"Card {cid}",
+        "printed_names": {lang: f"{lang} {cid}" for lang in languages},
+        "image_uris": {lang: f"https://example.com/{lang}/{cid}.jpg" for lang in languages},
+    }
+
+
+def test_stale_packs_are_deleted(tmp_path):
+    folder = str(tmp_path)
+    report = writeTranslationPacks({"1": card("1", ["en", "fr", "ja"]), "2": card("2", ["en", "fr"])}, folder, parts=2)
+    assert sorted(report) == ["en", "fr", "ja"]
+    assert os.path.isfile(f"{folder}/ja.json")
+
+    report = writeTranslationPacks({"1": card("1", ["en", "fr"]), "2": card("2", ["en", "fr"])}, folder, parts=2)
+    assert report["ja"] is None
+    assert not os.path.exists(f"{folder}/ja.json")
+    assert report["fr"][2] is False  # Unchanged, not rewritten
+    assert sorted(os.listdir(folder)) == ["core", "fr.json"]
+
+
+
+def test_staged_copy(tmp_path):
+    folder, staged = str(tmp_path / "translations"), str(tmp_path / "staged")
+    writeTranslationPacks({"1": card("1", ["en", "fr", "ja"])}, folder, parts=1)
+    mtime = os.stat(f"{folder}/fr.json").st_mtime_ns
+    report = writeTranslationPacks({"1": card("1", ["en", "fr"])}, staged, parts=1, previous=folder)
+    assert report["ja"] is None
+    assert report["fr"][2] is False
+    assert os.stat(f"{staged}/fr.json").st_mtime_ns == mtime
+    assert sorted(os.listdir(staged)) == ["core", "fr.json"]
+    assert os.path.isfile(f"{folder}/ja.json")  # The current folder is left untouched
+
+def test_packs_round_trip(tmp_path):
+    cards = {"1": card("1", ["en", "fr"])}
+    cards["1"]["back"] = {"name": "Back", "printed_names": {"en": "Back", "fr": "Dos"}}
+    writeTranslationPacks(cards, str(tmp_path), parts=1)
+    LoadedPacks.clear()
+    pack = loadTranslationPack(str(tmp_path), "fr")
+    core = {"id": "1", "name": "Card 1", "printed_names": {"en": "en 1"}, "image_uris": {"en": cards["1"]["image_uris"]["en"]}}
+    core["back"] = {"name": "Back", "printed_names": {"en": "Back"}}
+    assert applyTranslationPack(core, pack, "fr") == cards["1"]